@@ -1,14 +1,136 @@
-from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash
-from database import create_db_connection, setup_database 
-from datetime import datetime
+from flask import Flask, render_template, request, redirect, url_for, session, jsonify, flash, g, Response, stream_with_context, has_request_context, make_response
+from database import obter_conexao_pool, obter_conexao_leitura, get_pool, get_roteador, setup_database, REPLICAS_CONFIG, REPLICACAO_CONFIG
+import estatisticas
+import migracoes
+import paginacao
+import busca
+import estoque_servico
+import sinais_vitais
+import eventos
+import ingestao
+import exportacao
+import ceps
+import metricas
+import transferencia
+import fragmentos
+import assets
+import arquivamento
+import tarefas
+import triagem
+import versoes
+import previsao
+from catalogo import catalogo
+from cache import cache, TAG_INTERNACOES, TAG_ALTAS, TAG_PROVAS_VIDA, TAG_MEDICAMENTOS, TAG_ESTOQUE, TAG_USUARIOS, TODAS_AS_TAGS
+from datetime import datetime, timedelta
 from werkzeug.security import generate_password_hash, check_password_hash
 import pymysql.cursors 
 from pymysql import IntegrityError 
 from functools import wraps
+import click
+import time
+import os
 
-# Função auxiliar para criar a conexão
+# Função auxiliar para obter a conexão (emprestada do pool e presa à requisição)
 def get_db_connection(cursor_factory=pymysql.cursors.DictCursor):
-    return create_db_connection(cursor_factory)
+    conn = g.get('db_conn')
+    if conn is None or conn.devolvida:
+        inicio = time.perf_counter()
+        if g.get('leitura_replica') and not escreveu_recentemente():
+            conn = obter_conexao_leitura(cursor_factory)
+        else:
+            conn = obter_conexao_pool(cursor_factory, ao_confirmar=registrar_escrita)
+        metricas.registrar_espera_conexao(time.perf_counter() - inicio)
+        if conn is not None:
+            conn = metricas.ConexaoInstrumentada(conn)
+        g.db_conn = conn
+    return conn
+
+def consulta_preguicosa(sql, params=()):
+    # Linhas carregadas só se o template renderizar o fragmento (ver fragmentos.py)
+    def carregar():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            cursor.execute(sql, params)
+            return cursor.fetchall()
+        finally:
+            conn.close()
+    return fragmentos.preguicoso(carregar)
+
+def registrar_escrita():
+    # Chamado a cada commit no primário; vira session['escrita_em'] no after_request
+    if has_request_context():
+        g.escreveu = True
+
+def escreveu_recentemente():
+    # Ler o que acabou de gravar: por um tempo o usuário não lê das réplicas
+    escrita_em = session.get('escrita_em')
+    return escrita_em is not None and time.time() - escrita_em < REPLICACAO_CONFIG['janela_pos_escrita']
+
+# Decorator para rotas só de leitura que toleram alguns segundos de atraso (réplicas)
+def leitura_replica(f):
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        g.leitura_replica = True
+        return f(*args, **kwargs)
+    return decorated_function
+
+def no_primario(funcao):
+    """
+    Roda funcao() lendo do primário mesmo numa rota @leitura_replica. Para o que
+    vai para o cache compartilhado: calculado de uma réplica atrasada, o valor de
+    antes da escrita seria servido a todos (inclusive a quem acabou de gravar)
+    até a próxima invalidação.
+    """
+    def executar():
+        if not g.get('leitura_replica'):
+            return funcao()
+        conn = g.pop('db_conn', None)
+        if conn is not None:
+            conn.close()
+        g.leitura_replica = False
+        try:
+            return funcao()
+        finally:
+            g.leitura_replica = True
+    return executar
+
+# Decorator de GET condicional: recursos são nomes de versoes.py ou funções dos
+# argumentos da rota; janela (segundos) para dados que também andam com o relógio
+def condicional(*recursos, janela=None):
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            # Mensagens flash pendentes precisam da página renderizada
+            if request.method != 'GET' or '_flashes' in session:
+                return f(*args, **kwargs)
+            conn = get_db_connection()
+            if conn is None:
+                return f(*args, **kwargs)
+            nomes = [r(**kwargs) if callable(r) else r for r in recursos]
+            estado = versoes.ler(conn.cursor(), nomes)
+            relogio = int(time.time() // janela) if janela else ''
+            etag = versoes.etag(estado, request.full_path, session.get('usuario'), session.get('nivel'),
+                                VERSAO_IMPLANTACAO, relogio)
+            modificado = None if janela else versoes.ultima_alteracao(estado)
+
+            if request.if_none_match:
+                igual = request.if_none_match.contains(etag)
+            else:
+                igual = bool(modificado and request.if_modified_since and request.if_modified_since >= modificado)
+            if igual:
+                resposta = app.response_class(status=304)
+            else:
+                resposta = make_response(f(*args, **kwargs))
+                if resposta.status_code != 200:
+                    return resposta
+            resposta.set_etag(etag)
+            if modificado:
+                resposta.last_modified = modificado
+            resposta.headers['Cache-Control'] = 'private, no-cache'
+            return resposta
+        return decorated_function
+    return decorator
 
 # Decorator para exigir login
 def login_required(f):
@@ -22,6 +144,39 @@ def login_required(f):
 
 app = Flask(__name__)
 app.secret_key = 'root'
+VERSAO_IMPLANTACAO = versoes.assinatura_implantacao(__file__, os.path.join(app.root_path, 'templates'),
+                                                    app.static_folder)
+metricas.instalar(app)
+fragmentos.instalar(app)
+assets.instalar(app)
+
+@app.before_request
+def sincronizar_cache():
+    # Cache local: invalidações de outros processos (trabalhador) chegam pela tabela Versoes
+    if not cache.precisa_sincronizar():
+        return
+    try:
+        conn = get_db_connection()
+        if conn is not None:
+            try:
+                cache.sincronizar(versoes.ler(conn.cursor(), TODAS_AS_TAGS))
+            finally:
+                conn.close()
+    except Exception as e:
+        print(f"⚠️ Erro ao sincronizar o cache: {e}")
+
+@app.after_request
+def marcar_escrita(response):
+    if g.get('escreveu') and 'usuario' in session:
+        session['escrita_em'] = time.time()
+    return response
+
+@app.teardown_appcontext
+def devolver_conexao(exc):
+    # Garante que a conexão volte ao pool mesmo se a rota esquecer do close()
+    conn = g.pop('db_conn', None)
+    if conn is not None:
+        conn.close()
 
 # =============================================================================
 #   Sistema (MANTIDO)
@@ -66,13 +221,8 @@ def logout():
     session.clear()
     return redirect(url_for('login'))
 
-@app.route('/dashboard')
-@login_required
-def dashboard():
-    conn = get_db_connection()
-    current_year = datetime.now().year
-    
-    dados_dashboard = {
+def dados_dashboard_vazios():
+    return {
         'total_internados': 0, 'altas_ultimos_7_dias': 0, 'baixo_estoque': 0, 'provas_vida_ultimas_24h': 0,
         'prioridade_data': {'labels': ['Verde', 'Amarelo', 'Vermelho'], 'data': [0, 0, 0]},
         'prioridade_tendencia': {'verde': [0]*12, 'amarelo': [0]*12, 'vermelho': [0]*12},
@@ -81,135 +231,221 @@ def dashboard():
         'movimentacao_anual': {'labels': [], 'entradas': [], 'altas': []},
         'saida_remedios': {'labels': [], 'data': []} # Novo campo para o gráfico
     }
-    
-    if conn:
+
+@app.route('/dashboard')
+@login_required
+@leitura_replica
+def dashboard():
+    current_year = datetime.now().year
+
+    def calcular():
+        dados = dados_dashboard_vazios()
+        conn = get_db_connection()
+        if conn is None:
+            raise RuntimeError("Sem conexão com o banco.")
         cursor = conn.cursor() 
         try:
-            cursor.execute("SELECT COUNT(*) as total FROM Pacientes WHERE status = 'internado'")
-            dados_dashboard['total_internados'] = cursor.fetchone()['total'] or 0
-            
-            cursor.execute("SELECT COUNT(*) as total FROM Pacientes WHERE status = 'alta' AND data_baixa >= DATE_SUB(NOW(), INTERVAL 7 DAY)")
-            dados_dashboard['altas_ultimos_7_dias'] = cursor.fetchone()['total'] or 0
-            
-            cursor.execute("SELECT COUNT(*) as total FROM Estoque WHERE quantidade < 100")
-            dados_dashboard['baixo_estoque'] = cursor.fetchone()['total'] or 0
-
-            cursor.execute("SELECT COUNT(*) as total FROM provasdevida WHERE data_hora >= DATE_SUB(NOW(), INTERVAL 24 HOUR)")
-            dados_dashboard['provas_vida_ultimas_24h'] = cursor.fetchone()['total'] or 0
-
-            sql_anual = """
-                SELECT YEAR(data_entrada) as ano, COUNT(*) as entradas,
-                SUM(CASE WHEN status = 'alta' THEN 1 ELSE 0 END) as altas
-                FROM Pacientes 
-                GROUP BY ano ORDER BY ano ASC LIMIT 5
-            """
-            cursor.execute(sql_anual)
-            for row in cursor.fetchall():
-                if row['ano']:
-                    dados_dashboard['movimentacao_anual']['labels'].append(str(row['ano']))
-                    dados_dashboard['movimentacao_anual']['entradas'].append(row['entradas'])
-                    dados_dashboard['movimentacao_anual']['altas'].append(int(row['altas']))
-
-            cursor.execute("SELECT prioridade_atencao, COUNT(*) as total FROM Pacientes WHERE status = 'internado' GROUP BY prioridade_atencao")
-            for item in cursor.fetchall():
-                p = (item['prioridade_atencao'] or 'verde').lower()
-                if p == 'verde': dados_dashboard['prioridade_data']['data'][0] = item['total']
-                elif p == 'amarelo': dados_dashboard['prioridade_data']['data'][1] = item['total']
-                elif p == 'vermelho': dados_dashboard['prioridade_data']['data'][2] = item['total']
-
-            cursor.execute(f"SELECT MONTH(data_entrada) as mes, COUNT(*) as c FROM Pacientes WHERE YEAR(data_entrada) = {current_year} GROUP BY mes")
-            for r in cursor.fetchall(): dados_dashboard['movimentacao_mensal']['entradas'][r['mes']-1] = r['c']
-            
-            cursor.execute(f"SELECT MONTH(data_baixa) as mes, COUNT(*) as c FROM Pacientes WHERE status='alta' AND YEAR(data_baixa) = {current_year} GROUP BY mes")
-            for r in cursor.fetchall(): dados_dashboard['movimentacao_mensal']['altas'][r['mes']-1] = r['c']
-
-            cursor.execute(f"""
-                SELECT MONTH(data_entrada) as mes, prioridade_atencao, COUNT(*) as c 
-                FROM Pacientes WHERE YEAR(data_entrada) = {current_year} 
-                GROUP BY mes, prioridade_atencao
-            """)
-            for r in cursor.fetchall():
-                mes_idx = r['mes'] - 1
-                prioridade = (r['prioridade_atencao'] or 'verde').lower()
-                if prioridade in dados_dashboard['prioridade_tendencia']:
-                    dados_dashboard['prioridade_tendencia'][prioridade][mes_idx] = r['c']
-
-            cursor.execute("""
-                SELECT usuario_internacao, AVG(DATEDIFF(IFNULL(data_baixa, NOW()), data_entrada)) as media 
-                FROM Pacientes GROUP BY usuario_internacao LIMIT 5
-            """)
-            for r in cursor.fetchall():
-                nome = r['usuario_internacao'] or 'Sistema'
-                dados_dashboard['dias_data']['labels'].append(nome)
-                dados_dashboard['dias_data']['data'].append(round(float(r['media']), 1))
-
-            # --- NOVO: BUSCA SAÍDA DE MEDICAMENTOS ---
-            cursor.execute("""
-                SELECT nome_medicamento, SUM(quantidade_removida) as total 
-                FROM EstoqueBaixas 
-                GROUP BY nome_medicamento 
-                ORDER BY total DESC 
-                LIMIT 8
-            """)
-            for r in cursor.fetchall():
-                dados_dashboard['saida_remedios']['labels'].append(r['nome_medicamento'])
-                dados_dashboard['saida_remedios']['data'].append(float(r['total']))
+            # Contadores e gráficos vêm das tabelas pré-agregadas (ver estatisticas.py)
+            estatisticas.carregar_dashboard(cursor, dados, current_year)
 
-        except Exception as e:
-            print(f"Erro no dashboard: {e}")
+            # Itens que acabam antes da reposição ou estão abaixo do ponto de pedido (ver previsao.py)
+            dados['baixo_estoque'] = len(previsao.obter(cursor)['alertas'])
         finally:
             conn.close()
+        return dados
+
+    try:
+        # Os números são iguais para todos os usuários: vêm do cache (ver cache.py)
+        dados_dashboard = cache.obter_ou_calcular(('dashboard', current_year), no_primario(calcular), tags=TODAS_AS_TAGS)
+    except Exception as e:
+        print(f"Erro no dashboard: {e}")
+        dados_dashboard = dados_dashboard_vazios()
             
     return render_template('dashboard.html', usuario=session['usuario'], nivel=session['nivel'], dados=dados_dashboard)
+
+def tags_kpi(tipo):
+    return {'altas': (TAG_ALTAS,), 'internados': (TAG_INTERNACOES,), 'estoque': (TAG_ESTOQUE,)}.get(tipo, (TAG_PROVAS_VIDA,))
+
 @app.route('/api/kpi/<tipo>/<periodo>')
 @login_required
+@leitura_replica
+@condicional(lambda tipo, periodo: tags_kpi(tipo)[0], janela=60)
 def api_kpi(tipo, periodo):
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    valor = 0
-    try:
-        if tipo == 'altas':
-            dias = 7
-            if periodo == '15d': dias = 15
-            elif periodo == '30d': dias = 30
-            elif periodo == 'trimestre': dias = 90
-            elif periodo == 'semestre': dias = 180
-            elif periodo == 'ano': dias = 365
-            cursor.execute("SELECT COUNT(*) as total FROM Pacientes WHERE status = 'alta' AND data_baixa >= DATE_SUB(NOW(), INTERVAL %s DAY)", (dias,))
-            valor = cursor.fetchone()['total'] or 0
-        elif tipo == 'pv':
-            horas = 24
-            if periodo == '48h': horas = 48
-            elif periodo == '92h': horas = 92
-            cursor.execute("SELECT COUNT(*) as total FROM ProvasDeVida WHERE data_hora >= DATE_SUB(NOW(), INTERVAL %s HOUR)", (horas,))
-            valor = cursor.fetchone()['total'] or 0
-    finally: conn.close()
+    def calcular():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        valor = 0
+        try:
+            if tipo == 'altas':
+                dias = 7
+                if periodo == '15d': dias = 15
+                elif periodo == '30d': dias = 30
+                elif periodo == 'trimestre': dias = 90
+                elif periodo == 'semestre': dias = 180
+                elif periodo == 'ano': dias = 365
+                valor = estatisticas.contar_altas(cursor, dias)
+            elif tipo == 'pv':
+                horas = 24
+                if periodo == '48h': horas = 48
+                elif periodo == '92h': horas = 92
+                valor = estatisticas.contar_provas_vida(cursor, horas)
+            elif tipo == 'internados':
+                valor = estatisticas.contar_internados(cursor)
+            elif tipo == 'estoque':
+                valor = len(previsao.obter(cursor)['alertas'])
+        finally: conn.close()
+        return valor
+
+    tags = tags_kpi(tipo)
+    valor = cache.obter_ou_calcular(('kpi', tipo, periodo), no_primario(calcular), tags=tags)
     return jsonify({'valor': valor})
 
 @app.route('/api/grafico/remedios/<periodo>')
 @login_required
+@leitura_replica
+@condicional(TAG_MEDICAMENTOS, janela=60)
 def api_remedios(periodo):
     dias = 7
     if periodo == '30d': dias = 30
     elif periodo == '90d': dias = 90
     
+    def calcular():
+        conn = get_db_connection()
+        cursor = conn.cursor()
+        try:
+            # Filtra as saídas de medicamentos pelo período selecionado
+            dados_grafico = estatisticas.saida_medicamentos(cursor, dias, limite=6)
+        finally:
+            conn.close()
+        return {
+            'labels': [r['nome_medicamento'] for r in dados_grafico],
+            'data': [float(r['total']) for r in dados_grafico]
+        }
+
+    return jsonify(cache.obter_ou_calcular(('remedios', dias), no_primario(calcular), tags=(TAG_MEDICAMENTOS,)))
+
+def publicar_estoque(resultado):
+    """Avisa as telas ao vivo sobre os itens baixados por estoque_servico.debitar()."""
+    if resultado['baixados']:
+        eventos.publicar('estoque', 'estoque.alterado', {'ids': [b['id'] for b in resultado['baixados']]})
+
+def resolver_medicamentos(cursor, itens):
+    """Troca nomes digitados pelo item mais parecido do catálogo antes da baixa (ver catalogo.py)."""
+    if catalogo.precisa_reconstruir():
+        catalogo.reconstruir(cursor)
+    itens, correcoes = catalogo.resolver_itens(itens)
+    for digitado, encontrado in correcoes:
+        flash(f"'{digitado}' foi entendido como '{encontrado}' na baixa do estoque.", "warning")
+    return itens
+
+@app.route('/api/medicamentos/sugestao')
+@login_required
+def api_medicamentos_sugestao():
+    # ?q=<início ou trecho do nome>&limite=8 (autocompletar dos formulários)
+    if catalogo.precisa_reconstruir():
+        conn = get_db_connection()
+        try:
+            catalogo.reconstruir(conn.cursor())
+        finally:
+            conn.close()
+    return jsonify(catalogo.sugerir(request.args.get('q', ''), request.args.get('limite', type=int)))
+
+@app.route('/api/eventos')
+@login_required
+def api_eventos():
+    # Deltas ao vivo (SSE) para pacientes, provas de vida e dashboard; ver eventos.py
+    canais = [c for c in request.args.get('canais', '').split(',') if c in eventos.CANAIS]
+    ultimo = request.headers.get('Last-Event-ID') or request.args.get('ultimo')
+    fluxo = eventos.barramento.fluxo(canais, ultimo)
+    return Response(stream_with_context(fluxo), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/cache/stats')
+@login_required
+def api_cache_stats():
+    if session.get('nivel') != 'admin': return "Negado", 403
+    return jsonify(cache.estatisticas())
+
+@app.route('/api/db/pool')
+@login_required
+def api_pool_stats():
+    if session.get('nivel') != 'admin': return "Negado", 403
+    stats = get_pool().estatisticas()
+    if REPLICAS_CONFIG:
+        stats['leitura'] = get_roteador().estatisticas()
+    return jsonify(stats)
+
+@app.route('/metrics')
+def metrics():
+    # Formato Prometheus; liberado para o coletor (token) e para admins
+    if not metricas.coletor_autorizado(request.headers.get('Authorization')) and session.get('nivel') != 'admin':
+        return "Negado", 403
+    pool = get_pool().estatisticas()
+    extras = [(f"hospitalar_pool_{chave}", f"Pool de conexões: {chave}.", valor)
+              for chave, valor in pool.items() if isinstance(valor, (int, float))]
+    extras += [(f"hospitalar_cache_{chave}", f"Cache: {chave}.", valor)
+               for chave, valor in cache.estatisticas().items() if isinstance(valor, (int, float))]
+    return Response(metricas.exportar(extras), mimetype='text/plain; version=0.0.4; charset=utf-8')
+
+# ==============================================================================
+# ⏳ TAREFAS EM SEGUNDO PLANO E RELATÓRIOS (ver tarefas.py)
+# ==============================================================================
+
+def ler_parametros_tarefa(tipo, origem):
+    """Parâmetros declarados da tarefa, como inteiros; None se algum for inválido."""
+    padrao = tarefas.parametros_padrao()
+    parametros = {}
+    for nome in tarefas.TAREFAS[tipo]['parametros']:
+        try:
+            parametros[nome] = int(origem.get(nome, padrao.get(nome)))
+        except (TypeError, ValueError):
+            return None
+    if not 1 <= parametros.get('mes', 1) <= 12 or not 2000 <= parametros.get('ano', 2000) <= 2100:
+        return None
+    return parametros
+
+@app.route('/api/relatorios/<tipo>')
+@login_required
+def api_relatorio(tipo):
+    # ?ano=AAAA&mes=MM; 202 enquanto o primeiro cálculo não termina
+    if tipo not in tarefas.TAREFAS or not tarefas.TAREFAS[tipo]['relatorio']:
+        return jsonify({'erro': 'Relatório não encontrado'}), 404
+    parametros = ler_parametros_tarefa(tipo, request.args)
+    if parametros is None:
+        return jsonify({'erro': 'Parâmetros inválidos'}), 400
+    try:
+        return jsonify(tarefas.relatorio(get_db_connection, tipo, parametros, session['usuario']))
+    except tarefas.RelatorioPendente as pendente:
+        tarefa_id = pendente.args[0]
+        return jsonify({'status': 'pendente', 'tarefa_id': tarefa_id,
+                        'acompanhar': url_for('api_tarefa', tarefa_id=tarefa_id)}), 202, {'Retry-After': '5'}
+
+@app.route('/api/tarefas', methods=['POST'])
+@login_required
+def api_enfileirar_tarefa():
+    # {"tipo": "reconstruir_estatisticas"} ou {"tipo": "censo_mensal", "parametros": {"ano": 2024, "mes": 5}}
+    if session.get('nivel') not in ['admin', 'tecnico']: return "Negado", 403
+    dados = request.get_json(silent=True) or {}
+    tipo = dados.get('tipo')
+    if tipo not in tarefas.TAREFAS:
+        return jsonify({'erro': 'Tipo de tarefa desconhecido'}), 400
+    parametros = ler_parametros_tarefa(tipo, dados.get('parametros') or {})
+    if parametros is None:
+        return jsonify({'erro': 'Parâmetros inválidos'}), 400
     conn = get_db_connection()
-    cursor = conn.cursor()
-    # Filtra as saídas de medicamentos pelo período selecionado
-    cursor.execute("""
-        SELECT nome_medicamento, SUM(quantidade_removida) as total 
-        FROM EstoqueBaixas 
-        WHERE data_hora >= DATE_SUB(NOW(), INTERVAL %s DAY)
-        GROUP BY nome_medicamento 
-        ORDER BY total DESC LIMIT 6
-    """, (dias,))
-    dados_grafico = cursor.fetchall()
+    tarefa_id = tarefas.enfileirar(conn, tipo, parametros, criada_por=session['usuario'])
     conn.close()
-    
-    return jsonify({
-        'labels': [r['nome_medicamento'] for r in dados_grafico],
-        'data': [float(r['total']) for r in dados_grafico]
-    })
+    return jsonify({'tarefa_id': tarefa_id, 'acompanhar': url_for('api_tarefa', tarefa_id=tarefa_id)}), 202
+
+@app.route('/api/tarefas/<int:tarefa_id>')
+@login_required
+def api_tarefa(tarefa_id):
+    conn = get_db_connection()
+    tarefa = tarefas.consultar(conn, tarefa_id)
+    conn.close()
+    if tarefa is None:
+        return jsonify({'erro': 'Tarefa não encontrada'}), 404
+    return jsonify(tarefa)
 
 # ==============================================================================
 # 👥 GESTÃO DE USUÁRIOS (MANTIDO)
@@ -219,11 +455,7 @@ def api_remedios(periodo):
 @login_required
 def gerenciar_usuarios():
     if session['nivel'] not in ['admin', 'tecnico']: return redirect(url_for('dashboard'))
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT id, nome_completo, usuario, nivel_acesso, nacionalidade FROM Usuarios ORDER BY nivel_acesso")
-    usuarios = cursor.fetchall()
-    conn.close()
+    usuarios = consulta_preguicosa("SELECT id, nome_completo, usuario, nivel_acesso, nacionalidade FROM Usuarios ORDER BY nivel_acesso")
     niveis = ['admin', 'tecnico', 'enfermeiro', 'estagiario'] if session['nivel'] == 'admin' else ['tecnico', 'enfermeiro', 'estagiario']
     return render_template('gerenciar_usuarios.html', usuarios=usuarios, nivel_logado=session['nivel'], niveis_permitidos=niveis)
 
@@ -256,6 +488,7 @@ def adicionar_usuario():
             data_nasc
         ))
         conn.commit()
+        cache.invalidar(TAG_USUARIOS)
         flash("Usuário cadastrado com sucesso!", "success")
     except IntegrityError: 
         flash("Login já existe!", "danger")
@@ -281,6 +514,7 @@ def editar_usuario(user_id):
         cursor.execute(sql, (dados['nome_completo'], dados['usuario'], dados['nivel_acesso'], dados['nacionalidade'], user_id))
     conn.commit()
     conn.close()
+    cache.invalidar(TAG_USUARIOS)
     return redirect(url_for('gerenciar_usuarios'))
 
 @app.route('/usuarios/excluir/<int:user_id>', methods=['POST'])
@@ -292,6 +526,7 @@ def excluir_usuario(user_id):
     cursor.execute("DELETE FROM Usuarios WHERE id = %s", (user_id,))
     conn.commit()
     conn.close()
+    cache.invalidar(TAG_USUARIOS)
     return redirect(url_for('gerenciar_usuarios'))
 
 # ==============================================================================
@@ -300,45 +535,135 @@ def excluir_usuario(user_id):
 
 @app.route('/pacientes')
 @login_required
+@condicional(TAG_INTERNACOES)
 def pacientes():
+    args = request.args
+    where, params = ["status = 'internado'"], []
+    paginacao.filtro_prefixo('nome', args.get('paciente'), where, params)
+    paginacao.filtro_igual('prioridade_atencao', args.get('prioridade'), where, params)
+    paginacao.filtro_igual('usuario_internacao', args.get('usuario'), where, params)
+
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Pacientes WHERE status = 'internado' ORDER BY nome")
-    pacientes_internados = cursor.fetchall()
+    pagina = paginacao.paginar(cursor, "SELECT * FROM Pacientes", where, params,
+                               'nome', 'id', 'nome', decrescente=False)
     conn.close()
-    return render_template('pacientes.html', pacientes=pacientes_internados)
+    return render_template('pacientes.html', pacientes=pagina['itens'], pagina=pagina, filtros=args)
+
+@app.route('/api/worklist')
+@login_required
+def api_worklist():
+    # ?limite=20: pacientes com prova de vida vencida, mais urgentes primeiro (ver triagem.py)
+    limite = min(request.args.get('limite', triagem.TRIAGEM_CONFIG['limite_padrao'], type=int) or 1,
+                 triagem.TRIAGEM_CONFIG['limite_maximo'])
+    if triagem.fila.precisa_reconstruir():
+        conn = get_db_connection()
+        try:
+            triagem.fila.reconstruir(conn.cursor())
+        finally:
+            conn.close()
+    return jsonify({'pacientes': triagem.fila.vencidos(limite), 'internados': len(triagem.fila),
+                    'intervalos_minutos': triagem.TRIAGEM_CONFIG['intervalos']})
+
+@app.route('/api/pacientes/busca')
+@login_required
+@condicional(TAG_INTERNACOES, TAG_ALTAS)
+def api_busca_pacientes():
+    # ?q=<nome, CPF ou CEP>&status=internado|alta&limite=10
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        resultados = busca.buscar_pacientes(cursor, request.args.get('q', ''),
+                                            request.args.get('status'),
+                                            request.args.get('limite', busca.LIMITE_PADRAO, type=int))
+    finally:
+        conn.close()
+    return jsonify(resultados)
+
+@app.route('/api/cep/<cep>')
+@login_required
+def api_cep(cep):
+    # Cache em memória -> tabela Ceps -> buscador externo opcional (ver ceps.py)
+    cep = ceps.normalizar(cep)
+    if cep is None:
+        return jsonify({'erro': "CEP deve ter 8 dígitos."}), 400
+    resultado = ceps.consultar(cep, get_db_connection)
+    if resultado == ceps.NAO_ENCONTRADO:
+        return jsonify({'erro': "CEP não encontrado."}), 404
+    if resultado == ceps.INDISPONIVEL:
+        return jsonify({'erro': "Consulta de CEP indisponível; preencha o endereço manualmente."}), 503
+    return jsonify(resultado)
 
 @app.route('/paciente/detalhes/<int:paciente_id>')
 @login_required
+@condicional(lambda paciente_id: versoes.paciente(paciente_id))
 def detalhes_prontuario(paciente_id):
     conn = get_db_connection()
     cursor = conn.cursor()
     
     cursor.execute("SELECT * FROM Pacientes WHERE id = %s", (paciente_id,))
     paciente = cursor.fetchone()
+    if paciente is None and arquivamento.existe_arquivo(cursor):
+        cursor.execute("SELECT * FROM PacientesArquivo WHERE id = %s", (paciente_id,))
+        paciente = cursor.fetchone()
 
-    # Query ajustada para os nomes reais das suas colunas
-    cursor.execute("""
+    # Só uma página do histórico (das duas camadas); a tendência vem de /api/paciente/<id>/sinais
+    colunas = """
         SELECT id, data_hora, pressao_arterial, saturacao, batimentos_cardiacos, 
                glicose, temperatura, evolucao, quem_efetuou 
-        FROM provasdevida 
-        WHERE paciente_id = %s 
-        ORDER BY data_hora DESC
-    """, (paciente_id,))
-    provas_vida = cursor.fetchall()
-
+    """
+    sql = [colunas + " FROM provasdevida"]
+    if arquivamento.existe_arquivo(cursor):
+        sql.append(colunas + " FROM ProvasDeVidaArquivo")
     conn.close()
-    return render_template('detalhes_prontuario.html', paciente=paciente, provas_vida=provas_vida)
 
-@app.route('/prontuario')
+    def carregar_pagina():
+        conn = get_db_connection()
+        try:
+            return paginacao.paginar(conn.cursor(), sql, ['paciente_id = %s'], [paciente_id], 'data_hora', 'id', 'data_hora')
+        finally:
+            conn.close()
+
+    # Histórico em cache de fragmento por paciente/página; só consulta se não estiver lá
+    pagina = fragmentos.preguicoso(carregar_pagina)
+    provas_vida = fragmentos.preguicoso(lambda: pagina['itens'])
+    return render_template('detalhes_prontuario.html', paciente=paciente, provas_vida=provas_vida, pagina=pagina)
+
+@app.route('/api/paciente/<int:paciente_id>/sinais')
 @login_required
-def prontuario():
+@condicional(lambda paciente_id: versoes.paciente(paciente_id))
+def api_sinais_paciente(paciente_id):
+    def ler_data(nome):
+        valor = request.args.get(nome)
+        if not valor:
+            return None
+        try:
+            return datetime.fromisoformat(valor.replace(' ', 'T'))
+        except ValueError:
+            return False
+
+    de, ate = ler_data('de'), ler_data('ate')
+    if de is False or ate is False:
+        return jsonify({'erro': "Datas inválidas (use AAAA-MM-DD ou AAAA-MM-DDTHH:MM)."}), 400
+    ate = ate or datetime.now()
+    de = de or ate - timedelta(days=7)
+    if de >= ate:
+        return jsonify({'erro': "'de' precisa ser anterior a 'ate'."}), 400
+
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT nome_medicamento FROM Estoque ORDER BY nome_medicamento ASC")
-    medicamentos = cursor.fetchall()
-    conn.close()
-    return render_template('prontuario_form.html', medicamentos=medicamentos, agora=datetime.now().strftime('%Y-%m-%dT%H:%M'))
+    try:
+        dados = sinais_vitais.serie(cursor, paciente_id, de, ate, request.args.get('resolucao'))
+    finally:
+        conn.close()
+    dados['de'], dados['ate'] = de.isoformat(timespec='minutes'), ate.isoformat(timespec='minutes')
+    return jsonify(dados)
+
+@app.route('/prontuario')
+@login_required
+def prontuario():
+    # Medicamentos vêm do autocompletar (/api/medicamentos/sugestao), não da lista inteira
+    return render_template('prontuario_form.html', agora=datetime.now().strftime('%Y-%m-%dT%H:%M'))
 
 @app.route('/prontuario/salvar', methods=['POST'])
 @login_required
@@ -354,50 +679,43 @@ def salvar_prontuario():
                           procedimento, status, usuario_internacao, prioridade_atencao) 
                           VALUES (%s, %s, %s, %s, %s, %s, %s, %s, 'internado', %s, %s)"""
         
+        data_entrada = dados['hora_entrada'].replace('T', ' ')
+        prioridade = dados.get('prioridade_atencao', 'verde')
         cursor.execute(sql_paciente, (dados['nome_paciente'], dados['data_nascimento'], cpf_limpo, dados['cep'], 
-                                     dados['endereco'], dados['bairro'], dados['hora_entrada'].replace('T', ' '), 
-                                     dados['procedimento'], session['usuario'], dados.get('prioridade_atencao', 'verde')))
+                                     dados['endereco'], dados['bairro'], data_entrada, 
+                                     dados['procedimento'], session['usuario'], prioridade))
+        paciente_id = cursor.lastrowid
+        estatisticas.registrar_entrada(cursor, data_entrada, prioridade, session['usuario'])
 
         # 2. LOGICA DE BAIXA NO ESTOQUE PARA MÚLTIPLOS MEDICAMENTOS
-        # Pegamos as listas do formulário (campos com [])
+        # Pegamos as listas do formulário (campos com []); o nome é digitado
+        # com autocompletar e resolvido no catálogo logo abaixo
         medicamentos = dados.getlist('medicamento_entrada[]')
         doses = dados.getlist('dose[]')
-        outros_nomes = dados.getlist('outro_medicamento_nome[]')
 
+        itens_baixa = []
         for i in range(len(medicamentos)):
-            nome_remedio = medicamentos[i]
-            
-            # Se for "outro", pegamos o nome digitado manualmente
-            if nome_remedio == 'outro':
-                nome_remedio = outros_nomes[i].strip() if i < len(outros_nomes) else ""
-            
+            nome_remedio = medicamentos[i].strip()
             qtd_prescrita = doses[i] if i < len(doses) else "0"
+            if nome_remedio and qtd_prescrita:
+                itens_baixa.append((nome_remedio, qtd_prescrita))
 
-            if nome_remedio and qtd_prescrita and float(qtd_prescrita) > 0:
-                qtd_num = float(qtd_prescrita)
-
-                # Busca o remédio no estoque (Busca exata pelo nome)
-                cursor.execute("SELECT id, quantidade, unidade FROM Estoque WHERE nome_medicamento = %s", (nome_remedio,))
-                item = cursor.fetchone()
-
-                if item:
-                    if item['quantidade'] >= qtd_num:
-                        # Subtrai do estoque principal
-                        nova_qtd = item['quantidade'] - qtd_num
-                        cursor.execute("UPDATE Estoque SET quantidade = %s WHERE id = %s", (nova_qtd, item['id']))
-
-                        # Registra no histórico de baixas para o relatório ficar perfeito
-                        sql_baixa = """INSERT INTO EstoqueBaixas (nome_medicamento, quantidade_removida, unidade, motivo, usuario_baixa) 
-                                       VALUES (%s, %s, %s, %s, %s)"""
-                        cursor.execute(sql_baixa, (nome_remedio, qtd_num, item['unidade'], 
-                                                  f"Prescrição Inicial: {dados['nome_paciente']}", session['usuario']))
-                    else:
-                        flash(f"Atenção: Estoque insuficiente de {nome_remedio} (Saldo: {item['quantidade']}).", "warning")
-                else:
-                    # Se não encontrou no estoque (muito comum se o nome for digitado errado no 'outro')
-                    print(f"Medicamento {nome_remedio} não encontrado para baixa.")
+        # Baixa todos os medicamentos de uma vez (ver estoque_servico.py)
+        itens_baixa = resolver_medicamentos(cursor, itens_baixa)
+        resultado = estoque_servico.debitar(cursor, itens_baixa, f"Prescrição Inicial: {dados['nome_paciente']}", session['usuario'])
+        for aviso in estoque_servico.mensagens(resultado):
+            flash(aviso, "warning")
 
+        versoes.incrementar(cursor, TAG_INTERNACOES, TAG_MEDICAMENTOS, TAG_ESTOQUE, versoes.paciente(paciente_id))
         conn.commit()
+        cache.invalidar(TAG_INTERNACOES, TAG_MEDICAMENTOS, TAG_ESTOQUE)
+        catalogo.invalidar()
+        eventos.publicar('pacientes', 'paciente.internado', {
+            'id': paciente_id, 'nome': dados['nome_paciente'],
+            'prioridade': prioridade, 'data_entrada': data_entrada
+        })
+        triagem.fila.internar(paciente_id, dados['nome_paciente'], prioridade, data_entrada)
+        publicar_estoque(resultado)
         flash("Prontuário e medicações processadas com sucesso!", "success")
         return redirect(url_for('pacientes'))
 
@@ -441,16 +759,22 @@ def prova_vida(paciente_id):
 
     if request.method == 'POST':
         dados = request.form
+        resultado = None
         try:
-            # 1. Salva os sinais vitais
+            # 1. Salva os sinais vitais (PA também em números, ver sinais_vitais.py)
+            agora = datetime.now().replace(microsecond=0)
+            sistolica, diastolica = sinais_vitais.interpretar_pressao(dados.get('pa'))
             sql_pv = """INSERT INTO provasdevida 
-                        (paciente_id, data_hora, pressao_arterial, glicose, saturacao, 
+                        (paciente_id, data_hora, pressao_arterial, pressao_sistolica, pressao_diastolica, glicose, saturacao, 
                          batimentos_cardiacos, quem_efetuou, observacoes, evolucao, temperatura) 
-                        VALUES (%s, NOW(), %s, %s, %s, %s, %s, %s, %s, %s)"""
+                        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
             
             valores = (
                 paciente_id, 
+                agora,
                 dados.get('pa'),
+                sistolica,
+                diastolica,
                 dados.get('glicose'), 
                 dados.get('sat'),
                 dados.get('bpm'),
@@ -460,28 +784,34 @@ def prova_vida(paciente_id):
                 dados.get('temperatura')
             )
             cursor.execute(sql_pv, valores)
+            pv_id = cursor.lastrowid
+            estatisticas.registrar_prova_vida(cursor, agora)
+            sinais_vitais.atualizar(cursor, paciente_id, agora)
 
             # 2. LOGICA DE ESTOQUE (Alimenta o Gráfico e Histórico)
             nome_remedio = dados.get('medicamento_adm')
             qtd_adm = dados.get('quantidade_adm')
             
-            if nome_remedio and qtd_adm and float(qtd_adm) > 0:
-                qtd_f = float(qtd_adm)
-                
-                # Busca a unidade no estoque para o histórico
-                cursor.execute("SELECT unidade FROM Estoque WHERE nome_medicamento = %s", (nome_remedio,))
-                item_estoque = cursor.fetchone()
-                
-                if item_estoque:
-                    # Subtrai do estoque principal
-                    cursor.execute("UPDATE Estoque SET quantidade = quantidade - %s WHERE nome_medicamento = %s", (qtd_f, nome_remedio))
-                    
-                    # REGISTRA NA TABELA DE BAIXAS (Histórico Geral e Gráfico)
-                    sql_hist = """INSERT INTO EstoqueBaixas (nome_medicamento, quantidade_removida, unidade, motivo, usuario_baixa) 
-                                  VALUES (%s, %s, %s, %s, %s)"""
-                    cursor.execute(sql_hist, (nome_remedio, qtd_f, item_estoque['unidade'], f"Adm. Paciente ID {paciente_id}", session['usuario']))
+            if nome_remedio and qtd_adm:
+                itens = resolver_medicamentos(cursor, [(nome_remedio, qtd_adm)])
+                resultado = estoque_servico.debitar(cursor, itens, f"Adm. Paciente ID {paciente_id}", session['usuario'])
+                for aviso in estoque_servico.mensagens(resultado):
+                    flash(aviso, "warning")
 
+            versoes.incrementar(cursor, TAG_PROVAS_VIDA, TAG_MEDICAMENTOS, TAG_ESTOQUE, versoes.paciente(paciente_id))
             conn.commit()
+            cache.invalidar(TAG_PROVAS_VIDA, TAG_MEDICAMENTOS, TAG_ESTOQUE)
+            catalogo.invalidar()
+            triagem.fila.medir(paciente_id, agora)
+            eventos.publicar('provas_vida', 'prova_vida.registrada', {
+                'id': pv_id, 'paciente_id': paciente_id, 'nome_paciente': paciente['nome'],
+                'prioridade': paciente['prioridade_atencao'], 'data_hora': agora.strftime('%d/%m/%Y %H:%M'),
+                'pressao_arterial': dados.get('pa'), 'temperatura': dados.get('temperatura'),
+                'glicose': dados.get('glicose'), 'saturacao': dados.get('sat'),
+                'batimentos_cardiacos': dados.get('bpm'), 'quem_efetuou': session.get('usuario')
+            })
+            if resultado:
+                publicar_estoque(resultado)
             flash("Prova de vida registrada e estoque atualizado!", "success")
             return redirect(url_for('detalhes_prontuario', paciente_id=paciente_id))
 
@@ -493,10 +823,32 @@ def prova_vida(paciente_id):
             conn.close()
 
     # GET: Carrega o formulário (Paciente já foi buscado no início da função)
-    cursor.execute("SELECT nome_medicamento, quantidade FROM Estoque WHERE quantidade > 0")
-    medicamentos = cursor.fetchall()
     conn.close()
-    return render_template('prova_vida_form.html', paciente=paciente, medicamentos_estoque=medicamentos)
+    return render_template('prova_vida_form.html', paciente=paciente)
+
+@app.route('/api/provas_vida/lote', methods=['POST'])
+@login_required
+def api_provas_vida_lote():
+    # Monitores e tablets offline enviam leituras acumuladas (JSON ou NDJSON); ver ingestao.py
+    try:
+        leituras = ingestao.ler_corpo(request.get_data(as_text=True), request.content_type)
+    except ingestao.LeituraInvalida as e:
+        return jsonify({'erro': str(e)}), 400
+    if len(leituras) > ingestao.MAX_LEITURAS:
+        return jsonify({'erro': f"Máximo de {ingestao.MAX_LEITURAS} leituras por envio."}), 413
+
+    conn = get_db_connection()
+    try:
+        resumo = ingestao.ingerir(conn, leituras, session['usuario'])
+    finally:
+        conn.close()
+
+    if resumo['inseridas']:
+        cache.invalidar(TAG_PROVAS_VIDA)
+        eventos.publicar('provas_vida', 'prova_vida.lote', {
+            'total': resumo['inseridas'], 'pacientes': resumo['pacientes']
+        })
+    return jsonify(resumo), 200 if not resumo['erros'] else 207
 
 @app.route('/prova_vida/editar/<int:pv_id>', methods=['GET', 'POST'])
 @login_required
@@ -511,15 +863,27 @@ def editar_prova_vida(pv_id):
     if request.method == 'POST':
         dados = request.form
         try:
+            sistolica, diastolica = sinais_vitais.interpretar_pressao(dados.get('pa'))
             sql = """UPDATE provasdevida SET 
-                     pressao_arterial=%s, glicose=%s, saturacao=%s, 
+                     pressao_arterial=%s, pressao_sistolica=%s, pressao_diastolica=%s, glicose=%s, saturacao=%s, 
                      batimentos_cardiacos=%s, temperatura=%s, evolucao=%s 
                      WHERE id=%s"""
             cursor.execute(sql, (
-                dados.get('pa'), dados.get('glicose'), dados.get('sat'),
+                dados.get('pa'), sistolica, diastolica, dados.get('glicose'), dados.get('sat'),
                 dados.get('bpm'), dados.get('temperatura'), dados.get('evolucao'), pv_id
             ))
+            cursor.execute("SELECT paciente_id, data_hora FROM provasdevida WHERE id = %s", (pv_id,))
+            registro = cursor.fetchone()
+            if registro:
+                sinais_vitais.atualizar(cursor, registro['paciente_id'], registro['data_hora'])
+                versoes.incrementar(cursor, TAG_PROVAS_VIDA, versoes.paciente(registro['paciente_id']))
             conn.commit()
+            cache.invalidar(TAG_PROVAS_VIDA)
+            eventos.publicar('provas_vida', 'prova_vida.alterada', {
+                'id': pv_id, 'pressao_arterial': dados.get('pa'), 'temperatura': dados.get('temperatura'),
+                'glicose': dados.get('glicose'), 'saturacao': dados.get('sat'),
+                'batimentos_cardiacos': dados.get('bpm')
+            })
             flash("Registro atualizado com sucesso!", "success")
             return redirect(url_for('provas_vida_geral'))
         except Exception as e:
@@ -545,13 +909,19 @@ def excluir_prova_vida(pv_id):
     cursor = conn.cursor()
     try:
         # Pegamos o paciente_id antes de deletar para saber para onde retornar
-        cursor.execute("SELECT paciente_id FROM provasdevida WHERE id = %s", (pv_id,))
+        cursor.execute("SELECT paciente_id, data_hora FROM provasdevida WHERE id = %s", (pv_id,))
         registro = cursor.fetchone()
         
         if registro:
             p_id = registro['paciente_id']
             cursor.execute("DELETE FROM provasdevida WHERE id = %s", (pv_id,))
+            estatisticas.registrar_prova_vida(cursor, registro['data_hora'], sinal=-1)
+            sinais_vitais.atualizar(cursor, p_id, registro['data_hora'])
+            versoes.incrementar(cursor, TAG_PROVAS_VIDA, versoes.paciente(p_id))
             conn.commit()
+            cache.invalidar(TAG_PROVAS_VIDA)
+            eventos.publicar('provas_vida', 'prova_vida.excluida', {'id': pv_id})
+            triagem.fila.atualizar_paciente(cursor, p_id)
             flash("Registro excluído com sucesso!", "success")
             return redirect(url_for('detalhes_prontuario', paciente_id=p_id))
         
@@ -581,9 +951,25 @@ def dar_alta(paciente_id):
     if session['nivel'] not in ['admin', 'tecnico']: return "Negado", 403
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("UPDATE Pacientes SET status = 'alta', data_baixa = NOW(), nome_baixa = %s WHERE id = %s", (session['usuario'], paciente_id))
-    conn.commit()
-    conn.close()
+    try:
+        # Trava a linha para que duas altas simultâneas não contem duas vezes
+        cursor.execute("SELECT * FROM Pacientes WHERE id = %s FOR UPDATE", (paciente_id,))
+        paciente = cursor.fetchone()
+        if paciente and paciente['status'] == 'internado':
+            agora = datetime.now()
+            cursor.execute("UPDATE Pacientes SET status = 'alta', data_baixa = %s, nome_baixa = %s WHERE id = %s", (agora, session['usuario'], paciente_id))
+            estatisticas.registrar_alta(cursor, paciente, agora)
+            versoes.incrementar(cursor, TAG_ALTAS, TAG_INTERNACOES, versoes.paciente(paciente_id))
+        conn.commit()
+        cache.invalidar(TAG_ALTAS, TAG_INTERNACOES)
+        if paciente and paciente['status'] == 'internado':
+            eventos.publicar('pacientes', 'paciente.alta', {'id': paciente_id})
+            triagem.fila.remover(paciente_id)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
     flash("Alta registrada!", "success")
     return redirect(url_for('arquivo'))
 
@@ -595,12 +981,14 @@ def excluir_paciente(id):
         return redirect(url_for('pacientes'))
     
     conn = get_db_connection()
-    cursor = conn.cursor()
     try:
-        # Deleta o paciente (o banco cuidará das provas de vida se houver ON DELETE CASCADE, 
-        # senão, você deve deletar as provas de vida dele antes)
-        cursor.execute("DELETE FROM Pacientes WHERE id = %s", (id,))
-        conn.commit()
+        # Provas de vida e administrações saem antes, em lotes (ver arquivamento.py)
+        if arquivamento.expurgar_paciente(conn, id) is None:
+            flash("Paciente não encontrado.", "danger")
+            return redirect(url_for('pacientes'))
+        cache.invalidar(TAG_ALTAS, TAG_INTERNACOES, TAG_PROVAS_VIDA)
+        eventos.publicar('pacientes', 'paciente.excluido', {'id': id})
+        triagem.fila.remover(id)
         flash("Paciente excluído com sucesso!", "success")
     except Exception as e:
         conn.rollback()
@@ -612,27 +1000,57 @@ def excluir_paciente(id):
 
 @app.route('/arquivo')
 @login_required
+@leitura_replica
+@condicional(TAG_ALTAS)
 def arquivo():
+    args = request.args
+    where, params = ["status = 'alta'"], []
+    paginacao.filtro_periodo('data_baixa', args, where, params)
+    paginacao.filtro_prefixo('nome', args.get('paciente'), where, params)
+    paginacao.filtro_igual('prioridade_atencao', args.get('prioridade'), where, params)
+    paginacao.filtro_igual('nome_baixa', args.get('usuario'), where, params)
+
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Pacientes WHERE status = 'alta' ORDER BY data_baixa DESC")
-    pacientes_alta = cursor.fetchall()
+    # Altas recentes (Pacientes) e antigas (PacientesArquivo) na mesma lista
+    fontes = ["SELECT * FROM Pacientes"]
+    if arquivamento.existe_arquivo(cursor):
+        fontes.append("SELECT * FROM PacientesArquivo")
+    pagina = paginacao.paginar(cursor, fontes, where, params,
+                               'data_baixa', 'id', 'data_baixa')
     conn.close()
-    return render_template('arquivo.html', pacientes=pacientes_alta)
+    return render_template('arquivo.html', pacientes=pagina['itens'], pagina=pagina, filtros=args)
 
 # ==============================================================================
 # 📦 ESTOQUE (VERSÃO CORRIGIDA E SEM DUPLICIDADE)
 # ==============================================================================
 
+def previsao_consumo():
+    conn = get_db_connection()
+    try:
+        return previsao.obter(conn.cursor())
+    finally:
+        conn.close()
+
+# Dias de cobertura da previsão também andam com o calendário, não só com as baixas
 @app.route('/estoque')
 @login_required
+@condicional(TAG_ESTOQUE, janela=3600)
 def estoque():
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM Estoque ORDER BY nome_medicamento")
-    itens = cursor.fetchall()
-    conn.close()
-    return render_template('estoque.html', itens=itens)
+    itens = consulta_preguicosa("SELECT * FROM Estoque ORDER BY nome_medicamento")
+    return render_template('estoque.html', itens=itens, previsao=fragmentos.preguicoso(previsao_consumo))
+
+@app.route('/api/estoque/previsao')
+@login_required
+@leitura_replica
+def api_estoque_previsao():
+    # ?status=ruptura,repor filtra os itens; sem filtro vêm todos
+    # (a previsão também vai para o cache compartilhado, então vem do primário)
+    resultado = no_primario(previsao_consumo)()
+    status = [s for s in request.args.get('status', '').split(',') if s in previsao.STATUS]
+    itens = [i for i in resultado['itens'] if i['status'] in status] if status else resultado['itens']
+    return jsonify({'calculado_em': resultado['calculado_em'], 'parametros': resultado['parametros'],
+                    'alertas': len(resultado['alertas']), 'itens': itens})
 
 @app.route('/estoque/salvar', methods=['POST'])
 @login_required
@@ -647,13 +1065,13 @@ def salvar_estoque():
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        sql = """INSERT INTO Estoque (nome_medicamento, quantidade, unidade, data_ultima_entrada, usuario_ultima_alteracao) 
-                  VALUES (%s, %s, %s, NOW(), %s) ON DUPLICATE KEY UPDATE 
-                  quantidade = quantidade + VALUES(quantidade), data_ultima_entrada = NOW(), 
-                  usuario_ultima_alteracao = VALUES(usuario_ultima_alteracao)"""
-        
-        cursor.execute(sql, (nome_com_dosagem, int(dados['quantidade']), dados['unidade'], session['usuario']))
+        # Soma ao saldo e registra a entrada na razão de movimentos
+        item_id = estoque_servico.registrar_entrada(cursor, nome_com_dosagem, int(dados['quantidade']), dados['unidade'], session['usuario'])
+        versoes.incrementar(cursor, TAG_ESTOQUE)
         conn.commit()
+        cache.invalidar(TAG_ESTOQUE)
+        catalogo.invalidar()
+        eventos.publicar('estoque', 'estoque.alterado', {'ids': [item_id]})
         flash(f"Estoque de {nome_com_dosagem} atualizado!", "success")
     except Exception as e:
         print(f"Erro ao salvar: {e}")
@@ -672,10 +1090,13 @@ def editar_estoque(item_id):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        sql = """UPDATE Estoque SET nome_medicamento = %s, quantidade = %s, unidade = %s, 
-                  data_ultima_entrada = NOW(), usuario_ultima_alteracao = %s WHERE id = %s"""
-        cursor.execute(sql, (dados['nome_medicamento'], dados['quantidade'], dados['unidade'], session['usuario'], item_id))
+        # A diferença de saldo vira um movimento de ajuste na razão
+        estoque_servico.ajustar(cursor, item_id, dados['nome_medicamento'], dados['quantidade'], dados['unidade'], session['usuario'])
+        versoes.incrementar(cursor, TAG_ESTOQUE)
         conn.commit()
+        cache.invalidar(TAG_ESTOQUE)
+        catalogo.invalidar()
+        eventos.publicar('estoque', 'estoque.alterado', {'ids': [item_id]})
     finally: conn.close()
     return redirect(url_for('estoque'))
 
@@ -701,25 +1122,17 @@ def baixa_perda_estoque(item_id):
     conn = get_db_connection()
     cursor = conn.cursor()
     try:
-        # Busca os dados atuais
-        cursor.execute("SELECT nome_medicamento, unidade, quantidade FROM Estoque WHERE id = %s", (item_id,))
-        item = cursor.fetchone()
+        # 1. Baixa atômica + histórico (ver estoque_servico.py)
+        resultado = estoque_servico.debitar(cursor, [(item_id, quantidade_baixa)], motivo, session['usuario'], por='id')
         
-        if item and item['quantidade'] >= quantidade_baixa:
-            # 1. TENTA INSERIR NO HISTÓRICO
-            cursor.execute("""
-                INSERT INTO EstoqueBaixas (nome_medicamento, quantidade_removida, unidade, motivo, usuario_baixa)
-                VALUES (%s, %s, %s, %s, %s)
-            """, (item['nome_medicamento'], quantidade_baixa, item['unidade'], motivo, session['usuario']))
-            
-            # 2. ATUALIZA OU DELETA O ITEM
-            nova_qtd = item['quantidade'] - quantidade_baixa
-            if nova_qtd <= 0:
-                cursor.execute("DELETE FROM Estoque WHERE id = %s", (item_id,))
-            else:
-                cursor.execute("UPDATE Estoque SET quantidade = %s WHERE id = %s", (nova_qtd, item_id))
-            
+        if resultado['baixados']:
+            # O item que zera continua no cadastro para manter a razão de movimentos
+            item = resultado['baixados'][0]
+            versoes.incrementar(cursor, TAG_MEDICAMENTOS, TAG_ESTOQUE)
             conn.commit()
+            cache.invalidar(TAG_MEDICAMENTOS, TAG_ESTOQUE)
+            catalogo.invalidar()
+            publicar_estoque(resultado)
             flash(f"Baixa de {item['nome_medicamento']} realizada com sucesso!", "success")
         else:
             flash("Quantidade insuficiente no estoque.", "warning")
@@ -733,16 +1146,76 @@ def baixa_perda_estoque(item_id):
     
     return redirect(url_for('estoque'))
 
+@app.route('/api/estoque/<int:item_id>/saldo')
+@login_required
+@condicional(TAG_ESTOQUE)
+def api_estoque_saldo(item_id):
+    # ?em=AAAA-MM-DD HH:MM (padrão: agora)
+    em = request.args.get('em') or datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        saldo = estoque_servico.saldo_em(cursor, item_id, em)
+    finally:
+        conn.close()
+    return jsonify({'estoque_id': item_id, 'em': em, 'saldo': saldo})
+
+@app.route('/api/estoque/<int:item_id>/movimentos')
+@login_required
+@condicional(TAG_ESTOQUE)
+def api_estoque_movimentos(item_id):
+    # ?de=AAAA-MM-DD&ate=AAAA-MM-DD (ambos os dias inclusos)
+    try:
+        de = datetime.strptime(request.args.get('de', '1900-01-01'), '%Y-%m-%d')
+        ate = datetime.strptime(request.args.get('ate', datetime.now().strftime('%Y-%m-%d')), '%Y-%m-%d')
+    except ValueError:
+        return jsonify({'erro': 'Datas no formato AAAA-MM-DD.'}), 400
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    try:
+        saldo_inicial = estoque_servico.saldo_em(cursor, item_id, de)
+        movimentos = estoque_servico.movimentos_periodo(cursor, item_id, de, ate + timedelta(days=1))
+    finally:
+        conn.close()
+    return jsonify({
+        'estoque_id': item_id,
+        'saldo_inicial': saldo_inicial,
+        'movimentos': [{**m, 'quantidade': float(m['quantidade']), 'data_hora': m['data_hora'].strftime('%Y-%m-%d %H:%M:%S')} for m in movimentos]
+    })
+
 # --- NOVO MÓDULO: HISTÓRICO DE BAIXAS ---
 @app.route('/estoque/historico_baixas')
 @login_required
+@leitura_replica
 def estoque_historico_baixas():
+    args = request.args
+    where, params = [], []
+    paginacao.filtro_periodo('data_hora', args, where, params)
+    paginacao.filtro_prefixo('nome_medicamento', args.get('medicamento'), where, params)
+    paginacao.filtro_igual('usuario_baixa', args.get('usuario'), where, params)
+
     conn = get_db_connection()
     cursor = conn.cursor()
-    cursor.execute("SELECT * FROM EstoqueBaixas ORDER BY data_hora DESC")
-    baixas = cursor.fetchall()
+    pagina = paginacao.paginar(cursor, "SELECT * FROM EstoqueBaixas", where, params,
+                               'data_hora', 'id', 'data_hora')
     conn.close()
-    return render_template('estoque_baixas.html', baixas=baixas)
+    return render_template('estoque_baixas.html', baixas=pagina['itens'], pagina=pagina, filtros=args)
+
+@app.route('/exportar/<nome>.<formato>')
+@login_required
+def exportar(nome, formato):
+    if session.get('nivel') not in ['admin', 'tecnico']:
+        flash("Acesso negado.", "danger")
+        return redirect(url_for('dashboard'))
+    if nome not in exportacao.EXPORTACOES or formato not in exportacao.FORMATOS:
+        return "Exportação não encontrada", 404
+
+    # Linhas lidas e enviadas aos poucos (cursor do servidor); ver exportacao.py
+    conteudo = exportacao.abrir(nome, formato, request.args)
+    nome_arquivo = exportacao.nome_arquivo(nome, formato)
+    return Response(conteudo, mimetype=exportacao.FORMATOS[formato],
+                    headers={'Content-Disposition': f'attachment; filename="{nome_arquivo}"',
+                             'X-Accel-Buffering': 'no'})
 
 @app.route('/conversor')
 @login_required
@@ -750,20 +1223,152 @@ def conversor(): return render_template('conversor.html')
 
 @app.route('/provas_vida_geral')
 @login_required
+@leitura_replica
 def provas_vida_geral():
+    args = request.args
+    where, params = [], []
+    paginacao.filtro_periodo('pv.data_hora', args, where, params)
+    paginacao.filtro_prefixo('p.nome', args.get('paciente'), where, params)
+    paginacao.filtro_igual('pv.quem_efetuou', args.get('usuario'), where, params)
+    paginacao.filtro_igual('p.prioridade_atencao', args.get('prioridade'), where, params)
+
     conn = get_db_connection()
     cursor = conn.cursor()
     sql = """
         SELECT pv.*, p.nome as nome_paciente 
         FROM ProvasDeVida pv
         JOIN Pacientes p ON pv.paciente_id = p.id
-        ORDER BY pv.data_hora DESC
     """
-    cursor.execute(sql)
-    historico = cursor.fetchall()
+    pagina = paginacao.paginar(cursor, sql, where, params, 'pv.data_hora', 'pv.id', 'data_hora')
     conn.close()
-    return render_template('provas_vida_geral.html', historico=historico)
+    return render_template('provas_vida_geral.html', historico=pagina['itens'], pagina=pagina, filtros=args)
+
+@app.cli.command('reconstruir-estatisticas')
+def reconstruir_estatisticas():
+    """Recalcula as tabelas de resumo do dashboard a partir do histórico."""
+    conn = get_db_connection()
+    estatisticas.reconstruir(conn)
+    print("✅ Estatísticas reconstruídas.")
+
+@app.cli.command('reconstruir-sinais')
+def reconstruir_sinais():
+    """Converte a PA em texto e recalcula as séries de sinais vitais."""
+    conn = get_db_connection()
+    sinais_vitais.reconstruir(conn)
+    print("✅ Séries de sinais vitais reconstruídas.")
+
+@app.cli.command('importar-ceps')
+@click.argument('caminho')
+def importar_ceps(caminho):
+    """Importa um arquivo CSV de CEPs para a tabela local."""
+    conn = get_db_connection()
+    total = ceps.importar_arquivo(conn, caminho)
+    print(f"✅ {total} CEPs importados.")
+
+@app.cli.command('exportar-banco')
+@click.argument('pasta')
+@click.option('--processos', default=transferencia.PROCESSOS, help="Conexões em paralelo.")
+@click.option('--linhas-por-arquivo', default=transferencia.LINHAS_POR_ARQUIVO)
+def exportar_banco(pasta, processos, linhas_por_arquivo):
+    """Exporta todas as tabelas em blocos .tsv.gz (ver transferencia.py)."""
+    relatorio = transferencia.exportar(pasta, processos, linhas_por_arquivo)
+    total = transferencia.imprimir_relatorio(relatorio)
+    print(f"✅ {total} linhas exportadas para {pasta}.")
+
+@app.cli.command('importar-banco')
+@click.argument('origem')
+@click.option('--processos', default=transferencia.PROCESSOS, help="Conexões em paralelo.")
+@click.option('--substituir', is_flag=True, help="Esvazia as tabelas de destino antes de importar.")
+@click.option('--sem-load-data', is_flag=True, help="Usa só INSERTs em lote.")
+def importar_banco(origem, processos, substituir, sem_load_data):
+    """Importa uma pasta de exportar-banco ou um dump .sql do mysqldump."""
+    inicio = datetime.now()
+    relatorio = transferencia.importar(origem, processos, substituir, not sem_load_data)
+    total = transferencia.imprimir_relatorio(relatorio)
+    print(f"✅ {total} linhas importadas em {(datetime.now() - inicio).total_seconds():.1f}s.")
+
+@app.cli.command('trabalhador')
+@click.option('--threads', type=int, default=None, help="Threads consumindo a fila (padrão: TAREFAS_CONFIG).")
+@click.option('--uma-vez', is_flag=True, help="Executa o que estiver pendente e sai (para cron).")
+def trabalhador(threads, uma_vez):
+    """Executa as tarefas em segundo plano (relatórios, reconstruções, arquivamento)."""
+    processo = tarefas.Trabalhador(lambda: obter_conexao_pool(pymysql.cursors.DictCursor), threads)
+    if uma_vez:
+        print(f"✅ {processo.esvaziar()} tarefa(s) executada(s).")
+        return
+    print(f"Trabalhador {processo.nome} com {processo.threads} thread(s). Ctrl+C para encerrar.")
+    processo.executar()
+
+@app.cli.command('arquivar-altas')
+@click.option('--dias', type=int, default=None, help="Alta há mais de N dias (padrão: ARQUIVO_CONFIG).")
+@click.option('--lote', type=int, default=None, help="Pacientes por transação.")
+@click.option('--limite', type=int, default=None, help="No máximo N pacientes nesta execução.")
+def arquivar_altas(dias, lote, limite):
+    """Move pacientes com alta antiga e o histórico deles para as tabelas de arquivo."""
+    conn = get_db_connection()
+    inicio = time.perf_counter()
+    totais = arquivamento.arquivar(conn, dias=dias, lote_pacientes=lote, limite=limite)
+    if totais['Pacientes']:
+        cache.invalidar(TAG_ALTAS, TAG_PROVAS_VIDA)
+    for tabela, total in totais.items():
+        print(f"  - {tabela}: {total} linha(s) arquivada(s)")
+    print(f"✅ Arquivamento concluído em {time.perf_counter() - inicio:.1f}s.")
+
+@app.cli.command('construir-assets')
+@click.option('--limpar', is_flag=True, help="Apaga os pacotes de builds anteriores.")
+def construir_assets(limpar):
+    """Gera os pacotes de CSS/JS minificados, com hash no nome (ver assets.py)."""
+    relatorio = assets.construir(app.static_folder, limpar)
+    for nome, (arquivo, original, minificado, comprimido) in relatorio.items():
+        print(f"  - {nome} -> {arquivo}: {original} -> {minificado} bytes ({comprimido} com gzip)")
+    print(f"✅ {len(relatorio)} pacotes gerados em static/{assets.ASSETS_CONFIG['pasta']}.")
+
+@app.cli.command('verificar-replicas')
+def verificar_replicas():
+    """Mostra o atraso de cada réplica de leitura e se ela está recebendo consultas."""
+    if not REPLICAS_CONFIG:
+        print("ℹ️ Nenhuma réplica configurada (REPLICAS_CONFIG em database.py); tudo vai para o primário.")
+        return
+    roteador = get_roteador()
+    for replica in roteador.replicas:
+        replica.verificada_em = 0.0
+        if replica.disponivel(roteador.atraso_maximo, roteador.intervalo_verificacao):
+            print(f"✅ {replica.nome}: {replica.atraso:.0f}s de atraso")
+        elif replica.atraso is not None:
+            print(f"❌ {replica.nome}: {replica.atraso:.0f}s de atraso (máximo {roteador.atraso_maximo:.0f}s), leituras vão para o primário")
+        else:
+            print(f"❌ {replica.nome}: {replica.erro}")
+
+@app.cli.command('verificar-planos')
+def verificar_planos():
+    """Falha (código 1) se alguma consulta quente cair em full scan sem índice."""
+    conn = get_db_connection()
+    problemas = migracoes.verificar_planos(conn)
+    for p in problemas:
+        print(f"❌ {p}")
+    if problemas:
+        raise SystemExit(1)
+    print("✅ Todas as consultas quentes usam índice.")
+
+@app.cli.command('checkpoint-estoque')
+def checkpoint_estoque():
+    """Grava checkpoints de saldo para os medicamentos movimentados."""
+    conn = get_db_connection()
+    criados = estoque_servico.criar_checkpoints(conn)
+    print(f"✅ {criados} checkpoint(s) de estoque gravado(s).")
+
+@app.cli.command('reconstruir-saldos')
+def reconstruir_saldos():
+    """Recalcula Estoque.quantidade a partir da razão de movimentos."""
+    conn = get_db_connection()
+    estoque_servico.reconstruir_saldos(conn)
+    print("✅ Saldos de estoque reconstruídos.")
 
 if __name__ == '__main__':
     setup_database() 
+    with app.app_context():
+        conn = get_db_connection()
+        if conn:
+            triagem.fila.reconstruir(conn.cursor())
+            conn.close()
     app.run(debug=True)
\ No newline at end of file
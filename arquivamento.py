@@ -0,0 +1,254 @@
+"""
+Arquivamento do histórico de pacientes com alta antiga.
+
+Pacientes com alta há mais de ARQUIVO_CONFIG['dias'] dias saem das tabelas
+quentes (Pacientes, ProvasDeVida, AdministracaoMedicamentos) e vão, com as
+linhas filhas, para as tabelas *Arquivo, que têm a mesma estrutura e os
+mesmos índices mas nenhuma chave estrangeira. As telas do dia a dia (lista
+de internados, provas de vida recentes, busca) ficam com índices pequenos;
+/arquivo, o prontuário e a reconstrução das estatísticas leem as duas
+camadas.
+
+A movimentação é feita em lotes pequenos, cada um na sua transação (primeiro
+as linhas filhas, depois o paciente), com uma pausa entre os lotes para não
+segurar locks nem atrasar as réplicas. Se o processo parar no meio, basta
+rodar de novo: um registro está sempre inteiro numa das duas camadas.
+
+Uso:
+    flask --app app arquivar-altas [--dias 90] [--lote 100]
+
+Migrações futuras que alterarem colunas de Pacientes, ProvasDeVida ou
+AdministracaoMedicamentos precisam repetir a alteração na tabela *Arquivo
+correspondente (arquivar() recusa rodar se faltar coluna).
+"""
+import time
+
+import pymysql.cursors
+
+import estatisticas
+import sinais_vitais
+import versoes
+from cache import TAG_ALTAS, TAG_INTERNACOES, TAG_PROVAS_VIDA
+
+ARQUIVO_CONFIG = {
+    "dias": 90,             # alta há mais de N dias vai para o arquivo
+    "lote_pacientes": 100,  # pacientes por rodada
+    "lote_linhas": 2000,    # linhas filhas por transação
+    "pausa": 0.05           # segundos entre transações
+}
+
+# tabela quente -> tabela de arquivo (filhas primeiro, por causa das FKs)
+TABELAS_FILHAS = {
+    'ProvasDeVida': 'ProvasDeVidaArquivo',
+    'AdministracaoMedicamentos': 'AdministracaoMedicamentosArquivo',
+}
+TABELAS = {'Pacientes': 'PacientesArquivo', **TABELAS_FILHAS}
+
+_arquivo_existe = False
+
+def existe_arquivo(cursor):
+    """As tabelas de arquivo já foram criadas (migração 10)?"""
+    global _arquivo_existe
+    if not _arquivo_existe:
+        cursor.execute("""
+            SELECT COUNT(*) AS n FROM information_schema.TABLES
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME IN (%s, %s, %s)
+        """, tuple(TABELAS.values()))
+        linha = cursor.fetchone()
+        _arquivo_existe = (linha['n'] if isinstance(linha, dict) else linha[0]) == len(TABELAS)
+    return _arquivo_existe
+
+def com_arquivo(cursor, tabela, alias, colunas='*'):
+    """
+    Trecho de FROM que cobre as duas camadas de uma tabela, para leituras
+    agregadas (reconstruções). Antes da migração devolve só a tabela quente.
+    """
+    if not existe_arquivo(cursor):
+        return f"{tabela} AS {alias}"
+    return f"(SELECT {colunas} FROM {tabela} UNION ALL SELECT {colunas} FROM {TABELAS[tabela]}) AS {alias}"
+
+def _marcadores(valores):
+    return ", ".join(["%s"] * len(valores))
+
+# ==============================================================================
+# ESTRUTURA
+# ==============================================================================
+
+def criar_tabelas(cursor):
+    for tabela, arquivo in TABELAS.items():
+        cursor.execute(f"CREATE TABLE IF NOT EXISTS {arquivo} LIKE {tabela}")
+    # O arquivo guarda várias internações do mesmo CPF (readmissões)
+    cursor.execute("""
+        SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'PacientesArquivo'
+          AND COLUMN_NAME = 'cpf' AND NON_UNIQUE = 0
+    """)
+    for linha in cursor.fetchall():
+        nome = linha['INDEX_NAME'] if isinstance(linha, dict) else linha[0]
+        cursor.execute(f"ALTER TABLE PacientesArquivo DROP INDEX `{nome}`, ADD INDEX idx_arquivo_cpf (cpf)")
+
+def _colunas(cursor, tabela):
+    """Colunas graváveis (as geradas, como cep_digitos, ficam de fora)."""
+    cursor.execute("""
+        SELECT COLUMN_NAME AS nome FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND EXTRA NOT LIKE '%%GENERATED%%'
+        ORDER BY ORDINAL_POSITION
+    """, (tabela,))
+    return [linha['nome'] for linha in cursor.fetchall()]
+
+def _conferir_colunas(cursor):
+    colunas = {}
+    for tabela, arquivo in TABELAS.items():
+        quentes, arquivadas = _colunas(cursor, tabela), set(_colunas(cursor, arquivo))
+        faltando = [c for c in quentes if c not in arquivadas]
+        if faltando:
+            raise RuntimeError(f"{arquivo} está sem as colunas {', '.join(faltando)}; "
+                               f"crie uma migração que as adicione antes de arquivar.")
+        colunas[tabela] = ", ".join(f"`{c}`" for c in quentes)
+    return colunas
+
+# ==============================================================================
+# ARQUIVAMENTO
+# ==============================================================================
+
+def _mover(cursor, tabela, colunas, coluna, valores):
+    """Copia para o arquivo e apaga da tabela quente (na transação corrente)."""
+    filtro = f"{coluna} IN ({_marcadores(valores)})"
+    cursor.execute(f"INSERT INTO {TABELAS[tabela]} ({colunas}) SELECT {colunas} FROM {tabela} WHERE {filtro}", valores)
+    cursor.execute(f"DELETE FROM {tabela} WHERE {filtro}", valores)
+    return cursor.rowcount
+
+def _mover_filhas(conn, cursor, colunas, pacientes, lote, pausa, totais):
+    for tabela in TABELAS_FILHAS:
+        while True:
+            cursor.execute(f"""
+                SELECT id FROM {tabela} WHERE paciente_id IN ({_marcadores(pacientes)})
+                ORDER BY id LIMIT %s
+            """, pacientes + [lote])
+            ids = [linha['id'] for linha in cursor.fetchall()]
+            if not ids:
+                break
+            totais[tabela] += _mover(cursor, tabela, colunas[tabela], 'id', ids)
+            conn.commit()
+            time.sleep(pausa)
+
+def arquivar(conn, dias=None, lote_pacientes=None, lote_linhas=None, pausa=None, limite=None):
+    """
+    Move para o arquivo os pacientes com alta há mais de 'dias' dias.
+    limite: no máximo quantos pacientes nesta execução (None = todos).
+    Retorna o total movido por tabela.
+    """
+    dias = ARQUIVO_CONFIG['dias'] if dias is None else dias
+    lote_pacientes = lote_pacientes or ARQUIVO_CONFIG['lote_pacientes']
+    lote_linhas = lote_linhas or ARQUIVO_CONFIG['lote_linhas']
+    pausa = ARQUIVO_CONFIG['pausa'] if pausa is None else pausa
+
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    totais = dict.fromkeys(TABELAS, 0)
+    try:
+        if not existe_arquivo(cursor):
+            raise RuntimeError("Tabelas de arquivo inexistentes; rode as migrações primeiro.")
+        colunas = _conferir_colunas(cursor)
+        while limite is None or totais['Pacientes'] < limite:
+            tamanho = lote_pacientes if limite is None else min(lote_pacientes, limite - totais['Pacientes'])
+            # Os já movidos saíram da tabela, então cada rodada pega os próximos (idx_pacientes_status_baixa)
+            cursor.execute("""
+                SELECT id FROM Pacientes
+                WHERE status = 'alta' AND data_baixa < NOW() - INTERVAL %s DAY
+                ORDER BY data_baixa, id LIMIT %s
+            """, (dias, tamanho))
+            pacientes = [linha['id'] for linha in cursor.fetchall()]
+            if not pacientes:
+                break
+
+            _mover_filhas(conn, cursor, colunas, pacientes, lote_linhas, pausa, totais)
+
+            # Trava os pacientes; filhas gravadas depois da etapa anterior vão junto
+            cursor.execute(f"SELECT id FROM Pacientes WHERE id IN ({_marcadores(pacientes)}) FOR UPDATE", pacientes)
+            for tabela in TABELAS_FILHAS:
+                totais[tabela] += _mover(cursor, tabela, colunas[tabela], 'paciente_id', pacientes)
+            totais['Pacientes'] += _mover(cursor, 'Pacientes', colunas['Pacientes'], 'id', pacientes)
+            conn.commit()
+            time.sleep(pausa)
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    return totais
+
+# ==============================================================================
+# EXPURGO (registros lançados por engano)
+# ==============================================================================
+
+def _apagar_filhas(cursor, tabela, paciente_id, lote):
+    """Apaga até 'lote' linhas filhas do paciente; retorna quantas apagou."""
+    if tabela.startswith('ProvasDeVida'):
+        cursor.execute(f"SELECT id, data_hora FROM {tabela} WHERE paciente_id = %s ORDER BY id LIMIT %s",
+                       (paciente_id, lote))
+    else:
+        cursor.execute(f"SELECT id FROM {tabela} WHERE paciente_id = %s ORDER BY id LIMIT %s", (paciente_id, lote))
+    linhas = cursor.fetchall()
+    if not linhas:
+        return 0
+    ids = [linha['id'] for linha in linhas]
+    cursor.execute(f"DELETE FROM {tabela} WHERE id IN ({_marcadores(ids)})", ids)
+    if tabela.startswith('ProvasDeVida'):
+        estatisticas.registrar_provas_vida(cursor, [linha['data_hora'] for linha in linhas], sinal=-1)
+    return len(ids)
+
+def _travar_paciente(cursor, paciente_id, tabelas):
+    """(tabela, registro) do paciente travado com FOR UPDATE, ou (None, None)."""
+    for tabela in tabelas:
+        cursor.execute(f"SELECT * FROM {tabela} WHERE id = %s FOR UPDATE", (paciente_id,))
+        paciente = cursor.fetchone()
+        if paciente:
+            return tabela, paciente
+    return None, None
+
+def expurgar_paciente(conn, paciente_id, lote=None, pausa=None):
+    """
+    Exclui o paciente (em qualquer camada) com todas as linhas filhas, em
+    lotes, desfazendo a contribuição dele nas estatísticas e séries.
+    Retorna o registro do paciente excluído ou None se não existir (nesse
+    caso nada é apagado). Se falhar depois dos lotes, o paciente continua
+    lá com parte do histórico: basta excluir de novo para terminar.
+    """
+    lote = lote or ARQUIVO_CONFIG['lote_linhas']
+    pausa = ARQUIVO_CONFIG['pausa'] if pausa is None else pausa
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    tabelas, tabelas_filhas = ['Pacientes'], list(TABELAS_FILHAS)
+    if existe_arquivo(cursor):
+        tabelas.append(TABELAS['Pacientes'])
+        tabelas_filhas += list(TABELAS_FILHAS.values())
+    try:
+        # Confere o paciente antes de apagar qualquer linha filha
+        tabela, paciente = _travar_paciente(cursor, paciente_id, tabelas)
+        conn.rollback()
+        if paciente is None:
+            return None
+
+        for filha in tabelas_filhas:
+            while _apagar_filhas(cursor, filha, paciente_id, lote):
+                conn.commit()
+                time.sleep(pausa)
+
+        # Última transação: com o paciente travado ninguém mais grava filhas
+        tabela, paciente = _travar_paciente(cursor, paciente_id, tabelas)
+        if paciente is None:  # excluído por outra requisição no meio dos lotes
+            conn.rollback()
+            return None
+        for filha in tabelas_filhas:
+            while _apagar_filhas(cursor, filha, paciente_id, lote):
+                pass
+        cursor.execute(f"DELETE FROM {tabela} WHERE id = %s", (paciente_id,))
+        estatisticas.remover_paciente(cursor, paciente)
+        sinais_vitais.remover_paciente(cursor, paciente_id)
+        versoes.incrementar(cursor, TAG_ALTAS, TAG_INTERNACOES, TAG_PROVAS_VIDA, versoes.paciente(paciente_id))
+        conn.commit()
+        return paciente
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,293 @@
+"""
+Pacotes de CSS/JS com nome por conteúdo (fingerprint) e cache longo.
+
+Cada página carrega poucos pacotes (PACOTES): os scripts que ela usa,
+concatenados e minificados, num arquivo cujo nome leva o hash do conteúdo
+(ex.: pacientes.3fa2b1c94d.js). Como o nome muda sempre que o conteúdo
+muda, o navegador pode guardar o arquivo por um ano sem revalidar; o
+comum.js (main.js) é o mesmo em todas as páginas e baixa uma vez só.
+
+Nos templates:
+
+    {{ pacote('estilo.css') }}
+    {{ pacote('pacientes.js') }}
+
+Construção (gera static/dist com o manifest.json e as versões .gz/.br):
+
+    flask --app app construir-assets
+
+Sem o manifest (ambiente de desenvolvimento), pacote() devolve as tags dos
+arquivos originais em static/, como antes. Depois de alterar um .js/.css,
+rode construir-assets de novo (os workers releem o manifest sozinhos); os
+arquivos antigos ficam na pasta para as páginas ainda abertas e saem com
+--limpar.
+
+A compressão brotli usa o pacote 'brotli' se estiver instalado; sem ele só
+a versão gzip é gerada.
+"""
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+import re
+
+from flask import request, send_from_directory, url_for
+from markupsafe import Markup
+from werkzeug.exceptions import NotFound
+
+ASSETS_CONFIG = {
+    "ativo": True,
+    "pasta": "dist",            # dentro de static/
+    "max_age": 365 * 24 * 3600,  # arquivos com hash no nome nunca mudam
+    "minificar": True,
+    "tamanho_hash": 10,
+}
+
+# pacote -> arquivos de static/, na ordem em que eram carregados nas páginas
+PACOTES = {
+    'estilo.css': ['css/style.css'],
+    'comum.js': ['js/main.js'],
+    'pacientes.js': ['js/filter.js', 'js/busca_pacientes.js', 'js/ao_vivo.js'],
+    'arquivo.js': ['js/filter.js', 'js/busca_pacientes.js'],
+    'provas_vida.js': ['js/filter.js', 'js/ao_vivo.js'],
+    'filtro.js': ['js/filter.js'],
+    'ao_vivo.js': ['js/ao_vivo.js'],
+    'prontuario.js': ['js/prontuario.js', 'js/cep_autofill.js', 'js/medicamentos_busca.js'],
+    'medicamentos.js': ['js/medicamentos_busca.js'],
+    'sinais_paciente.js': ['js/sinais_paciente.js'],
+}
+
+MANIFEST = 'manifest.json'
+
+# ==============================================================================
+# MINIFICAÇÃO
+# ==============================================================================
+
+# Depois destes caracteres/palavras uma '/' abre regex, não é divisão
+_ANTES_DE_REGEX = set('(,=:[!&|?{};+-*%<>~^')
+_PALAVRAS_ANTES_DE_REGEX = {'return', 'typeof', 'instanceof', 'in', 'of', 'new', 'delete', 'void', 'throw',
+                            'case', 'do', 'else', 'yield', 'await'}
+
+def minificar_js(codigo):
+    """
+    Minificação conservadora: tira comentários e indentação e junta espaços,
+    sem mexer em strings, template literals e regex. As quebras de linha
+    ficam (a inserção automática de ';' continua valendo).
+    """
+    saida = []
+    i, n = 0, len(codigo)
+    anterior = ''  # último trecho significativo (para decidir regex x divisão)
+    espaco = ''    # separador pendente: '', ' ' ou '\n'
+
+    def emitir(trecho):
+        nonlocal espaco, anterior
+        if saida and espaco:
+            ultimo = saida[-1][-1]
+            # Espaço só onde separa duas palavras ou evita '+ +' virar '++'
+            if espaco == '\n' or (_palavra(ultimo) and _palavra(trecho[0])) \
+                    or (ultimo in '+-/' and trecho[0] == ultimo):
+                saida.append(espaco)
+        espaco = ''
+        saida.append(trecho)
+        anterior = trecho
+
+    while i < n:
+        c = codigo[i]
+        if c in ' \t\r\n':
+            j = i
+            while j < n and codigo[j] in ' \t\r\n':
+                j += 1
+            espaco = '\n' if '\n' in codigo[i:j] else (espaco or ' ')
+            i = j
+        elif codigo.startswith('//', i):
+            fim = codigo.find('\n', i)
+            i = n if fim < 0 else fim
+        elif codigo.startswith('/*', i):
+            fim = codigo.find('*/', i + 2)
+            fim = n if fim < 0 else fim + 2
+            espaco = '\n' if '\n' in codigo[i:fim] else (espaco or ' ')
+            i = fim
+        elif c in '"\'`' or (c == '/' and _abre_regex(anterior)):
+            j = _fim_literal(codigo, i)
+            emitir(codigo[i:j])
+            i = j
+        elif _palavra(c):
+            j = i
+            while j < n and _palavra(codigo[j]):
+                j += 1
+            emitir(codigo[i:j])
+            i = j
+        else:
+            emitir(c)
+            i += 1
+    return ''.join(saida).strip() + '\n'
+
+def _palavra(c):
+    return c.isalnum() or c in '_$'
+
+def _abre_regex(anterior):
+    if not anterior:
+        return True
+    if _palavra(anterior[-1:]):
+        return anterior in _PALAVRAS_ANTES_DE_REGEX
+    return anterior[-1] in _ANTES_DE_REGEX
+
+def _fim_literal(codigo, i):
+    """Índice logo depois da string/template/regex que começa em i."""
+    delimitador, j, n = codigo[i], i + 1, len(codigo)
+    classe = False  # dentro de [...] numa regex a '/' não fecha
+    while j < n:
+        c = codigo[j]
+        if c == '\\':
+            j += 2
+            continue
+        if delimitador == '/':
+            if c == '[':
+                classe = True
+            elif c == ']':
+                classe = False
+            elif c == '/' and not classe:
+                j += 1
+                while j < n and codigo[j].isalpha():  # flags
+                    j += 1
+                return j
+            elif c == '\n':
+                break
+        elif c == delimitador:
+            return j + 1
+        j += 1
+    raise ValueError(f"Literal sem fechamento perto de: {codigo[i:i + 40]!r}")
+
+def minificar_css(codigo):
+    codigo = re.sub(r'/\*.*?\*/', '', codigo, flags=re.S)
+    codigo = re.sub(r'\s+', ' ', codigo)
+    # ':' fica de fora: "a :hover" e "a:hover" são seletores diferentes
+    codigo = re.sub(r'\s*([{};,>])\s*', r'\1', codigo)
+    return codigo.replace(';}', '}').strip() + '\n'
+
+# ==============================================================================
+# CONSTRUÇÃO
+# ==============================================================================
+
+def _comprimir(caminho, conteudo):
+    with open(caminho + '.gz', 'wb') as f:
+        # mtime=0: mesmo conteúdo gera o mesmo .gz (builds reproduzíveis)
+        f.write(gzip.compress(conteudo, compresslevel=9, mtime=0))
+    try:
+        import brotli
+    except ImportError:
+        return False
+    with open(caminho + '.br', 'wb') as f:
+        f.write(brotli.compress(conteudo, quality=11))
+    return True
+
+def construir(pasta_static, limpar=False):
+    """
+    Gera os pacotes em static/<ASSETS_CONFIG['pasta']> e o manifest.
+    Retorna {pacote: (arquivo, bytes originais, bytes minificados, bytes gzip)}.
+    """
+    destino = os.path.join(pasta_static, ASSETS_CONFIG['pasta'])
+    os.makedirs(destino, exist_ok=True)
+    manifest, relatorio, brotli = {}, {}, False
+
+    for nome, fontes in PACOTES.items():
+        partes = []
+        for fonte in fontes:
+            with open(os.path.join(pasta_static, fonte), encoding='utf-8') as f:
+                partes.append(f.read())
+        css = nome.endswith('.css')
+        if ASSETS_CONFIG['minificar']:
+            partes_finais = [minificar_css(p) if css else minificar_js(p) for p in partes]
+        else:
+            partes_finais = partes
+        # ';' entre os scripts: um arquivo sem ';' no fim não emenda no próximo
+        texto = ('\n' if css else ';\n').join(partes_finais)
+        original = '\n'.join(partes)
+        conteudo = texto.encode('utf-8')
+
+        base, extensao = os.path.splitext(nome)
+        arquivo = f"{base}.{hashlib.sha256(conteudo).hexdigest()[:ASSETS_CONFIG['tamanho_hash']]}{extensao}"
+        caminho = os.path.join(destino, arquivo)
+        if not os.path.exists(caminho):
+            with open(caminho, 'wb') as f:
+                f.write(conteudo)
+        brotli = _comprimir(caminho, conteudo)
+        manifest[nome] = arquivo
+        relatorio[nome] = (arquivo, len(original.encode('utf-8')), len(conteudo), os.path.getsize(caminho + '.gz'))
+
+    # Grava o manifest por último e de forma atômica: os workers nunca leem um pela metade
+    temporario = os.path.join(destino, MANIFEST + '.tmp')
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(temporario, os.path.join(destino, MANIFEST))
+
+    if limpar:
+        atuais = set(manifest.values()) | {MANIFEST}
+        for arquivo in os.listdir(destino):
+            if arquivo.split('.gz')[0].split('.br')[0] not in atuais:
+                os.remove(os.path.join(destino, arquivo))
+    if not brotli:
+        print("⚠️ Pacote 'brotli' não instalado; gerados só os arquivos .gz.")
+    recarregar()
+    return relatorio
+
+# ==============================================================================
+# USO NO APP
+# ==============================================================================
+
+_manifest = (None, {})  # (mtime do arquivo, conteúdo)
+
+def recarregar():
+    global _manifest
+    _manifest = (None, {})
+
+def _ler_manifest(pasta_static):
+    """Relê o manifest quando ele muda, então um build novo vale sem reiniciar os workers."""
+    global _manifest
+    caminho = os.path.join(pasta_static, ASSETS_CONFIG['pasta'], MANIFEST)
+    try:
+        mtime = os.path.getmtime(caminho)
+    except OSError:
+        return {}
+    if _manifest[0] != mtime:
+        with open(caminho, encoding='utf-8') as f:
+            _manifest = (mtime, json.load(f))
+    return _manifest[1]
+
+def _tag(nome, url):
+    if nome.endswith('.css'):
+        return Markup('<link rel="stylesheet" href="%s">') % url
+    return Markup('<script src="%s"></script>') % url
+
+def instalar(app):
+    """Registra a rota /assets e a função pacote() dos templates."""
+
+    def pacote(nome):
+        if nome not in PACOTES:
+            raise KeyError(f"Pacote desconhecido: {nome}")
+        arquivo = _ler_manifest(app.static_folder).get(nome) if ASSETS_CONFIG['ativo'] else None
+        if arquivo:
+            return _tag(nome, url_for('servir_asset', arquivo=arquivo))
+        # Sem build: os arquivos originais, um por tag
+        return Markup('\n').join(_tag(nome, url_for('static', filename=fonte)) for fonte in PACOTES[nome])
+
+    @app.route('/assets/<path:arquivo>')
+    def servir_asset(arquivo):
+        pasta = os.path.join(app.static_folder, ASSETS_CONFIG['pasta'])
+        if arquivo == MANIFEST or arquivo.endswith(('.gz', '.br', '.tmp')):
+            raise NotFound()
+        tipo = mimetypes.guess_type(arquivo)[0]
+        variante, codificacao = arquivo, None
+        for extensao, nome in (('.br', 'br'), ('.gz', 'gzip')):
+            if nome in request.accept_encodings and os.path.isfile(os.path.join(pasta, arquivo + extensao)):
+                variante, codificacao = arquivo + extensao, nome
+                break
+        resposta = send_from_directory(pasta, variante, mimetype=tipo, max_age=ASSETS_CONFIG['max_age'])
+        if codificacao:
+            resposta.headers['Content-Encoding'] = codificacao
+        resposta.headers['Vary'] = 'Accept-Encoding'
+        resposta.headers['Cache-Control'] = f"public, max-age={ASSETS_CONFIG['max_age']}, immutable"
+        return resposta
+
+    app.jinja_env.globals['pacote'] = pacote
@@ -0,0 +1,25 @@
+"""
+Benchmarks e testes de carga do sistema hospitalar.
+
+- gerador.py: gera uma massa sintética determinística (pacientes, provas de
+  vida a cada poucas horas, baixas de medicamentos) direto no MySQL/MariaDB
+  configurado em database.py. Escala até ~1M pacientes / ~50M provas de vida.
+- carga.py: simula usuários navegando (login, dashboard, listas, prontuário,
+  registro de provas de vida, KPIs do dashboard) pelo test client do Flask
+  ou por HTTP, e mede p50/p95/p99 e vazão por rota. Os resultados ficam em
+  benchmark/resultados/ para comparar entre commits.
+- concorrencia_estoque.py: baixas paralelas do mesmo medicamento num banco
+  descartável, conferindo que o saldo nunca fica negativo nem perde baixa.
+- ingestao_lote.py: vazão da ingestão em lote de provas de vida e envios
+  simultâneos do mesmo lote num banco descartável, conferindo que nenhuma
+  leitura é gravada ou contada duas vezes.
+
+Uso típico (num banco de teste, nunca no de produção):
+
+    python -m benchmark.gerador --pacientes 100000 --semente 42
+    python -m benchmark.carga --usuarios 8 --duracao 60
+    python -m benchmark.carga --alvo http://127.0.0.1:5000 --usuarios 32
+    python -m benchmark.carga --comparar resultados/antes.json resultados/depois.json
+    python -m benchmark.concorrencia_estoque
+    python -m benchmark.ingestao_lote --leituras 20000 --concorrentes 4
+"""
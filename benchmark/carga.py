@@ -0,0 +1,303 @@
+"""
+Driver de carga: usuários simulados repetindo um mix realista de rotas.
+
+Cada usuário (uma thread) faz login com um usuário bench_* criado pelo
+gerador e, até o fim da --duracao, sorteia ações de MIX: abrir o dashboard,
+a lista de internados, o prontuário e as séries de sinais vitais de um
+paciente, registrar prova de vida, buscar pacientes, consultar as provas de
+vida gerais e, principalmente, o polling dos KPIs do dashboard. Entre uma
+ação e outra espera --pausa segundos (tempo de "pensar").
+
+Alvos:
+- 'flask' (padrão): test client do Flask no mesmo processo. Bom para
+  comparar commits sem subir servidor, mas servidor e carga dividem o GIL.
+- 'http://host:porta': servidor de verdade (gunicorn, waitress...), mais
+  fiel para medir vazão.
+
+Ao final imprime p50/p95/p99, máximo e vazão por rota e grava um JSON em
+benchmark/resultados/ com o commit atual, para comparar depois:
+
+    python -m benchmark.carga --usuarios 16 --duracao 120
+    python -m benchmark.carga --comparar benchmark/resultados/A.json benchmark/resultados/B.json
+
+Atenção: as ações de prova de vida gravam no banco (com baixa de estoque).
+Use um banco de teste populado pelo benchmark.gerador.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import random
+import subprocess
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+
+import pymysql.cursors
+
+from benchmark.gerador import MEDICAMENTOS, NOMES, SENHA_BENCH, USUARIOS_REGISTRO
+from database import create_db_connection
+
+PASTA_RESULTADOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'resultados')
+
+# ==============================================================================
+# MIX DE AÇÕES
+# ==============================================================================
+# Cada ação recebe (rnd, contexto) e devolve (método, url, formulário ou None).
+
+def _login(rnd, ctx):
+    return 'POST', '/login', {'usuario': ctx['usuario'], 'senha': SENHA_BENCH}
+
+def _dashboard(rnd, ctx):
+    return 'GET', '/dashboard', None
+
+def _kpi(rnd, ctx):
+    tipo, periodo = rnd.choice([('internados', 'atual'), ('estoque', 'baixo'), ('altas', '7d'),
+                                ('altas', '30d'), ('pv', '24h'), ('pv', '48h')])
+    return 'GET', f'/api/kpi/{tipo}/{periodo}', None
+
+def _remedios(rnd, ctx):
+    return 'GET', f"/api/grafico/remedios/{rnd.choice(('7d', '30d', '90d'))}", None
+
+def _pacientes(rnd, ctx):
+    return 'GET', '/pacientes', None
+
+def _detalhes(rnd, ctx):
+    return 'GET', f"/paciente/detalhes/{rnd.choice(ctx['internados'])}", None
+
+def _sinais(rnd, ctx):
+    return 'GET', f"/api/paciente/{rnd.choice(ctx['internados'])}/sinais", None
+
+def _busca(rnd, ctx):
+    return 'GET', '/api/pacientes/busca?' + urllib.parse.urlencode({'q': rnd.choice(NOMES)[:rnd.randint(3, 5)]}), None
+
+def _provas_vida_geral(rnd, ctx):
+    return 'GET', '/provas_vida_geral', None
+
+def _prova_vida(rnd, ctx):
+    dados = {
+        'pa': f"{rnd.randint(100, 160)}/{rnd.randint(60, 95)}", 'glicose': rnd.randint(70, 200),
+        'sat': rnd.randint(90, 100), 'bpm': rnd.randint(55, 120), 'temperatura': round(rnd.uniform(35.8, 38.5), 1),
+        'evolucao': 'Registro de benchmark.',
+    }
+    if rnd.random() < 0.4:
+        dados['medicamento_adm'] = rnd.choice(MEDICAMENTOS)[0]
+        dados['quantidade_adm'] = 1
+    return 'POST', f"/prova_vida/{rnd.choice(ctx['internados'])}", dados
+
+# (peso, nome da rota no relatório, ação)
+MIX = [
+    (2, 'login', _login),
+    (8, 'dashboard', _dashboard),
+    (30, 'kpi', _kpi),
+    (5, 'grafico_remedios', _remedios),
+    (12, 'pacientes', _pacientes),
+    (10, 'detalhes', _detalhes),
+    (6, 'sinais', _sinais),
+    (6, 'busca', _busca),
+    (6, 'provas_vida_geral', _provas_vida_geral),
+    (8, 'prova_vida_post', _prova_vida),
+]
+
+# ==============================================================================
+# CLIENTES
+# ==============================================================================
+
+class ClienteFlask:
+    """Requisições pelo test client (mesmo processo, sem rede)."""
+
+    def __init__(self, app):
+        self._cliente = app.test_client()
+
+    def requisitar(self, metodo, url, dados=None):
+        resposta = self._cliente.open(url, method=metodo, data=dados)
+        resposta.get_data()
+        return resposta.status_code
+
+class _SemRedirecionar(urllib.request.HTTPRedirectHandler):
+    # Mede só a requisição pedida; o redirect pós-POST seria outra rota
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+class ClienteHttp:
+    """Requisições HTTP de verdade, com cookie de sessão próprio."""
+
+    def __init__(self, base, timeout=30):
+        self._base = base.rstrip('/')
+        self._timeout = timeout
+        self._abridor = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), _SemRedirecionar)
+
+    def requisitar(self, metodo, url, dados=None):
+        corpo = urllib.parse.urlencode(dados).encode() if dados is not None else None
+        pedido = urllib.request.Request(self._base + url, data=corpo, method=metodo)
+        try:
+            with self._abridor.open(pedido, timeout=self._timeout) as resposta:
+                resposta.read()
+                return resposta.status
+        except urllib.error.HTTPError as erro:
+            erro.read()
+            return erro.code
+
+# ==============================================================================
+# EXECUÇÃO
+# ==============================================================================
+
+def carregar_contexto(limite=5000):
+    """Ids de pacientes internados para as ações que abrem ou gravam prontuários."""
+    conn = create_db_connection(pymysql.cursors.DictCursor)
+    if conn is None:
+        raise RuntimeError("Sem conexão com o banco.")
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SELECT id FROM Pacientes WHERE status = 'internado' ORDER BY id DESC LIMIT %s", (limite,))
+        internados = [r['id'] for r in cursor.fetchall()]
+    finally:
+        conn.close()
+    if not internados:
+        raise RuntimeError("Nenhum paciente internado: rode antes o benchmark.gerador.")
+    return {'internados': internados}
+
+def _usuario_simulado(numero, criar_cliente, contexto, fim, aquecimento_ate, pausa, semente, saida):
+    rnd = random.Random(f"{semente}:{numero}")
+    ctx = dict(contexto, usuario=USUARIOS_REGISTRO[numero % len(USUARIOS_REGISTRO)])
+    cliente = criar_cliente()
+    cliente.requisitar(*_login(rnd, ctx))
+    pesos = [p for p, _, _ in MIX]
+    medidas = []
+    while time.perf_counter() < fim:
+        _, nome, acao = rnd.choices(MIX, pesos)[0]
+        metodo, url, dados = acao(rnd, ctx)
+        inicio = time.perf_counter()
+        try:
+            status = cliente.requisitar(metodo, url, dados)
+        except Exception:
+            status = 0
+        agora = time.perf_counter()
+        if inicio >= aquecimento_ate:
+            medidas.append((nome, agora - inicio, status))
+        if pausa:
+            time.sleep(rnd.expovariate(1 / pausa))
+    saida.extend(medidas)
+
+def percentil(ordenados, p):
+    """Percentil pelo método do posto mais próximo (lista já ordenada)."""
+    if not ordenados:
+        return None
+    posto = max(int(round(p / 100 * len(ordenados) + 0.5)) - 1, 0)
+    return ordenados[min(posto, len(ordenados) - 1)]
+
+def resumir(medidas, segundos):
+    por_rota = {}
+    for nome, duracao, status in medidas:
+        por_rota.setdefault(nome, []).append((duracao, status))
+    por_rota['TOTAL'] = [(d, s) for _, d, s in medidas]
+
+    rotas = {}
+    for nome, valores in por_rota.items():
+        tempos = sorted(d for d, _ in valores)
+        rotas[nome] = {
+            'requisicoes': len(valores),
+            'erros': sum(1 for _, s in valores if s == 0 or s >= 500),
+            'por_segundo': round(len(valores) / segundos, 2),
+            'p50_ms': round(percentil(tempos, 50) * 1000, 2),
+            'p95_ms': round(percentil(tempos, 95) * 1000, 2),
+            'p99_ms': round(percentil(tempos, 99) * 1000, 2),
+            'max_ms': round(tempos[-1] * 1000, 2),
+        }
+    return rotas
+
+def executar(alvo='flask', usuarios=8, duracao=60, aquecimento=5, pausa=0.0, semente=42):
+    if alvo == 'flask':
+        from app import app
+        criar_cliente = lambda: ClienteFlask(app)
+    else:
+        criar_cliente = lambda: ClienteHttp(alvo)
+
+    contexto = carregar_contexto()
+    medidas = []
+    inicio = time.perf_counter()
+    aquecimento_ate = inicio + aquecimento
+    fim = aquecimento_ate + duracao
+    threads = [threading.Thread(target=_usuario_simulado,
+                                args=(n, criar_cliente, contexto, fim, aquecimento_ate, pausa, semente, medidas))
+               for n in range(usuarios)]
+    for t in threads: t.start()
+    for t in threads: t.join()
+    segundos = time.perf_counter() - aquecimento_ate
+    return {
+        'data': datetime.now().isoformat(timespec='seconds'),
+        'commit': _commit_atual(),
+        'config': {'alvo': alvo, 'usuarios': usuarios, 'duracao': duracao, 'aquecimento': aquecimento,
+                   'pausa': pausa, 'semente': semente},
+        'rotas': resumir(medidas, segundos) if medidas else {},
+    }
+
+def _commit_atual():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(PASTA_RESULTADOS)).stdout.strip() or 'desconhecido'
+    except OSError:
+        return 'desconhecido'
+
+# ==============================================================================
+# RELATÓRIOS
+# ==============================================================================
+
+def imprimir(resultado):
+    print(f"\nCommit {resultado['commit']} | {resultado['config']}")
+    print(f"{'rota':<20}{'req':>8}{'erros':>7}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    for nome, r in sorted(resultado['rotas'].items(), key=lambda i: (i[0] == 'TOTAL', i[0])):
+        print(f"{nome:<20}{r['requisicoes']:>8}{r['erros']:>7}{r['por_segundo']:>9}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}{r['max_ms']:>10}")
+
+def salvar(resultado, caminho=None):
+    os.makedirs(PASTA_RESULTADOS, exist_ok=True)
+    caminho = caminho or os.path.join(
+        PASTA_RESULTADOS, f"{datetime.now():%Y%m%d_%H%M%S}_{resultado['commit']}.json")
+    with open(caminho, 'w', encoding='utf-8') as arquivo:
+        json.dump(resultado, arquivo, ensure_ascii=False, indent=2)
+    return caminho
+
+def comparar(caminho_antes, caminho_depois):
+    with open(caminho_antes, encoding='utf-8') as a, open(caminho_depois, encoding='utf-8') as d:
+        antes, depois = json.load(a), json.load(d)
+
+    def variacao(x, y):
+        return f"{(y - x) / x * 100:+.1f}%" if x else '-'
+
+    print(f"\n{antes['commit']} -> {depois['commit']}")
+    print(f"{'rota':<20}{'req/s':>18}{'p50 ms':>22}{'p95 ms':>22}{'p99 ms':>22}")
+    for nome in sorted(set(antes['rotas']) | set(depois['rotas']), key=lambda n: (n == 'TOTAL', n)):
+        a, d = antes['rotas'].get(nome), depois['rotas'].get(nome)
+        if not a or not d:
+            print(f"{nome:<20}{'(só em um dos resultados)':>40}")
+            continue
+        colunas = [f"{a[c]}→{d[c]} {variacao(a[c], d[c])}" for c in ('por_segundo', 'p50_ms', 'p95_ms', 'p99_ms')]
+        print(f"{nome:<20}{colunas[0]:>18}{colunas[1]:>22}{colunas[2]:>22}{colunas[3]:>22}")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Teste de carga com mix realista de rotas.")
+    parser.add_argument('--alvo', default='flask', help="'flask' (test client) ou URL base, ex.: http://127.0.0.1:5000")
+    parser.add_argument('--usuarios', type=int, default=8)
+    parser.add_argument('--duracao', type=float, default=60, help="segundos medidos")
+    parser.add_argument('--aquecimento', type=float, default=5, help="segundos iniciais descartados")
+    parser.add_argument('--pausa', type=float, default=0.0, help="média (s) da espera entre ações de cada usuário")
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--saida', help="arquivo JSON do resultado (padrão: benchmark/resultados/)")
+    parser.add_argument('--comparar', nargs=2, metavar=('ANTES', 'DEPOIS'))
+    opcoes = parser.parse_args()
+
+    if opcoes.comparar:
+        comparar(*opcoes.comparar)
+    else:
+        resultado = executar(opcoes.alvo, opcoes.usuarios, opcoes.duracao, opcoes.aquecimento,
+                             opcoes.pausa, opcoes.semente)
+        if not resultado['rotas']:
+            print("❌ Nenhuma requisição medida.")
+            raise SystemExit(1)
+        imprimir(resultado)
+        print(f"\n✅ Resultado salvo em {salvar(resultado, opcoes.saida)}")
@@ -0,0 +1,102 @@
+"""
+Teste de concorrência da baixa de estoque (estoque_servico.debitar).
+
+Várias threads, cada uma com a sua conexão, dão baixa no mesmo medicamento
+ao mesmo tempo; no fim o saldo não pode ficar negativo e precisa bater com
+as baixas efetivadas, com o histórico (EstoqueBaixas) e com a razão
+(EstoqueMovimentos).
+
+Roda num banco descartável: cria um schema novo no servidor de database.py
+(prontuario_hospitalar_teste_<hash>), aplica as migrações, executa o teste e
+apaga o schema no fim, mesmo se o teste falhar. O banco configurado não é
+tocado.
+
+    python -m benchmark.concorrencia_estoque [--threads 8] [--baixas 25] [--saldo 100]
+"""
+import argparse
+import threading
+import uuid
+
+import pymysql.cursors
+
+import estoque_servico
+import migracoes
+from database import DB_CONFIG
+
+NOME = 'Medicamento de teste'
+
+def _conectar(banco=None):
+    config = {k: v for k, v in DB_CONFIG.items() if k != 'database'}
+    if banco:
+        config['database'] = banco
+    return pymysql.connect(**config, cursorclass=pymysql.cursors.DictCursor)
+
+def testar(conn_factory, threads=8, baixas_por_thread=25, saldo_inicial=100):
+    """
+    Dispara baixas paralelas do mesmo medicamento e confere que o saldo
+    final nunca fica negativo e bate com o total efetivamente baixado.
+    """
+    conn = conn_factory()
+    cur = conn.cursor()
+    cur.execute("INSERT INTO Estoque (nome_medicamento, quantidade, unidade) VALUES (%s, %s, 'un')",
+                (NOME, saldo_inicial))
+    conn.commit()
+
+    sucesso = []
+    trava = threading.Lock()
+
+    def trabalhador():
+        c = conn_factory()
+        try:
+            for _ in range(baixas_por_thread):
+                r = estoque_servico.debitar(c.cursor(), [(NOME, 1)], 'teste de concorrência', 'teste')
+                c.commit()
+                with trava:
+                    sucesso.append(len(r['baixados']))
+        finally:
+            c.close()
+
+    ts = [threading.Thread(target=trabalhador) for _ in range(threads)]
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+
+    cur.execute("SELECT quantidade FROM Estoque WHERE nome_medicamento = %s", (NOME,))
+    saldo_final = cur.fetchone()['quantidade']
+    cur.execute("SELECT COUNT(*) AS n FROM EstoqueBaixas WHERE nome_medicamento = %s", (NOME,))
+    historico = cur.fetchone()['n']
+    cur.execute("SELECT COUNT(*) AS n FROM EstoqueMovimentos WHERE nome_medicamento = %s AND tipo = 'saida'", (NOME,))
+    movimentos = cur.fetchone()['n']
+    conn.close()
+    baixados = sum(sucesso)
+
+    esperado = max(saldo_inicial - threads * baixas_por_thread, 0)
+    assert saldo_final >= 0, f"saldo negativo: {saldo_final}"
+    assert saldo_final == saldo_inicial - baixados, f"baixa perdida: saldo {saldo_final}, baixados {baixados}"
+    assert historico == baixados, f"histórico com {historico} linhas para {baixados} baixas"
+    assert movimentos == baixados, f"razão com {movimentos} saídas para {baixados} baixas"
+    assert saldo_final == esperado, f"saldo final {saldo_final}, esperado {esperado}"
+    return threads * baixas_por_thread, baixados, saldo_final
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Baixas concorrentes num banco descartável.")
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--baixas', type=int, default=25, help="baixas por thread")
+    parser.add_argument('--saldo', type=int, default=100, help="saldo inicial do medicamento")
+    opcoes = parser.parse_args()
+
+    banco = f"{DB_CONFIG['database']}_teste_{uuid.uuid4().hex[:8]}"
+    admin = _conectar()
+    admin.cursor().execute(f"CREATE DATABASE `{banco}`")
+    try:
+        conn = _conectar(banco)
+        try:
+            migracoes.migrar(conn)
+        finally:
+            conn.close()
+        total, baixados, saldo = testar(lambda: _conectar(banco), opcoes.threads, opcoes.baixas, opcoes.saldo)
+        print(f"✅ {total} baixas concorrentes: {baixados} efetivadas, saldo final {saldo}.")
+    finally:
+        admin.cursor().execute(f"DROP DATABASE IF EXISTS `{banco}`")
+        admin.close()
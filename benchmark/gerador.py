@@ -0,0 +1,301 @@
+"""
+Gerador determinístico de massa hospitalar sintética.
+
+Para cada paciente são sorteados prioridade, entrada (espalhada pelos últimos
+--dias), tempo de permanência (log-normal, maior para prioridades mais
+altas), provas de vida a cada poucas horas durante a internação (mais
+frequentes para vermelho/amarelo, com sinais coerentes com a prioridade) e
+administrações de medicamentos, que viram linhas em EstoqueBaixas.
+Quem ainda não saiu até a data de referência continua internado.
+
+Cada paciente usa o próprio gerador aleatório (semente + índice), então a
+mesma semente e a mesma --referencia produzem exatamente os mesmos dados,
+independente do tamanho do bloco. A gravação é em INSERTs multi-linha, um
+commit por bloco de pacientes, com unique_checks/foreign_key_checks
+desligados na sessão. Antes de gravar, as migrações pendentes são aplicadas
+(a saturação de 100% só cabe na coluna a partir da migração 13). No fim as tabelas de resumo (estatísticas, séries de
+sinais vitais e razão do estoque) são recalculadas.
+
+    python -m benchmark.gerador --pacientes 1000000 --semente 42 --referencia 2026-01-01
+
+Os usuários bench_* (senha SENHA_BENCH) são criados para o benchmark de carga.
+"""
+import argparse
+import math
+import random
+import time
+from datetime import datetime, timedelta
+
+import pymysql.cursors
+from werkzeug.security import generate_password_hash
+
+import estatisticas
+import estoque_servico
+import migracoes
+import sinais_vitais
+from database import create_db_connection
+
+SENHA_BENCH = 'bench123'
+USUARIOS_BENCH = [('bench_admin', 'admin')] + [(f'bench_enf{i:02d}', 'enfermeiro') for i in range(1, 13)]
+USUARIOS_REGISTRO = [u for u, nivel in USUARIOS_BENCH if nivel == 'enfermeiro']
+
+PACIENTES_POR_BLOCO = 2000
+LINHAS_POR_INSERT = 5000
+ESTOQUE_INICIAL = 5000
+
+# ==============================================================================
+# DISTRIBUIÇÕES
+# ==============================================================================
+
+PRIORIDADES = (('verde', 0.6), ('amarelo', 0.3), ('vermelho', 0.1))
+
+# prioridade -> (mediana da permanência em dias, intervalo entre provas de vida em horas, doses por dia)
+PERFIL = {
+    'verde': (2.5, 6, 1.5),
+    'amarelo': (5, 4, 3),
+    'vermelho': (9, 2, 5),
+}
+
+# prioridade -> sinal -> (média, desvio)
+SINAIS_BASE = {
+    'verde': {'pas': (122, 12), 'pad': (78, 8), 'glicose': (102, 15), 'sat': (97.5, 1), 'bpm': (76, 9), 'temperatura': (36.6, 0.3)},
+    'amarelo': {'pas': (135, 18), 'pad': (85, 11), 'glicose': (135, 35), 'sat': (95, 2), 'bpm': (88, 12), 'temperatura': (37.2, 0.6)},
+    'vermelho': {'pas': (145, 28), 'pad': (88, 16), 'glicose': (170, 60), 'sat': (91, 4), 'bpm': (104, 18), 'temperatura': (37.8, 0.9)},
+}
+
+LIMITES = {'pas': (70, 240), 'pad': (40, 140), 'glicose': (40, 600), 'sat': (70, 100), 'bpm': (35, 190), 'temperatura': (34.5, 41.5)}
+
+NOMES = ['Ana', 'Maria', 'Francisca', 'Antônia', 'Adriana', 'Juliana', 'Márcia', 'Fernanda', 'Patrícia', 'Aline',
+         'José', 'João', 'Antônio', 'Francisco', 'Carlos', 'Paulo', 'Pedro', 'Lucas', 'Luiz', 'Marcos',
+         'Gabriel', 'Rafael', 'Daniel', 'Marcelo', 'Bruno', 'Eduardo', 'Felipe', 'Raimundo', 'Rodrigo', 'Sandra']
+SOBRENOMES = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+              'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares', 'Fernandes', 'Vieira', 'Barbosa']
+
+# (cep, logradouro, bairro)
+ENDERECOS = [
+    ('01310-100', 'Avenida Paulista', 'Bela Vista'), ('01001-000', 'Praça da Sé', 'Sé'),
+    ('04094-050', 'Avenida Pedro Álvares Cabral', 'Vila Mariana'), ('05508-000', 'Rua da Reitoria', 'Butantã'),
+    ('02012-000', 'Rua Voluntários da Pátria', 'Santana'), ('03178-200', 'Rua Siqueira Bueno', 'Mooca'),
+    ('08210-000', 'Avenida Itaquera', 'Itaquera'), ('04801-000', 'Avenida Atlântica', 'Socorro'),
+    ('05020-000', 'Rua Cayowaá', 'Perdizes'), ('02460-000', 'Rua Dr. César', 'Santana'),
+]
+
+CIDS = [('J18.9', 'Pneumonia não especificada'), ('I10', 'Hipertensão essencial'), ('E11.9', 'Diabetes tipo 2'),
+        ('N39.0', 'Infecção do trato urinário'), ('I21.9', 'Infarto agudo do miocárdio'), ('K35.8', 'Apendicite aguda'),
+        ('S72.0', 'Fratura do colo do fêmur'), ('I63.9', 'AVC isquêmico'), ('J44.1', 'DPOC com exacerbação'),
+        ('A41.9', 'Sepse não especificada')]
+
+# (nome, unidade); os primeiros saem bem mais (peso 1/posição)
+MEDICAMENTOS = [('Dipirona 500mg', 'un'), ('Paracetamol 750mg', 'un'), ('Soro Fisiológico 0,9%', 'ml'),
+                ('Omeprazol 20mg', 'un'), ('Ondansetrona 4mg', 'un'), ('Ceftriaxona 1g', 'un'),
+                ('Enoxaparina 40mg', 'un'), ('Insulina Regular', 'UI'), ('Captopril 25mg', 'un'),
+                ('Furosemida 40mg', 'un'), ('Tramadol 50mg', 'un'), ('Morfina 10mg', 'un'),
+                ('Metoclopramida 10mg', 'un'), ('Losartana 50mg', 'un'), ('Hidrocortisona 100mg', 'un'),
+                ('Amoxicilina 500mg', 'un'), ('Vancomicina 500mg', 'un'), ('Noradrenalina 4mg', 'ml')]
+PESOS_MEDICAMENTOS = [1 / (i + 1) for i in range(len(MEDICAMENTOS))]
+
+EVOLUCOES = ['Paciente estável, sem queixas.', 'Refere dor leve, medicado conforme prescrição.',
+             'Aceitou bem a dieta.', 'Sono preservado.', 'Mantém acesso venoso pérvio.',
+             'Deambulando com auxílio.', 'Febre durante a madrugada, comunicado plantonista.']
+
+# ==============================================================================
+# GERAÇÃO DE UM PACIENTE
+# ==============================================================================
+
+def _sortear_prioridade(rnd):
+    x, acumulado = rnd.random(), 0
+    for prioridade, peso in PRIORIDADES:
+        acumulado += peso
+        if x < acumulado:
+            return prioridade
+    return PRIORIDADES[-1][0]
+
+def _sinal(rnd, base, nome, casas=0):
+    media, desvio = base[nome]
+    minimo, maximo = LIMITES[nome]
+    return round(min(max(rnd.gauss(media, desvio), minimo), maximo), casas)
+
+def gerar_paciente(semente, indice, paciente_id, referencia, dias, fator_pv=1.0):
+    """
+    Retorna (linha de Pacientes, [linhas de ProvasDeVida], [linhas de EstoqueBaixas]).
+    Determinístico para (semente, indice, referencia, dias, fator_pv).
+    """
+    rnd = random.Random(f"{semente}:{indice}")
+    prioridade = _sortear_prioridade(rnd)
+    mediana, intervalo, doses_dia = PERFIL[prioridade]
+    intervalo = intervalo / fator_pv
+
+    entrada = referencia - timedelta(seconds=rnd.randrange(dias * 86400))
+    permanencia = timedelta(days=min(rnd.lognormvariate(math.log(mediana), 0.7), 120))
+    saida = entrada + permanencia
+    internado = saida > referencia
+    fim = referencia if internado else saida
+    quem_internou = rnd.choice(USUARIOS_REGISTRO)
+
+    cep, logradouro, bairro = rnd.choice(ENDERECOS)
+    cid, procedimento = rnd.choice(CIDS)
+    nascimento = (referencia - timedelta(days=rnd.randrange(365 * 1, 365 * 95))).date()
+    paciente = (
+        paciente_id, f"{rnd.choice(NOMES)} {rnd.choice(SOBRENOMES)} {rnd.choice(SOBRENOMES)}", nascimento,
+        f"9{paciente_id:010d}", cep, f"{logradouro}, {rnd.randrange(1, 3000)}", bairro, entrada.replace(microsecond=0),
+        None if internado else rnd.choice(USUARIOS_REGISTRO), None if internado else saida.replace(microsecond=0),
+        procedimento, 'internado' if internado else 'alta', quem_internou, cid, None, prioridade,
+    )
+
+    base = SINAIS_BASE[prioridade]
+    provas = []
+    momento = entrada + timedelta(minutes=rnd.randrange(15, 90))
+    while momento < fim:
+        pas = _sinal(rnd, base, 'pas')
+        pad = min(_sinal(rnd, base, 'pad'), pas - 20)
+        provas.append((
+            paciente_id, momento.replace(microsecond=0), f"{int(pas)}/{int(pad)}", int(pas), int(pad),
+            _sinal(rnd, base, 'glicose'), _sinal(rnd, base, 'sat', 1), int(_sinal(rnd, base, 'bpm')),
+            _sinal(rnd, base, 'temperatura', 1), rnd.choice(USUARIOS_REGISTRO),
+            rnd.choice(EVOLUCOES) if rnd.random() < 0.3 else None, None,
+        ))
+        momento += timedelta(hours=intervalo * rnd.uniform(0.8, 1.25))
+
+    baixas = []
+    segundos = max(int((fim - entrada).total_seconds()), 1)
+    media = doses_dia * segundos / 86400  # proporcional à permanência (aprox. Poisson)
+    doses = max(int(round(rnd.gauss(media, math.sqrt(media)))), 0)
+    for _ in range(doses):
+        nome, unidade = rnd.choices(MEDICAMENTOS, PESOS_MEDICAMENTOS)[0]
+        quantidade = rnd.choice((1, 1, 1, 2)) if unidade == 'un' else rnd.choice((10, 20, 100, 250))
+        baixas.append((nome, quantidade, unidade, f"Adm. Paciente ID {paciente_id}", rnd.choice(USUARIOS_REGISTRO),
+                       (entrada + timedelta(seconds=rnd.randrange(segundos))).replace(microsecond=0)))
+    return paciente, provas, baixas
+
+# ==============================================================================
+# GRAVAÇÃO
+# ==============================================================================
+
+SQL_PACIENTES = """
+    INSERT INTO Pacientes (id, nome, data_nascimento, cpf, cep, endereco, bairro, data_entrada, nome_baixa, data_baixa,
+                           procedimento, status, usuario_internacao, cid_10, observacoes_entrada, prioridade_atencao)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+SQL_PROVAS_VIDA = """
+    INSERT INTO ProvasDeVida (paciente_id, data_hora, pressao_arterial, pressao_sistolica, pressao_diastolica, glicose,
+                              saturacao, batimentos_cardiacos, temperatura, quem_efetuou, evolucao, observacoes)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+SQL_BAIXAS = """
+    INSERT INTO EstoqueBaixas (nome_medicamento, quantidade_removida, unidade, motivo, usuario_baixa, data_hora)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+def _inserir(cursor, sql, linhas):
+    for i in range(0, len(linhas), LINHAS_POR_INSERT):
+        cursor.executemany(sql, linhas[i:i + LINHAS_POR_INSERT])
+
+def criar_usuarios(cursor):
+    senha = generate_password_hash(SENHA_BENCH)
+    cursor.executemany("""
+        INSERT IGNORE INTO Usuarios (nome_completo, usuario, senha, data_nascimento, nivel_acesso, nacionalidade)
+        VALUES (%s, %s, %s, '1990-01-01', %s, 'Brasileiro')
+    """, [(f"Usuário de benchmark {u}", u, senha, nivel) for u, nivel in USUARIOS_BENCH])
+
+def _ajustar_estoque(cursor, baixado):
+    """
+    Cria os medicamentos do benchmark e deixa a razão coerente: uma entrada
+    cobrindo o saldo inicial mais tudo o que foi administrado e uma saída
+    agregada com as administrações geradas.
+    """
+    movimentos = []
+    for nome, unidade in MEDICAMENTOS:
+        cursor.execute("""
+            INSERT INTO Estoque (nome_medicamento, quantidade, unidade, data_ultima_entrada, usuario_ultima_alteracao)
+            VALUES (%s, %s, %s, NOW(), 'bench_admin') ON DUPLICATE KEY UPDATE
+            id = LAST_INSERT_ID(id), quantidade = quantidade + VALUES(quantidade)
+        """, (nome, ESTOQUE_INICIAL, unidade))
+        item_id = cursor.lastrowid
+        total = baixado.get(nome, 0)
+        movimentos.append((item_id, nome, 'entrada', ESTOQUE_INICIAL + total, 'Carga sintética (benchmark)', 'bench_admin'))
+        if total:
+            movimentos.append((item_id, nome, 'saida', -total, 'Administrações sintéticas (benchmark)', 'bench_admin'))
+    estoque_servico.criar_tabelas(cursor)
+    estoque_servico.registrar_movimentos(cursor, movimentos)
+
+def gerar(conn, pacientes, semente=42, dias=365, referencia=None, fator_pv=1.0, resumos=True):
+    """Gera e grava a massa. Retorna {'pacientes', 'provas_vida', 'baixas', 'segundos', 'linhas_por_segundo'}."""
+    referencia = referencia or datetime.now().replace(minute=0, second=0, microsecond=0)
+    migracoes.migrar(conn)
+    cursor = conn.cursor()
+    cursor.execute("SET SESSION unique_checks = 0")
+    cursor.execute("SET SESSION foreign_key_checks = 0")
+    criar_usuarios(cursor)
+    cursor.execute("SELECT IFNULL(MAX(id), 0) AS ultimo FROM Pacientes")
+    linha = cursor.fetchone()
+    primeiro_id = (linha['ultimo'] if isinstance(linha, dict) else linha[0]) + 1
+    conn.commit()
+
+    totais = {'pacientes': 0, 'provas_vida': 0, 'baixas': 0}
+    baixado = {}
+    inicio = time.perf_counter()
+    try:
+        for bloco in range(0, pacientes, PACIENTES_POR_BLOCO):
+            linhas_pac, linhas_pv, linhas_bx = [], [], []
+            for indice in range(bloco, min(bloco + PACIENTES_POR_BLOCO, pacientes)):
+                paciente, provas, baixas = gerar_paciente(semente, indice, primeiro_id + indice, referencia, dias, fator_pv)
+                linhas_pac.append(paciente)
+                linhas_pv.extend(provas)
+                linhas_bx.extend(baixas)
+            for nome, quantidade, *_ in linhas_bx:
+                baixado[nome] = baixado.get(nome, 0) + quantidade
+
+            _inserir(cursor, SQL_PACIENTES, linhas_pac)
+            _inserir(cursor, SQL_PROVAS_VIDA, linhas_pv)
+            _inserir(cursor, SQL_BAIXAS, linhas_bx)
+            conn.commit()
+
+            totais['pacientes'] += len(linhas_pac)
+            totais['provas_vida'] += len(linhas_pv)
+            totais['baixas'] += len(linhas_bx)
+            linhas = sum(totais.values())
+            print(f"  - {totais['pacientes']} pacientes, {totais['provas_vida']} provas de vida, "
+                  f"{totais['baixas']} baixas ({linhas / (time.perf_counter() - inicio):.0f} linhas/s)")
+
+        _ajustar_estoque(cursor, baixado)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.execute("SET SESSION unique_checks = 1")
+        cursor.execute("SET SESSION foreign_key_checks = 1")
+        cursor.close()
+
+    segundos = time.perf_counter() - inicio
+    totais['segundos'] = round(segundos, 1)
+    totais['linhas_por_segundo'] = round((totais['pacientes'] + totais['provas_vida'] + totais['baixas']) / segundos)
+
+    if resumos:
+        print("  - Recalculando estatísticas, séries de sinais vitais e saldos...")
+        estatisticas.reconstruir(conn)
+        sinais_vitais.reconstruir(conn)
+        estoque_servico.reconstruir_saldos(conn)
+    return totais
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Gera massa hospitalar sintética no banco de database.py.")
+    parser.add_argument('--pacientes', type=int, default=10000)
+    parser.add_argument('--semente', type=int, default=42)
+    parser.add_argument('--dias', type=int, default=365, help="janela das entradas até a referência")
+    parser.add_argument('--referencia', type=datetime.fromisoformat, default=None,
+                        help="data 'atual' da massa (AAAA-MM-DD[ HH:MM]); padrão: agora")
+    parser.add_argument('--fator-pv', type=float, default=1.0, help="multiplica a frequência das provas de vida")
+    parser.add_argument('--sem-resumos', action='store_true', help="não recalcula as tabelas de resumo no fim")
+    opcoes = parser.parse_args()
+
+    conn = create_db_connection(pymysql.cursors.DictCursor)
+    if conn is None:
+        raise SystemExit(1)
+    try:
+        r = gerar(conn, opcoes.pacientes, opcoes.semente, opcoes.dias, opcoes.referencia,
+                  opcoes.fator_pv, not opcoes.sem_resumos)
+    finally:
+        conn.close()
+    print(f"✅ {r['pacientes']} pacientes, {r['provas_vida']} provas de vida e {r['baixas']} baixas "
+          f"em {r['segundos']}s ({r['linhas_por_segundo']} linhas/s).")
@@ -0,0 +1,113 @@
+"""
+Benchmark da ingestão em lote de provas de vida (ingestao.ingerir).
+
+Ingere leituras sintéticas, repete o envio (tudo tem de voltar como
+'duplicada') e, com --concorrentes, manda o mesmo lote por várias conexões ao
+mesmo tempo: cada leitura só pode ser gravada e contada nos resumos uma vez.
+
+Roda num banco descartável, como concorrencia_estoque.py: cria um schema novo
+no servidor de database.py, aplica as migrações, cria os pacientes, executa o
+benchmark e apaga o schema no fim, mesmo se algo falhar.
+
+    python -m benchmark.ingestao_lote [--leituras 20000] [--pacientes 50] [--concorrentes 4]
+"""
+import argparse
+import random
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+import pymysql.cursors
+
+import ingestao
+import migracoes
+from database import DB_CONFIG
+
+def _conectar(banco=None):
+    config = {k: v for k, v in DB_CONFIG.items() if k != 'database'}
+    if banco:
+        config['database'] = banco
+    return pymysql.connect(**config, cursorclass=pymysql.cursors.DictCursor)
+
+def _leituras(pacientes, total):
+    base = datetime.now() - timedelta(days=2)
+    return [{
+        'chave': f"bench-{i}",
+        'paciente_id': random.choice(pacientes),
+        'data_hora': (base + timedelta(seconds=i * 5)).isoformat(),
+        'pa': f"{random.randint(100, 160)}/{random.randint(60, 95)}",
+        'sat': random.randint(88, 100),
+        'bpm': random.randint(55, 120),
+        'temperatura': round(random.uniform(35.5, 39.0), 1),
+    } for i in range(total)]
+
+def testar(conn_factory, total=20000, n_pacientes=50, concorrentes=4):
+    """Mede a ingestão e o reenvio e confere que envios simultâneos não duplicam."""
+    conn = conn_factory()
+    cur = conn.cursor()
+    cur.executemany("INSERT INTO Pacientes (nome, data_entrada, status) VALUES (%s, NOW(), 'internado')",
+                    [(f"Paciente {i}",) for i in range(n_pacientes)])
+    conn.commit()
+    cur.execute("SELECT id FROM Pacientes")
+    pacientes = [r['id'] for r in cur.fetchall()]
+
+    leituras = _leituras(pacientes, total)
+    r1 = ingestao.ingerir(conn, leituras, 'benchmark')
+    r2 = ingestao.ingerir(conn, leituras, 'benchmark')
+    print(f"✅ {r1['inseridas']} leituras em {r1['segundos']}s ({r1['linhas_por_segundo']} linhas/s).")
+    print(f"✅ Reenvio: {r2['duplicadas']} duplicadas em {r2['segundos']}s.")
+    assert r1['inseridas'] == total, f"{r1['inseridas']} de {total} leituras gravadas"
+    assert r2['duplicadas'] == total, f"reenvio com {r2['duplicadas']} duplicadas de {total}"
+
+    if concorrentes > 1:
+        lote = [{**l, 'chave': f"conc-{i}"} for i, l in enumerate(_leituras(pacientes, total))]
+        inseridas = []
+        trava = threading.Lock()
+
+        def enviar():
+            c = conn_factory()
+            try:
+                r = ingestao.ingerir(c, lote, 'benchmark')
+                with trava:
+                    inseridas.append(r['inseridas'])
+            finally:
+                c.close()
+
+        ts = [threading.Thread(target=enviar) for _ in range(concorrentes)]
+        for t in ts:
+            t.start()
+        for t in ts:
+            t.join()
+
+        cur.execute("SELECT COUNT(*) AS n FROM ProvasDeVida WHERE chave_idempotencia LIKE 'conc-%'")
+        gravadas = cur.fetchone()['n']
+        print(f"✅ {concorrentes} envios simultâneos do mesmo lote: {sum(inseridas)} inseridas, {gravadas} linhas.")
+        assert gravadas == total, f"{gravadas} linhas para {total} leituras"
+        assert sum(inseridas) == total, f"{sum(inseridas)} leituras contadas como inseridas para {total}"
+
+    cur.execute("SELECT SUM(total) AS n FROM EstatisticasProvasVida")
+    contadas = int(cur.fetchone()['n'] or 0)
+    conn.close()
+    esperado = total * (2 if concorrentes > 1 else 1)
+    assert contadas == esperado, f"estatísticas com {contadas} provas de vida, esperado {esperado}"
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Ingestão em lote num banco descartável.")
+    parser.add_argument('--leituras', type=int, default=20000)
+    parser.add_argument('--pacientes', type=int, default=50)
+    parser.add_argument('--concorrentes', type=int, default=4, help="envios simultâneos do mesmo lote (1 = nenhum)")
+    opcoes = parser.parse_args()
+
+    banco = f"{DB_CONFIG['database']}_teste_{uuid.uuid4().hex[:8]}"
+    admin = _conectar()
+    admin.cursor().execute(f"CREATE DATABASE `{banco}`")
+    try:
+        conn = _conectar(banco)
+        try:
+            migracoes.migrar(conn)
+        finally:
+            conn.close()
+        testar(lambda: _conectar(banco), opcoes.leituras, opcoes.pacientes, opcoes.concorrentes)
+    finally:
+        admin.cursor().execute(f"DROP DATABASE IF EXISTS `{banco}`")
+        admin.close()
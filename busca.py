@@ -0,0 +1,108 @@
+"""
+Busca de pacientes no servidor (nome, CPF e CEP).
+
+- Só dígitos: CPF completo (índice único), CEP completo (cep_digitos) ou
+  prefixo de CPF/CEP.
+- Texto: primeiro os nomes que começam com o termo (índice em nome), depois
+  os que contêm o termo em qualquer posição (FULLTEXT n-gram).
+
+Acentos e maiúsculas são ignorados pela collation utf8mb4_0900_ai_ci.
+"""
+import re
+
+import arquivamento
+
+LIMITE_PADRAO = 10
+LIMITE_MAXIMO = 50
+
+# Caracteres com significado especial no modo BOOLEAN do FULLTEXT
+_ESPECIAIS_FULLTEXT = re.compile(r'[+\-<>()~*"@]')
+
+CAMPOS = "id, nome, cpf, cep, status, prioridade_atencao, data_entrada, data_baixa"
+
+def somente_digitos(texto):
+    return re.sub(r'\D', '', texto or '')
+
+def mascarar_cpf(cpf):
+    cpf = somente_digitos(cpf)
+    if len(cpf) != 11:
+        return cpf
+    return f"***.{cpf[3:6]}.{cpf[6:9]}-**"
+
+def _filtro_status(status):
+    if status in ('internado', 'alta'):
+        return " AND status = %s", [status]
+    return "", []
+
+def buscar_pacientes(cursor, termo, status=None, limite=LIMITE_PADRAO):
+    termo = (termo or '').strip()
+    limite = max(1, min(int(limite), LIMITE_MAXIMO))
+    if not termo:
+        return []
+
+    # Altas antigas estão em PacientesArquivo (mesmos índices); internados, nunca.
+    # Cada camada é consultada direto: o MATCH do FULLTEXT não passa por uma UNION.
+    tabelas = ['Pacientes']
+    if status != 'internado' and arquivamento.existe_arquivo(cursor):
+        tabelas.append(arquivamento.TABELAS['Pacientes'])
+    resultados = []
+    for tabela in tabelas:
+        if len(resultados) >= limite:
+            break
+        resultados.extend(_buscar(cursor, tabela, termo, status, limite - len(resultados)))
+    return _formatar(resultados)
+
+def _buscar(cursor, tabela, termo, status, limite):
+    sql_status, params_status = _filtro_status(status)
+    digitos = somente_digitos(termo)
+
+    # Termo numérico (com ou sem máscara): CPF ou CEP
+    if digitos and not re.search(r'[^\d.\-/\s]', termo):
+        if len(digitos) == 11:
+            cursor.execute(f"SELECT {CAMPOS} FROM {tabela} WHERE cpf = %s{sql_status} LIMIT %s",
+                           [digitos] + params_status + [limite])
+        elif len(digitos) == 8:
+            cursor.execute(f"SELECT {CAMPOS} FROM {tabela} WHERE cep_digitos = %s{sql_status} ORDER BY nome LIMIT %s",
+                           [digitos] + params_status + [limite])
+        else:
+            cursor.execute(f"""
+                (SELECT {CAMPOS} FROM {tabela} WHERE cpf LIKE %s{sql_status} LIMIT %s)
+                UNION
+                (SELECT {CAMPOS} FROM {tabela} WHERE cep_digitos LIKE %s{sql_status} LIMIT %s)
+                LIMIT %s
+            """, [digitos + '%'] + params_status + [limite] + [digitos + '%'] + params_status + [limite, limite])
+        return list(cursor.fetchall())
+
+    # 1) Prefixo do nome (usa o índice B-tree)
+    prefixo = termo.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%'
+    cursor.execute(f"SELECT {CAMPOS} FROM {tabela} WHERE nome LIKE %s{sql_status} ORDER BY nome LIMIT %s",
+                   [prefixo] + params_status + [limite])
+    resultados = list(cursor.fetchall())
+
+    # 2) Trecho em qualquer posição (FULLTEXT n-gram), completando até o limite
+    palavras = [p for p in _ESPECIAIS_FULLTEXT.sub(' ', termo).split() if len(p) >= 2]
+    if len(resultados) < limite and palavras:
+        consulta = ' '.join(f'+"{p}"' for p in palavras)
+        ja_vistos = [r['id'] for r in resultados] or [0]
+        marcadores = ', '.join(['%s'] * len(ja_vistos))
+        cursor.execute(f"""
+            SELECT {CAMPOS} FROM {tabela}
+            WHERE MATCH(nome) AGAINST (%s IN BOOLEAN MODE){sql_status} AND id NOT IN ({marcadores})
+            ORDER BY MATCH(nome) AGAINST (%s IN BOOLEAN MODE) DESC, nome
+            LIMIT %s
+        """, [consulta] + params_status + ja_vistos + [consulta, limite - len(resultados)])
+        resultados.extend(cursor.fetchall())
+
+    return resultados
+
+def _formatar(linhas):
+    return [{
+        'id': r['id'],
+        'nome': r['nome'],
+        'cpf': mascarar_cpf(r['cpf']),
+        'cep': r['cep'],
+        'status': r['status'],
+        'prioridade': r['prioridade_atencao'],
+        'data_entrada': r['data_entrada'].strftime('%d/%m/%Y') if r['data_entrada'] else None,
+        'data_baixa': r['data_baixa'].strftime('%d/%m/%Y') if r['data_baixa'] else None,
+    } for r in linhas]
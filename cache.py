@@ -0,0 +1,233 @@
+"""
+Cache dos endpoints de KPI e gráficos.
+
+Os widgets do dashboard consultam os mesmos números para todos os usuários;
+este módulo guarda o resultado por (endpoint, parâmetros) com:
+
+- TTL (as janelas "últimos N dias" andam com o relógio);
+- limite de tamanho com descarte LRU;
+- coalescência: se várias requisições erram o cache ao mesmo tempo, só uma
+  executa a consulta e as outras esperam o resultado;
+- invalidação explícita por tag, chamada pelas rotas de escrita depois do
+  commit (ex.: invalidar('altas') em dar_alta);
+- contadores de acertos/erros em estatisticas().
+
+O backend padrão é local ao processo. Com vários workers, configure
+CACHE_CONFIG['backend'] = 'redis' (precisa do pacote redis) para que todos
+compartilhem as entradas e as invalidações. No backend local, o que outro
+processo altera (o trabalhador de tarefas.py) chega pela tabela Versoes: o
+app chama sincronizar() no máximo a cada sincronizar_a_cada segundos e as
+tags cuja versão mudou são invalidadas.
+"""
+import json
+import threading
+import time
+from collections import OrderedDict
+
+CACHE_CONFIG = {
+    "backend": "local",        # 'local' ou 'redis'
+    "ttl_padrao": 60,          # segundos
+    "tamanho_maximo": 1024,    # entradas (backend local)
+    "redis_url": "redis://127.0.0.1:6379/0",
+    "prefixo": "hospitalar",
+    "sincronizar_a_cada": 2.0  # segundos entre leituras de Versoes (backend local)
+}
+
+# ==============================================================================
+# BACKENDS
+# ==============================================================================
+
+class CacheLocal:
+    """LRU em memória com TTL e tags; seguro para threads."""
+
+    def __init__(self, tamanho_maximo=1024):
+        self.tamanho_maximo = tamanho_maximo
+        self._dados = OrderedDict()   # chave -> (expira_em, tags, valor)
+        self._lock = threading.Lock()
+        self.descartes = 0
+
+    def obter(self, chave):
+        with self._lock:
+            item = self._dados.get(chave)
+            if item is None:
+                return None, False
+            expira_em, _, valor = item
+            if expira_em < time.monotonic():
+                del self._dados[chave]
+                return None, False
+            self._dados.move_to_end(chave)
+            return valor, True
+
+    def gravar(self, chave, valor, ttl, tags):
+        with self._lock:
+            self._dados[chave] = (time.monotonic() + ttl, frozenset(tags), valor)
+            self._dados.move_to_end(chave)
+            while len(self._dados) > self.tamanho_maximo:
+                self._dados.popitem(last=False)
+                self.descartes += 1
+
+    def invalidar(self, tags):
+        tags = set(tags)
+        with self._lock:
+            for chave in [c for c, (_, t, _) in self._dados.items() if t & tags]:
+                del self._dados[chave]
+
+    def limpar(self):
+        with self._lock:
+            self._dados.clear()
+
+    def __len__(self):
+        return len(self._dados)
+
+
+class CacheRedis:
+    """
+    Backend compartilhado entre processos. Cada tag tem um contador de versão;
+    invalidar incrementa o contador e as chaves antigas deixam de ser lidas
+    (e expiram sozinhas pelo TTL).
+    """
+
+    def __init__(self, url, prefixo='hospitalar'):
+        import redis
+        self._r = redis.Redis.from_url(url)
+        self._prefixo = prefixo
+        self.descartes = 0
+
+    def _chave(self, chave, tags):
+        tags = sorted(tags)
+        versoes = self._r.mget([f"{self._prefixo}:tag:{t}" for t in tags]) if tags else []
+        assinatura = ','.join(f"{t}={int(v or 0)}" for t, v in zip(tags, versoes))
+        return f"{self._prefixo}:cache:{assinatura}:{chave}"
+
+    def obter(self, chave, tags=()):
+        bruto = self._r.get(self._chave(chave, tags))
+        if bruto is None:
+            return None, False
+        return json.loads(bruto), True
+
+    def gravar(self, chave, valor, ttl, tags):
+        self._r.set(self._chave(chave, tags), json.dumps(valor, default=str), ex=max(1, int(ttl)))
+
+    def invalidar(self, tags):
+        pipe = self._r.pipeline()
+        for t in tags:
+            pipe.incr(f"{self._prefixo}:tag:{t}")
+        pipe.execute()
+
+    def limpar(self):
+        for chave in self._r.scan_iter(f"{self._prefixo}:cache:*"):
+            self._r.delete(chave)
+
+    def __len__(self):
+        return sum(1 for _ in self._r.scan_iter(f"{self._prefixo}:cache:*"))
+
+# ==============================================================================
+# FACHADA
+# ==============================================================================
+
+class Cache:
+    def __init__(self, backend, ttl_padrao=60):
+        self.backend = backend
+        self.ttl_padrao = ttl_padrao
+        self._em_calculo = {}          # chave -> threading.Event
+        self._lock = threading.Lock()
+        self._stats = {'acertos': 0, 'erros': 0, 'coalescidas': 0, 'invalidacoes': 0}
+        self._versoes_vistas = {}      # tag -> versão em Versoes na última sincronização
+        self._sincronizado_em = 0.0
+
+    def _ler(self, chave, tags):
+        if isinstance(self.backend, CacheRedis):
+            return self.backend.obter(chave, tags)
+        return self.backend.obter(chave)
+
+    def obter_ou_calcular(self, chave, funcao, ttl=None, tags=()):
+        """Retorna o valor em cache ou executa funcao() (uma única vez por chave)."""
+        chave = chave if isinstance(chave, str) else ':'.join(map(str, chave))
+        ttl = self.ttl_padrao if ttl is None else ttl
+
+        while True:
+            valor, achou = self._ler(chave, tags)
+            if achou:
+                with self._lock:
+                    self._stats['acertos'] += 1
+                return valor
+
+            with self._lock:
+                evento = self._em_calculo.get(chave)
+                if evento is None:
+                    # Esta thread calcula; as demais esperam no evento
+                    evento = self._em_calculo[chave] = threading.Event()
+                    self._stats['erros'] += 1
+                    break
+                self._stats['coalescidas'] += 1
+            evento.wait(30)
+
+        try:
+            valor = funcao()
+            self.backend.gravar(chave, valor, ttl, tags)
+            return valor
+        finally:
+            with self._lock:
+                self._em_calculo.pop(chave, None)
+            evento.set()
+
+    def invalidar(self, *tags):
+        self.backend.invalidar(tags)
+        with self._lock:
+            self._stats['invalidacoes'] += 1
+
+    def precisa_sincronizar(self):
+        """True (uma vez por intervalo) se o backend é local e está na hora de ler Versoes."""
+        if isinstance(self.backend, CacheRedis):
+            return False
+        agora = time.monotonic()
+        with self._lock:
+            if agora - self._sincronizado_em < CACHE_CONFIG['sincronizar_a_cada']:
+                return False
+            self._sincronizado_em = agora
+            return True
+
+    def sincronizar(self, estado):
+        """Invalida as tags cuja versão mudou desde a última chamada. estado = versoes.ler(...)."""
+        with self._lock:
+            mudaram = [t for t, (v, _) in estado.items() if self._versoes_vistas.get(t, v) != v]
+            self._versoes_vistas.update((t, v) for t, (v, _) in estado.items())
+        if mudaram:
+            self.invalidar(*mudaram)
+
+    def limpar(self):
+        self.backend.limpar()
+
+    def estatisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+        total = stats['acertos'] + stats['erros']
+        stats['taxa_acerto'] = round(stats['acertos'] / total, 3) if total else 0.0
+        stats['entradas'] = len(self.backend)
+        stats['descartes_lru'] = self.backend.descartes
+        stats['backend'] = type(self.backend).__name__
+        return stats
+
+
+def _criar_cache():
+    if CACHE_CONFIG['backend'] == 'redis':
+        try:
+            backend = CacheRedis(CACHE_CONFIG['redis_url'], CACHE_CONFIG['prefixo'])
+        except ImportError:
+            print("⚠️ Pacote 'redis' não instalado; usando cache local.")
+            backend = CacheLocal(CACHE_CONFIG['tamanho_maximo'])
+    else:
+        backend = CacheLocal(CACHE_CONFIG['tamanho_maximo'])
+    return Cache(backend, CACHE_CONFIG['ttl_padrao'])
+
+# Instância usada pelo app
+cache = _criar_cache()
+
+# Tags usadas pelas rotas (o que cada escrita invalida)
+TAG_INTERNACOES = 'internacoes'
+TAG_ALTAS = 'altas'
+TAG_PROVAS_VIDA = 'provas_vida'
+TAG_MEDICAMENTOS = 'medicamentos'
+TAG_ESTOQUE = 'estoque'
+TAG_USUARIOS = 'usuarios'
+TODAS_AS_TAGS = (TAG_INTERNACOES, TAG_ALTAS, TAG_PROVAS_VIDA, TAG_MEDICAMENTOS, TAG_ESTOQUE)
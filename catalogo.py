@@ -0,0 +1,184 @@
+"""
+Índice em memória do catálogo de medicamentos (Estoque.nome_medicamento).
+
+Os formulários de prontuário e de prova de vida mandavam a lista inteira
+do estoque num <select> a cada carregamento, e um nome digitado à mão só
+dava baixa se fosse idêntico ao do cadastro ("Dipirna" virava "não
+encontrado no estoque; baixa não realizada"). Agora:
+
+- /api/medicamentos/sugestao?q= responde o autocompletar a partir de uma
+  trie de prefixos (do nome e de cada palavra dele, então "sodio" acha
+  "Cloreto de Sódio 0,9%") e, para erros de digitação, de um índice de
+  trigramas;
+- resolver() troca um nome digitado pelo item mais parecido do catálogo
+  antes da baixa, desde que a semelhança seja alta e sem empate.
+
+Nomes são comparados sem acentos e sem maiúsculas, como a collation do
+banco. O índice é montado do banco no primeiro uso, marcado como velho
+pelas rotas que mexem no estoque (invalidar()) e refeito na próxima
+consulta; com vários workers, cada um também refaz a cada
+CATALOGO_CONFIG['reconstruir_a_cada'] segundos.
+"""
+import re
+import threading
+import time
+import unicodedata
+
+CATALOGO_CONFIG = {
+    "reconstruir_a_cada": 60,   # segundos (escritas de outros workers)
+    "limite_padrao": 8,
+    "limite_maximo": 30,
+    "por_no": 30,               # sugestões guardadas em cada nó da trie
+    "semelhanca_minima": 0.5,   # coeficiente de Dice dos trigramas para resolver()
+    "semelhanca_sugestao": 0.4, # para completar as sugestões quando faltam prefixos
+    "margem": 0.1,              # o melhor precisa ganhar do segundo por essa diferença
+}
+
+def normalizar(texto):
+    """Sem acentos, minúsculas e espaços simples ('Sódio  0,9%' -> 'sodio 0,9%')."""
+    texto = unicodedata.normalize('NFKD', str(texto or ''))
+    texto = ''.join(c for c in texto if not unicodedata.combining(c))
+    return re.sub(r'\s+', ' ', texto.casefold()).strip()
+
+def numeros(texto):
+    return re.findall(r'\d+(?:[.,]\d+)?', texto)
+
+def trigramas(texto):
+    texto = f"  {texto} "
+    return {texto[i:i + 3] for i in range(len(texto) - 2)}
+
+class CatalogoMedicamentos:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._itens = []         # dicts do banco (id, nome_medicamento, quantidade, unidade)
+        self._normais = []       # nome normalizado de cada item
+        self._exatos = {}        # nome normalizado -> índice
+        self._trie = {}          # caractere -> nó; nó[''] = índices (até 'por_no', em ordem de nome)
+        self._trigramas = {}     # trigrama -> set de índices
+        self._tamanhos = []      # quantidade de trigramas de cada item
+        self.carregado_em = None
+
+    # --------------------------------------------------------------------------
+    # Montagem
+    # --------------------------------------------------------------------------
+
+    def reconstruir(self, cursor):
+        cursor.execute("SELECT id, nome_medicamento, quantidade, unidade FROM Estoque ORDER BY nome_medicamento")
+        itens = list(cursor.fetchall())
+        normais = [normalizar(i['nome_medicamento']) for i in itens]
+        trie, indice_trigramas, tamanhos = {}, {}, []
+        por_no = CATALOGO_CONFIG['por_no']
+
+        for pos, nome in enumerate(normais):
+            # Prefixo do nome inteiro e de cada palavra; o nome inteiro vem antes na lista
+            inicios = [0] + [m.start() for m in re.finditer(r'(?<=[\s\-/(])\w', nome)]
+            for inicio in inicios:
+                no = trie
+                for c in nome[inicio:]:
+                    no = no.setdefault(c, {})
+                    lista = no.setdefault('', [])
+                    if len(lista) < por_no and (not lista or lista[-1] != pos):
+                        lista.append(pos)
+            grams = trigramas(nome)
+            tamanhos.append(len(grams))
+            for t in grams:
+                indice_trigramas.setdefault(t, set()).add(pos)
+
+        with self._lock:
+            self._itens, self._normais = itens, normais
+            self._exatos = {nome: pos for pos, nome in enumerate(normais)}
+            self._trie, self._trigramas, self._tamanhos = trie, indice_trigramas, tamanhos
+            self.carregado_em = time.monotonic()
+        return len(itens)
+
+    def invalidar(self):
+        """Chamado depois de um commit que mexe no estoque."""
+        self.carregado_em = None
+
+    def precisa_reconstruir(self):
+        return self.carregado_em is None or \
+            time.monotonic() - self.carregado_em > CATALOGO_CONFIG['reconstruir_a_cada']
+
+    # --------------------------------------------------------------------------
+    # Consulta
+    # --------------------------------------------------------------------------
+
+    def _prefixo(self, termo):
+        no = self._trie
+        for c in termo:
+            no = no.get(c)
+            if no is None:
+                return []
+        return no.get('', [])
+
+    def _semelhantes(self, termo):
+        """[(dice, índice)] dos itens que dividem trigramas com o termo, do mais parecido."""
+        grams = trigramas(termo)
+        contagem = {}
+        for t in grams:
+            for pos in self._trigramas.get(t, ()):
+                contagem[pos] = contagem.get(pos, 0) + 1
+        return sorted(((2 * n / (len(grams) + self._tamanhos[pos]), pos) for pos, n in contagem.items()),
+                      key=lambda par: (-par[0], self._normais[par[1]]))
+
+    def sugerir(self, termo, limite=None):
+        """Prefixos primeiro (nome inteiro, depois palavra), completados pelos mais parecidos."""
+        limite = max(1, min(limite or CATALOGO_CONFIG['limite_padrao'], CATALOGO_CONFIG['limite_maximo']))
+        termo = normalizar(termo)
+        if not termo:
+            return []
+        with self._lock:
+            ordem = sorted(self._prefixo(termo), key=lambda pos: (not self._normais[pos].startswith(termo),
+                                                                  self._normais[pos]))[:limite]
+            if len(ordem) < limite and len(termo) >= 4:
+                vistos = set(ordem)
+                for dice, pos in self._semelhantes(termo):
+                    if len(ordem) >= limite or dice < CATALOGO_CONFIG['semelhanca_sugestao']:
+                        break
+                    if pos not in vistos:
+                        ordem.append(pos)
+            return [self._formatar(pos) for pos in ordem]
+
+    def resolver(self, nome):
+        """Nome do catálogo para um nome digitado, ou None se não houver um claramente mais parecido."""
+        termo = normalizar(nome)
+        if not termo:
+            return None
+        with self._lock:
+            if termo in self._exatos:
+                return self._itens[self._exatos[termo]]['nome_medicamento']
+            # A dosagem precisa bater: 'Dipirona 1g' nunca vira 'Dipirona 500mg', nem
+            # 'Dipirona' vira uma das apresentações
+            dosagem = numeros(termo)
+            candidatos = [(dice, pos) for dice, pos in self._semelhantes(termo)
+                          if numeros(self._normais[pos]) == dosagem][:2]
+        if not candidatos or candidatos[0][0] < CATALOGO_CONFIG['semelhanca_minima']:
+            return None
+        if len(candidatos) > 1 and candidatos[0][0] - candidatos[1][0] < CATALOGO_CONFIG['margem']:
+            return None  # empate: melhor não adivinhar qual remédio baixar
+        return self._itens[candidatos[0][1]]['nome_medicamento']
+
+    def resolver_itens(self, itens):
+        """
+        [(nome, qtd)] -> ([(nome do catálogo, qtd)], [(digitado, resolvido)]).
+        Nomes sem correspondência segura seguem como vieram (e viram
+        'não encontrado' em estoque_servico.debitar).
+        """
+        resolvidos, correcoes = [], []
+        for nome, qtd in itens:
+            encontrado = self.resolver(nome)
+            if encontrado and normalizar(encontrado) != normalizar(nome):
+                correcoes.append((nome, encontrado))
+            resolvidos.append((encontrado or nome, qtd))
+        return resolvidos, correcoes
+
+    def _formatar(self, pos):
+        item = self._itens[pos]
+        return {'id': item['id'], 'nome_medicamento': item['nome_medicamento'],
+                'quantidade': item['quantidade'], 'unidade': item['unidade']}
+
+    def __len__(self):
+        return len(self._itens)
+
+# Instância usada pelo app
+catalogo = CatalogoMedicamentos()
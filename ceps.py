@@ -0,0 +1,252 @@
+"""
+Consulta de CEP no servidor (/api/cep/<cep>).
+
+Ordem da consulta:
+1. cache em memória (LRU com TTL; guarda também os "não encontrado");
+2. tabela local Ceps, semeada com os endereços já cadastrados em Pacientes
+   e com arquivos de CEP importados;
+3. buscador externo opcional (ViaCEP por padrão), com timeout curto. O que
+   ele encontra é gravado na tabela, então cada CEP sai para a internet uma
+   vez só.
+
+Sem internet (ou com CEP_CONFIG['externo'] = None) a admissão continua
+funcionando com a base local. Para testes há o BuscadorLocal, que responde a
+partir de um dicionário:
+
+    ceps.definir_buscador(ceps.BuscadorLocal({'92511565': {...}}))
+
+Importação em massa (CSV com cep, logradouro, bairro, cidade, uf; separador
+',' ou ';'):
+
+    flask --app app importar-ceps caminho/arquivo.csv
+"""
+import csv
+import json
+import re
+import urllib.error
+import urllib.request
+from collections import Counter
+
+from cache import CacheLocal
+
+CEP_CONFIG = {
+    "externo": "viacep",      # 'viacep' ou None (só base local)
+    "timeout": 2.0,           # segundos para o buscador externo
+    "ttl_encontrado": 86400,  # segundos no cache em memória
+    "ttl_nao_encontrado": 600,
+    "ttl_indisponivel": 60,   # externo fora do ar: evita repetir a espera a cada digitação
+    "tamanho_cache": 5000
+}
+
+CAMPOS = ('logradouro', 'bairro', 'cidade', 'uf')
+
+SQL_TABELA = """
+    CREATE TABLE IF NOT EXISTS Ceps (
+        cep CHAR(8) NOT NULL PRIMARY KEY,
+        logradouro VARCHAR(255),
+        bairro VARCHAR(100),
+        cidade VARCHAR(100),
+        uf CHAR(2),
+        origem ENUM('pacientes', 'arquivo', 'externo') NOT NULL,
+        atualizado_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+    )
+"""
+
+NAO_ENCONTRADO = 'nao_encontrado'
+INDISPONIVEL = 'indisponivel'
+
+class BuscadorIndisponivel(Exception):
+    """O serviço externo não respondeu (timeout, rede, erro HTTP)."""
+
+def normalizar(cep):
+    """'92511-565' -> '92511565'; None se não tiver 8 dígitos."""
+    digitos = re.sub(r'\D', '', cep or '')
+    return digitos if len(digitos) == 8 else None
+
+# ==============================================================================
+# BUSCADORES EXTERNOS
+# ==============================================================================
+
+class BuscadorViaCep:
+    url = "https://viacep.com.br/ws/{cep}/json/"
+
+    def __init__(self, timeout=2.0):
+        self.timeout = timeout
+
+    def buscar(self, cep):
+        """Retorna o dict do endereço, None se o CEP não existe, ou lança BuscadorIndisponivel."""
+        try:
+            with urllib.request.urlopen(self.url.format(cep=cep), timeout=self.timeout) as resposta:
+                dados = json.loads(resposta.read().decode('utf-8'))
+        except urllib.error.HTTPError as e:
+            if e.code == 400:
+                return None
+            raise BuscadorIndisponivel(str(e))
+        except (urllib.error.URLError, TimeoutError, OSError, ValueError) as e:
+            raise BuscadorIndisponivel(str(e))
+        if dados.get('erro'):
+            return None
+        return {'logradouro': dados.get('logradouro'), 'bairro': dados.get('bairro'),
+                'cidade': dados.get('localidade'), 'uf': dados.get('uf')}
+
+class BuscadorLocal:
+    """Substituto sem rede (testes e desenvolvimento)."""
+
+    def __init__(self, enderecos=None, indisponivel=False):
+        self.enderecos = {normalizar(c): e for c, e in (enderecos or {}).items()}
+        self.indisponivel = indisponivel
+        self.consultas = 0
+
+    def buscar(self, cep):
+        self.consultas += 1
+        if self.indisponivel:
+            raise BuscadorIndisponivel("buscador local marcado como indisponível")
+        return self.enderecos.get(cep)
+
+def _criar_buscador():
+    if CEP_CONFIG['externo'] == 'viacep':
+        return BuscadorViaCep(CEP_CONFIG['timeout'])
+    return None
+
+_buscador = _criar_buscador()
+_cache = CacheLocal(CEP_CONFIG['tamanho_cache'])
+
+def definir_buscador(buscador):
+    """Troca o buscador externo (None desliga)."""
+    global _buscador
+    _buscador = buscador
+    _cache.limpar()
+
+# ==============================================================================
+# CONSULTA
+# ==============================================================================
+
+def _ler_tabela(cursor, cep):
+    cursor.execute("SELECT cep, logradouro, bairro, cidade, uf, origem FROM Ceps WHERE cep = %s", (cep,))
+    return cursor.fetchone()
+
+def _gravar(cursor, cep, endereco, origem):
+    cursor.execute("""
+        INSERT INTO Ceps (cep, logradouro, bairro, cidade, uf, origem) VALUES (%s, %s, %s, %s, %s, %s)
+        ON DUPLICATE KEY UPDATE logradouro = VALUES(logradouro), bairro = VALUES(bairro),
+                                cidade = VALUES(cidade), uf = VALUES(uf), origem = VALUES(origem)
+    """, (cep, *(endereco.get(c) for c in CAMPOS), origem))
+
+def consultar(cep, obter_conexao):
+    """
+    Retorna o dict do endereço ou as constantes NAO_ENCONTRADO / INDISPONIVEL.
+    obter_conexao só é chamada se o CEP não estiver no cache em memória; a
+    conexão é devolvida antes da consulta externa (até CEP_CONFIG['timeout']
+    segundos) e outra é pedida só para gravar o que ela encontrou.
+    """
+    valor, achou = _cache.obter(cep)
+    if achou:
+        return valor
+
+    conn = obter_conexao()
+    try:
+        linha = _ler_tabela(conn.cursor(), cep)
+    finally:
+        conn.close()
+    if linha:
+        resultado = dict(linha)
+        _cache.gravar(cep, resultado, CEP_CONFIG['ttl_encontrado'], ())
+        return resultado
+
+    if _buscador is None:
+        _cache.gravar(cep, NAO_ENCONTRADO, CEP_CONFIG['ttl_nao_encontrado'], ())
+        return NAO_ENCONTRADO
+
+    try:
+        endereco = _buscador.buscar(cep)
+    except BuscadorIndisponivel as e:
+        print(f"❌ Consulta externa de CEP indisponível: {e}")
+        _cache.gravar(cep, INDISPONIVEL, CEP_CONFIG['ttl_indisponivel'], ())
+        return INDISPONIVEL
+
+    if endereco is None:
+        _cache.gravar(cep, NAO_ENCONTRADO, CEP_CONFIG['ttl_nao_encontrado'], ())
+        return NAO_ENCONTRADO
+
+    conn = obter_conexao()
+    try:
+        _gravar(conn.cursor(), cep, endereco, 'externo')
+        conn.commit()
+    finally:
+        conn.close()
+    resultado = {'cep': cep, **{c: endereco.get(c) for c in CAMPOS}, 'origem': 'externo'}
+    _cache.gravar(cep, resultado, CEP_CONFIG['ttl_encontrado'], ())
+    return resultado
+
+# ==============================================================================
+# CARGA DA TABELA
+# ==============================================================================
+
+def criar_tabela(cursor):
+    cursor.execute(SQL_TABELA)
+
+_NUMERO_NO_FIM = re.compile(r'[\s,]+(n[º°o.]*\s*)?\d+\w*\s*$', re.IGNORECASE)
+
+def semear_de_pacientes(cursor):
+    """
+    Preenche Ceps com o endereço mais frequente de cada CEP já cadastrado em
+    Pacientes (sem o número da casa). Não sobrescreve CEPs já existentes.
+    """
+    cursor.execute("""
+        SELECT cep_digitos, endereco, bairro, COUNT(*) AS n FROM Pacientes
+        WHERE cep_digitos IS NOT NULL AND LENGTH(cep_digitos) = 8 AND endereco IS NOT NULL AND endereco <> ''
+        GROUP BY cep_digitos, endereco, bairro
+    """)
+    contagem = {}
+    for r in cursor.fetchall():
+        r = r if isinstance(r, dict) else dict(zip(('cep_digitos', 'endereco', 'bairro', 'n'), r))
+        logradouro = _NUMERO_NO_FIM.sub('', r['endereco']).strip()
+        contagem.setdefault(r['cep_digitos'], Counter())[(logradouro, r['bairro'])] += r['n']
+
+    linhas = [(cep, *c.most_common(1)[0][0]) for cep, c in contagem.items()]
+    for i in range(0, len(linhas), 1000):
+        cursor.executemany("""
+            INSERT INTO Ceps (cep, logradouro, bairro, origem) VALUES (%s, %s, %s, 'pacientes')
+            ON DUPLICATE KEY UPDATE cep = cep
+        """, linhas[i:i + 1000])
+    return len(linhas)
+
+def importar_arquivo(conn, caminho):
+    """Importa um CSV de CEPs (sobrescreve os existentes). Retorna o total importado."""
+    total = 0
+    cursor = conn.cursor()
+    try:
+        with open(caminho, newline='', encoding='utf-8-sig') as arquivo:
+            amostra = arquivo.read(4096)
+            arquivo.seek(0)
+            dialeto = csv.Sniffer().sniff(amostra, delimiters=',;\t')
+            leitor = csv.DictReader(arquivo, dialect=dialeto)
+            lote = []
+            for linha in leitor:
+                linha = {(k or '').strip().lower(): (v or '').strip() for k, v in linha.items()}
+                cep = normalizar(linha.get('cep'))
+                if not cep:
+                    continue
+                lote.append((cep, linha.get('logradouro') or None, linha.get('bairro') or None,
+                             linha.get('cidade') or linha.get('localidade') or None, (linha.get('uf') or '')[:2] or None))
+                if len(lote) == 1000:
+                    total += _gravar_lote(cursor, lote)
+                    lote = []
+            total += _gravar_lote(cursor, lote)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+    _cache.limpar()
+    return total
+
+def _gravar_lote(cursor, lote):
+    if lote:
+        cursor.executemany("""
+            INSERT INTO Ceps (cep, logradouro, bairro, cidade, uf, origem) VALUES (%s, %s, %s, %s, %s, 'arquivo')
+            ON DUPLICATE KEY UPDATE logradouro = VALUES(logradouro), bairro = VALUES(bairro),
+                                    cidade = VALUES(cidade), uf = VALUES(uf), origem = 'arquivo'
+        """, lote)
+    return len(lote)
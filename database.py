@@ -1,6 +1,13 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
 import pymysql
 from werkzeug.security import generate_password_hash
 
+import migracoes
+
 # --- CONFIGURAÇÕES DE CONEXÃO ---
 # ATENÇÃO: Verifique se a senha 'root' é a correta para o seu ambiente MySQL.
 DB_CONFIG = {
@@ -10,6 +17,42 @@ DB_CONFIG = {
     "database": "prontuario_hospitalar"
 }
 
+# --- CONFIGURAÇÕES DO POOL DE CONEXÕES ---
+# tamanho_maximo: limite de conexões abertas (manter abaixo do max_connections do MySQL)
+# timeout_espera: segundos que uma requisição aguarda por uma conexão livre
+# vida_maxima: segundos até uma conexão ser descartada e recriada
+# ping_apos_ocioso: conexões ociosas há mais tempo que isso são testadas com ping
+POOL_CONFIG = {
+    "tamanho_maximo": 10,
+    "timeout_espera": 5.0,
+    "vida_maxima": 1800,
+    "ping_apos_ocioso": 5.0
+}
+
+# --- RÉPLICAS DE LEITURA ---
+# Cada item sobrepõe DB_CONFIG (normalmente só host/port), ex.:
+#   REPLICAS_CONFIG = [{"host": "127.0.0.1", "port": 3307}]
+# Lista vazia = tudo vai para o primário (comportamento original).
+#
+# Para testar localmente com duas instâncias: suba um segundo MySQL na porta
+# 3307 com server-id diferente, read_only=ON e GTID ligado nos dois, e rode
+# nele CHANGE REPLICATION SOURCE TO SOURCE_HOST='127.0.0.1', SOURCE_PORT=3306,
+# SOURCE_AUTO_POSITION=1 ...; START REPLICA. O comando `flask verificar-replicas`
+# mostra o atraso que o roteador está enxergando.
+#
+# atraso_maximo: segundos de atraso (Seconds_Behind_Source) tolerados numa réplica
+# intervalo_verificacao: de quanto em quanto tempo o atraso é consultado de novo
+# janela_pos_escrita: depois de gravar, o usuário lê do primário por esse tempo
+# (Resultados que o cache guardou a partir de uma réplica podem estar até
+# atraso_maximo atrás da última escrita dos outros usuários.)
+REPLICAS_CONFIG = []
+
+REPLICACAO_CONFIG = {
+    "atraso_maximo": 2.0,
+    "intervalo_verificacao": 2.0,
+    "janela_pos_escrita": 10.0
+}
+
 def create_db_connection(cursor_factory=None):
     """
     Tenta estabelecer e retornar uma conexão com o banco de dados.
@@ -33,6 +76,387 @@ def create_db_connection(cursor_factory=None):
         print(f"❌ Erro inesperado ao conectar: {e}")
         return None
 
+
+class PoolEsgotadoError(Exception):
+    """Nenhuma conexão ficou livre dentro do tempo de espera do pool."""
+
+
+class ConexaoDoPool:
+    """
+    Envolve uma conexão do pool. Repassa tudo para a conexão real,
+    mas close() devolve a conexão ao pool em vez de fechá-la.
+    """
+
+    def __init__(self, pool, conn, cursor_factory=None, ao_confirmar=None):
+        self._pool = pool
+        self._conn = conn
+        self._cursor_factory = cursor_factory
+        self._ao_confirmar = ao_confirmar
+
+    def cursor(self, cursor=None):
+        if self._conn is None:
+            raise pymysql.err.InterfaceError("Conexão já devolvida ao pool.")
+        return self._conn.cursor(cursor or self._cursor_factory)
+
+    def commit(self):
+        if self._conn is None:
+            raise pymysql.err.InterfaceError("Conexão já devolvida ao pool.")
+        self._conn.commit()
+        if self._ao_confirmar is not None:
+            self._ao_confirmar()
+
+    def close(self):
+        # Pode ser chamado mais de uma vez (rota + teardown) sem efeito colateral
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.devolver(conn)
+
+    @property
+    def devolvida(self):
+        return self._conn is None
+
+    def __getattr__(self, nome):
+        if self._conn is None:
+            raise pymysql.err.InterfaceError("Conexão já devolvida ao pool.")
+        return getattr(self._conn, nome)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class ConnectionPool:
+    """
+    Pool de conexões thread-safe e limitado.
+    - Reaproveita conexões ociosas (LIFO, a mais recente primeiro)
+    - Faz ping nas conexões ociosas há algum tempo antes de entregá-las
+    - Descarta conexões que passaram da vida máxima
+    - Quando cheio, a requisição espera até timeout_espera segundos
+    """
+
+    def __init__(self, config=None, tamanho_maximo=10, timeout_espera=5.0, vida_maxima=1800, ping_apos_ocioso=5.0):
+        self._config = config if config is not None else DB_CONFIG
+        self.tamanho_maximo = tamanho_maximo
+        self.timeout_espera = timeout_espera
+        self.vida_maxima = vida_maxima
+        self.ping_apos_ocioso = ping_apos_ocioso
+
+        self._cond = threading.Condition()
+        self._ociosas = deque()   # itens: (conn, devolvida_em)
+        self._criada_em = {}      # id(conn) -> timestamp de criação
+        self._abertas = 0
+
+        self._stats = {
+            'criadas': 0, 'descartadas': 0, 'emprestimos': 0,
+            'esperas': 0, 'tempo_espera_total': 0.0, 'timeouts': 0
+        }
+
+    def _conectar(self):
+        conn = pymysql.connect(**self._config)
+        with self._cond:
+            self._criada_em[id(conn)] = time.monotonic()
+            self._stats['criadas'] += 1
+        return conn
+
+    def _descartar(self, conn):
+        # Só a contabilidade (chamado com o lock); o close() vai em _fechar, fora dele
+        self._criada_em.pop(id(conn), None)
+        self._stats['descartadas'] += 1
+
+    @staticmethod
+    def _fechar(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _expirada(self, conn, agora):
+        return agora - self._criada_em.get(id(conn), agora) > self.vida_maxima
+
+    def obter(self, cursor_factory=None, ao_confirmar=None):
+        """
+        Empresta uma conexão. Lança PoolEsgotadoError se o tempo de espera acabar.
+        ao_confirmar (opcional) é chamado depois de cada commit() da conexão.
+        """
+        inicio = time.monotonic()
+        esperou = False
+
+        while True:
+            candidata, fechar = None, []
+            try:
+                with self._cond:
+                    while True:
+                        agora = time.monotonic()
+                        while self._ociosas:
+                            conn, devolvida_em = self._ociosas.pop()
+                            if self._expirada(conn, agora):
+                                self._abertas -= 1
+                                self._descartar(conn)
+                                fechar.append(conn)
+                                continue
+                            candidata = (conn, agora - devolvida_em > self.ping_apos_ocioso)
+                            break
+                        if candidata is not None:
+                            break
+
+                        if self._abertas < self.tamanho_maximo:
+                            # Reserva a vaga antes de conectar para não estourar o limite
+                            self._abertas += 1
+                            break
+
+                        restante = self.timeout_espera - (agora - inicio)
+                        if restante <= 0:
+                            self._stats['timeouts'] += 1
+                            raise PoolEsgotadoError(
+                                f"Nenhuma conexão livre após {self.timeout_espera}s "
+                                f"({self._abertas} em uso de {self.tamanho_maximo})."
+                            )
+                        if not esperou:
+                            esperou = True
+                            self._stats['esperas'] += 1
+                        self._cond.wait(restante)
+            finally:
+                for conn in fechar:
+                    self._fechar(conn)
+
+            if candidata is None:
+                break
+            # Ping fora do lock: um servidor lento não pode travar o pool inteiro
+            conn, pingar = candidata
+            if pingar:
+                try:
+                    conn.ping(reconnect=False)
+                except Exception:
+                    with self._cond:
+                        self._abertas -= 1
+                        self._descartar(conn)
+                        self._cond.notify()
+                    self._fechar(conn)
+                    continue
+            with self._cond:
+                return self._emprestar(conn, cursor_factory, inicio, esperou, ao_confirmar)
+
+        # Conexão nova é aberta fora do lock (handshake é lento)
+        try:
+            conn = self._conectar()
+        except Exception:
+            with self._cond:
+                self._abertas -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            return self._emprestar(conn, cursor_factory, inicio, esperou, ao_confirmar)
+
+    def _emprestar(self, conn, cursor_factory, inicio, esperou, ao_confirmar=None):
+        self._stats['emprestimos'] += 1
+        if esperou:
+            self._stats['tempo_espera_total'] += time.monotonic() - inicio
+        return ConexaoDoPool(self, conn, cursor_factory, ao_confirmar)
+
+    def devolver(self, conn):
+        """Recebe a conexão de volta, desfazendo qualquer transação pendente."""
+        try:
+            conn.rollback()
+            saudavel = conn.open
+        except Exception:
+            saudavel = False
+
+        with self._cond:
+            if saudavel and not self._expirada(conn, time.monotonic()):
+                self._ociosas.append((conn, time.monotonic()))
+            else:
+                self._abertas -= 1
+                self._descartar(conn)
+                saudavel = False
+            self._cond.notify()
+        if not saudavel:
+            self._fechar(conn)
+
+    @contextmanager
+    def conexao(self, cursor_factory=None):
+        """Uso: with pool.conexao() as conn: ..."""
+        conn = self.obter(cursor_factory)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def fechar_todas(self):
+        fechar = []
+        with self._cond:
+            while self._ociosas:
+                conn, _ = self._ociosas.pop()
+                self._abertas -= 1
+                self._descartar(conn)
+                fechar.append(conn)
+            self._cond.notify_all()
+        for conn in fechar:
+            self._fechar(conn)
+
+    def estatisticas(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['abertas'] = self._abertas
+            stats['ociosas'] = len(self._ociosas)
+            stats['em_uso'] = self._abertas - len(self._ociosas)
+            stats['tamanho_maximo'] = self.tamanho_maximo
+            stats['tempo_espera_total'] = round(stats['tempo_espera_total'], 4)
+            return stats
+
+
+# Pool global da aplicação (criado sob demanda)
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DB_CONFIG, **POOL_CONFIG)
+    return _pool
+
+def obter_conexao_pool(cursor_factory=None, ao_confirmar=None):
+    """
+    Versão com pool de create_db_connection(). Mesmo contrato: retorna None
+    (e imprime o erro) se não for possível obter uma conexão.
+    """
+    try:
+        return get_pool().obter(cursor_factory, ao_confirmar)
+    except PoolEsgotadoError as err:
+        print(f"❌ Pool de conexões esgotado: {err}")
+        return None
+    except pymysql.err.MySQLError as err:
+        print(f"❌ Erro ao conectar ao MySQL: {err}")
+        return None
+    except Exception as e:
+        print(f"❌ Erro inesperado ao conectar: {e}")
+        return None
+
+class Replica:
+    """Uma réplica de leitura: pool próprio e o último atraso medido."""
+
+    def __init__(self, config):
+        self.config = {**DB_CONFIG, **config}
+        # Transação só de leitura: protege contra escrita acidental e poupa o InnoDB
+        self.config.setdefault('init_command', 'SET SESSION TRANSACTION READ ONLY')
+        self.nome = f"{self.config['host']}:{self.config.get('port', 3306)}"
+        self.pool = ConnectionPool(self.config, **POOL_CONFIG)
+        self.atraso = None          # segundos; None = desconhecido/replicação parada
+        self.verificada_em = 0.0
+        self.erro = None
+        self._lock = threading.Lock()
+
+    def _medir_atraso(self):
+        with self.pool.conexao(pymysql.cursors.DictCursor) as conn:
+            cursor = conn.cursor()
+            try:
+                cursor.execute("SHOW REPLICA STATUS")
+            except pymysql.err.MySQLError:
+                # MySQL < 8.0.22 / MariaDB < 10.5.1
+                cursor.execute("SHOW SLAVE STATUS")
+            status = cursor.fetchone()
+        if not status:
+            raise RuntimeError("servidor não está replicando")
+        atraso = status.get('Seconds_Behind_Source', status.get('Seconds_Behind_Master'))
+        if atraso is None:
+            raise RuntimeError("replicação parada")
+        return float(atraso)
+
+    def disponivel(self, atraso_maximo, intervalo):
+        """Verifica o atraso (no máximo uma vez por intervalo) e diz se a réplica serve."""
+        agora = time.monotonic()
+        # Só uma thread mede; as outras usam o último valor conhecido
+        if agora - self.verificada_em > intervalo and self._lock.acquire(blocking=False):
+            try:
+                self.atraso, self.erro = self._medir_atraso(), None
+            except Exception as err:
+                if self.erro is None:
+                    print(f"❌ Réplica {self.nome} fora de uso: {err}")
+                self.atraso, self.erro = None, str(err)
+            finally:
+                self.verificada_em = time.monotonic()
+                self._lock.release()
+        return self.atraso is not None and self.atraso <= atraso_maximo
+
+
+class RoteadorLeitura:
+    """
+    Distribui leituras entre as réplicas saudáveis (rodízio). Quando nenhuma
+    serve (atrasada, parada, pool esgotado), obter() retorna None e quem
+    chamou usa o primário.
+    """
+
+    def __init__(self, replicas_config, atraso_maximo=2.0, intervalo_verificacao=2.0):
+        self.replicas = [Replica(config) for config in replicas_config]
+        self.atraso_maximo = atraso_maximo
+        self.intervalo_verificacao = intervalo_verificacao
+        self._proxima = 0
+        self._lock = threading.Lock()
+        self._stats = {'leituras_replica': 0, 'desvios_primario': 0}
+
+    def obter(self, cursor_factory=None):
+        with self._lock:
+            inicio = self._proxima
+            self._proxima = (self._proxima + 1) % max(len(self.replicas), 1)
+        for i in range(len(self.replicas)):
+            replica = self.replicas[(inicio + i) % len(self.replicas)]
+            if not replica.disponivel(self.atraso_maximo, self.intervalo_verificacao):
+                continue
+            try:
+                conn = replica.pool.obter(cursor_factory)
+            except Exception as err:
+                print(f"❌ Réplica {replica.nome} indisponível: {err}")
+                continue
+            with self._lock:
+                self._stats['leituras_replica'] += 1
+            return conn
+        with self._lock:
+            self._stats['desvios_primario'] += 1
+        return None
+
+    def estatisticas(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['replicas'] = [{
+            'nome': r.nome, 'atraso': r.atraso, 'erro': r.erro,
+            'disponivel': r.atraso is not None and r.atraso <= self.atraso_maximo,
+            'pool': r.pool.estatisticas()
+        } for r in self.replicas]
+        return stats
+
+
+_roteador = None
+
+def get_roteador():
+    global _roteador
+    if _roteador is None:
+        with _pool_lock:
+            if _roteador is None:
+                _roteador = RoteadorLeitura(REPLICAS_CONFIG, REPLICACAO_CONFIG['atraso_maximo'],
+                                            REPLICACAO_CONFIG['intervalo_verificacao'])
+    return _roteador
+
+def obter_conexao_leitura(cursor_factory=None):
+    """
+    Conexão para consultas que toleram alguns segundos de atraso: uma réplica
+    saudável se houver, senão o primário (mesmo contrato de obter_conexao_pool).
+    """
+    if REPLICAS_CONFIG:
+        conn = get_roteador().obter(cursor_factory)
+        if conn is not None:
+            return conn
+    return obter_conexao_pool(cursor_factory)
+
+@contextmanager
+def conexao_db(cursor_factory=None):
+    """Context manager que empresta uma conexão do pool e a devolve ao sair."""
+    with get_pool().conexao(cursor_factory) as conn:
+        yield conn
+
 def setup_database():
     """Cria o banco de dados (se não existir) e todas as tabelas iniciais."""
     
@@ -62,91 +486,11 @@ def setup_database():
 
     cursor = conn.cursor()
     
-    print("\nIniciando criação das tabelas...")
-    
-    # --- CRIAÇÃO DE TABELAS ---
-
-    # Tabela de Usuários (LIMPA - INALTERADO)
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS Usuarios (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        nome_completo VARCHAR(100), 
-        usuario VARCHAR(50) NOT NULL UNIQUE,
-        senha VARCHAR(255) NOT NULL,
-        data_nascimento DATE, 
-        nacionalidade VARCHAR(50), 
-        nivel_acesso ENUM('admin', 'tecnico', 'enfermeiro') NOT NULL
-    )
-    """)
-    print("  - Tabela 'Usuarios' criada/verificada.")
-    
-    # Tabela de Pacientes/Prontuário (CORRIGIDO: Incluindo CPF)
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS Pacientes (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        nome VARCHAR(100) NOT NULL,
-        data_nascimento DATE,
-        cpf VARCHAR(11) UNIQUE,  -- NOVO CAMPO: CPF (11 dígitos, único)
-        cep VARCHAR(10),
-        endereco VARCHAR(255),
-        bairro VARCHAR(100),
-        data_entrada DATETIME NOT NULL,
-        nome_baixa VARCHAR(100),
-        data_baixa DATETIME, 
-        procedimento TEXT,
-        status ENUM('internado', 'alta') DEFAULT 'internado',
-        usuario_internacao VARCHAR(50), 
-        
-        -- NOVOS CAMPOS DE CLASSIFICAÇÃO
-        cid_10 VARCHAR(10), 
-        observacoes_entrada TEXT,
-        prioridade_atencao ENUM('verde', 'amarelo', 'vermelho') DEFAULT 'verde' 
-    )
-    """)
-    print("  - Tabela 'Pacientes' criada/verificada.")
-
-    # Tabela de Provas de Vida (Dados Vitais) (LIMPA - INALTERADO)
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS ProvasDeVida (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        paciente_id INT NOT NULL,
-        data_hora DATETIME NOT NULL,
-        pressao_arterial VARCHAR(20),
-        glicose DECIMAL(6, 2),
-        saturacao DECIMAL(4, 2),
-        batimentos_cardiacos INT,
-        quem_efetuou VARCHAR(100),
-        observacoes TEXT,
-        FOREIGN KEY (paciente_id) REFERENCES Pacientes(id)
-    )
-    """)
-    print("  - Tabela 'ProvasDeVida' criada/verificada.")
-
-    # Tabela de Estoque (LIMPA - INALTERADO)
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS Estoque (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        nome_medicamento VARCHAR(100) NOT NULL UNIQUE,
-        quantidade INT NOT NULL,
-        unidade VARCHAR(10),
-        data_ultima_entrada DATETIME
-    )
-    """)
-    print("  - Tabela 'Estoque' criada/verificada.")
-    
-    # Tabela de Registro de Administração de Medicamentos (LIMPA - INALTERADO)
-    cursor.execute("""
-    CREATE TABLE IF NOT EXISTS AdministracaoMedicamentos (
-        id INT AUTO_INCREMENT PRIMARY KEY,
-        paciente_id INT NOT NULL,
-        medicamento_nome VARCHAR(100) NOT NULL,
-        quantidade_administrada DECIMAL(6, 2) NOT NULL,
-        se_necessario BOOLEAN,
-        data_hora DATETIME NOT NULL,
-        FOREIGN KEY (paciente_id) REFERENCES Pacientes(id)
-    )
-    """)
-    print("  - Tabela 'AdministracaoMedicamentos' criada/verificada.")
+    print("\nVerificando migrações do schema...")
+
+    # --- CRIAÇÃO/ATUALIZAÇÃO DAS TABELAS (ver migracoes.py) ---
+    aplicadas = migracoes.migrar(conn)
+    print(f"  - Schema na versão {migracoes.VERSAO_ATUAL}" + (f" (migrações aplicadas: {aplicadas})." if aplicadas else " (nada a fazer)."))
     
     # 3. Insere o Administrador Inicial (LIMPO - INALTERADO)
     ADMIN_USER = 'admin'
@@ -0,0 +1,322 @@
+"""
+Estatísticas pré-agregadas do dashboard.
+
+Em vez de varrer Pacientes, provasdevida e EstoqueBaixas a cada visita ao
+dashboard, as rotas de escrita mantêm pequenas tabelas de resumo atualizadas
+(sempre dentro da mesma transação da escrita original):
+
+- EstatisticasDiarias: entradas e altas por dia e prioridade
+- EstatisticasProvasVida: provas de vida por hora
+- EstatisticasMedicamentos: saída de medicamentos por dia
+- EstatisticasInternados: pacientes internados agora, por prioridade
+- EstatisticasPermanencia: somatórios por usuário para a média de permanência
+
+As janelas de tempo passam a ter granularidade de dia (altas, remédios) ou de
+hora (provas de vida). Se as tabelas saírem de sincronia, rode:
+
+    flask --app app reconstruir-estatisticas
+"""
+from datetime import datetime
+
+import pymysql.cursors
+
+PRIORIDADES = ('verde', 'amarelo', 'vermelho')
+
+SQL_TABELAS = [
+    """
+    CREATE TABLE IF NOT EXISTS EstatisticasDiarias (
+        dia DATE NOT NULL,
+        prioridade ENUM('verde', 'amarelo', 'vermelho') NOT NULL,
+        entradas INT NOT NULL DEFAULT 0,
+        altas INT NOT NULL DEFAULT 0,
+        PRIMARY KEY (dia, prioridade)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS EstatisticasProvasVida (
+        hora DATETIME NOT NULL PRIMARY KEY,
+        total INT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS EstatisticasMedicamentos (
+        dia DATE NOT NULL,
+        nome_medicamento VARCHAR(100) NOT NULL,
+        total DECIMAL(12, 2) NOT NULL DEFAULT 0,
+        PRIMARY KEY (dia, nome_medicamento)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS EstatisticasInternados (
+        prioridade ENUM('verde', 'amarelo', 'vermelho') NOT NULL PRIMARY KEY,
+        total INT NOT NULL DEFAULT 0
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS EstatisticasPermanencia (
+        usuario VARCHAR(100) NOT NULL PRIMARY KEY,
+        internados INT NOT NULL DEFAULT 0,
+        soma_to_days_entrada BIGINT NOT NULL DEFAULT 0,
+        altas INT NOT NULL DEFAULT 0,
+        soma_dias_altas BIGINT NOT NULL DEFAULT 0
+    )
+    """,
+]
+
+def _prioridade(valor):
+    p = (valor or 'verde').lower()
+    return p if p in PRIORIDADES else 'verde'
+
+def _usuario(valor):
+    return valor or 'Sistema'
+
+def criar_tabelas(cursor):
+    for sql in SQL_TABELAS:
+        cursor.execute(sql)
+
+# ==============================================================================
+# ATUALIZAÇÃO INCREMENTAL (chamada pelas rotas de escrita, sem commit próprio)
+# ==============================================================================
+
+def registrar_entrada(cursor, data_entrada, prioridade, usuario, sinal=1):
+    """Nova internação. sinal=-1 desfaz (usado ao excluir um paciente)."""
+    prioridade = _prioridade(prioridade)
+    cursor.execute("""
+        INSERT INTO EstatisticasDiarias (dia, prioridade, entradas) VALUES (DATE(%s), %s, %s)
+        ON DUPLICATE KEY UPDATE entradas = entradas + VALUES(entradas)
+    """, (data_entrada, prioridade, sinal))
+    cursor.execute("""
+        INSERT INTO EstatisticasInternados (prioridade, total) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+    """, (prioridade, sinal))
+    cursor.execute("""
+        INSERT INTO EstatisticasPermanencia (usuario, internados, soma_to_days_entrada)
+        VALUES (%s, %s, %s * TO_DAYS(%s))
+        ON DUPLICATE KEY UPDATE internados = internados + VALUES(internados),
+                                soma_to_days_entrada = soma_to_days_entrada + VALUES(soma_to_days_entrada)
+    """, (_usuario(usuario), sinal, sinal, data_entrada))
+
+def registrar_alta(cursor, paciente, data_baixa, sinal=1):
+    """
+    Alta de um paciente. 'paciente' precisa de data_entrada, prioridade_atencao
+    e usuario_internacao (o dict de SELECT * FROM Pacientes serve).
+    """
+    prioridade = _prioridade(paciente['prioridade_atencao'])
+    usuario = _usuario(paciente['usuario_internacao'])
+    cursor.execute("""
+        INSERT INTO EstatisticasDiarias (dia, prioridade, altas) VALUES (DATE(%s), %s, %s)
+        ON DUPLICATE KEY UPDATE altas = altas + VALUES(altas)
+    """, (data_baixa, prioridade, sinal))
+    cursor.execute("""
+        INSERT INTO EstatisticasInternados (prioridade, total) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+    """, (prioridade, -sinal))
+    cursor.execute("""
+        INSERT INTO EstatisticasPermanencia (usuario, internados, soma_to_days_entrada, altas, soma_dias_altas)
+        VALUES (%s, %s, %s * TO_DAYS(%s), %s, %s * DATEDIFF(%s, %s))
+        ON DUPLICATE KEY UPDATE internados = internados + VALUES(internados),
+                                soma_to_days_entrada = soma_to_days_entrada + VALUES(soma_to_days_entrada),
+                                altas = altas + VALUES(altas),
+                                soma_dias_altas = soma_dias_altas + VALUES(soma_dias_altas)
+    """, (usuario, -sinal, -sinal, paciente['data_entrada'], sinal, sinal, data_baixa, paciente['data_entrada']))
+
+def remover_paciente(cursor, paciente):
+    """Desfaz a contribuição de um paciente excluído (entrada e, se houver, alta)."""
+    if paciente['status'] == 'alta' and paciente['data_baixa']:
+        registrar_alta(cursor, paciente, paciente['data_baixa'], sinal=-1)
+    registrar_entrada(cursor, paciente['data_entrada'], paciente['prioridade_atencao'],
+                      paciente['usuario_internacao'], sinal=-1)
+
+def registrar_prova_vida(cursor, data_hora=None, sinal=1):
+    data_hora = data_hora or datetime.now()
+    cursor.execute("""
+        INSERT INTO EstatisticasProvasVida (hora, total)
+        VALUES (DATE_FORMAT(%s, '%%Y-%%m-%%d %%H:00:00'), %s)
+        ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+    """, (data_hora, sinal))
+
+def registrar_provas_vida(cursor, datas, sinal=1):
+    """Várias provas de vida de uma vez (ingestão em lote; sinal=-1 no expurgo)."""
+    por_hora = {}
+    for d in datas:
+        hora = d.replace(minute=0, second=0, microsecond=0)
+        por_hora[hora] = por_hora.get(hora, 0) + sinal
+    if por_hora:
+        cursor.executemany("""
+            INSERT INTO EstatisticasProvasVida (hora, total) VALUES (%s, %s)
+            ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+        """, sorted(por_hora.items()))
+
+def registrar_saida_medicamento(cursor, nome_medicamento, quantidade, data_hora=None):
+    registrar_saidas_medicamentos(cursor, [(nome_medicamento, quantidade)], data_hora)
+
+def registrar_saidas_medicamentos(cursor, itens, data_hora=None):
+    """Várias saídas de uma vez: itens = [(nome_medicamento, quantidade), ...]."""
+    if not itens:
+        return
+    dia = (data_hora or datetime.now()).date()
+    # executemany vira um único INSERT multi-linha no pymysql
+    cursor.executemany("""
+        INSERT INTO EstatisticasMedicamentos (dia, nome_medicamento, total) VALUES (%s, %s, %s)
+        ON DUPLICATE KEY UPDATE total = total + VALUES(total)
+    """, [(dia, nome, qtd) for nome, qtd in itens])
+
+# ==============================================================================
+# RECONSTRUÇÃO COMPLETA
+# ==============================================================================
+
+def reconstruir_tabelas(cursor):
+    """Recalcula todas as tabelas de resumo a partir das tabelas de origem (sem commit)."""
+    import arquivamento  # importa este módulo; aqui dentro para não virar ciclo
+
+    criar_tabelas(cursor)
+    # Pacientes e provas de vida arquivados continuam contando no histórico
+    pacientes = arquivamento.com_arquivo(cursor, 'Pacientes', 'p')
+    provas_vida = arquivamento.com_arquivo(cursor, 'ProvasDeVida', 'pv', 'data_hora')
+    for tabela in ('EstatisticasDiarias', 'EstatisticasProvasVida', 'EstatisticasMedicamentos',
+                   'EstatisticasInternados', 'EstatisticasPermanencia'):
+        cursor.execute(f"DELETE FROM {tabela}")
+
+    cursor.execute(f"""
+        INSERT INTO EstatisticasDiarias (dia, prioridade, entradas)
+        SELECT DATE(data_entrada), IFNULL(prioridade_atencao, 'verde'), COUNT(*)
+        FROM {pacientes} GROUP BY DATE(data_entrada), IFNULL(prioridade_atencao, 'verde')
+    """)
+    cursor.execute(f"""
+        INSERT INTO EstatisticasDiarias (dia, prioridade, altas)
+        SELECT * FROM (
+            SELECT DATE(data_baixa) AS dia, IFNULL(prioridade_atencao, 'verde') AS prioridade, COUNT(*) AS altas
+            FROM {pacientes} WHERE status = 'alta' AND data_baixa IS NOT NULL
+            GROUP BY DATE(data_baixa), IFNULL(prioridade_atencao, 'verde')
+        ) AS a
+        ON DUPLICATE KEY UPDATE altas = a.altas
+    """)
+    cursor.execute(f"""
+        INSERT INTO EstatisticasProvasVida (hora, total)
+        SELECT DATE_FORMAT(data_hora, '%Y-%m-%d %H:00:00'), COUNT(*)
+        FROM {provas_vida} GROUP BY DATE_FORMAT(data_hora, '%Y-%m-%d %H:00:00')
+    """)
+    cursor.execute("""
+        INSERT INTO EstatisticasMedicamentos (dia, nome_medicamento, total)
+        SELECT DATE(data_hora), nome_medicamento, SUM(quantidade_removida)
+        FROM EstoqueBaixas GROUP BY DATE(data_hora), nome_medicamento
+    """)
+    cursor.execute("""
+        INSERT INTO EstatisticasInternados (prioridade, total)
+        SELECT IFNULL(prioridade_atencao, 'verde'), COUNT(*)
+        FROM Pacientes WHERE status = 'internado' GROUP BY IFNULL(prioridade_atencao, 'verde')
+    """)
+    cursor.execute(f"""
+        INSERT INTO EstatisticasPermanencia (usuario, internados, soma_to_days_entrada, altas, soma_dias_altas)
+        SELECT IFNULL(usuario_internacao, 'Sistema'),
+               SUM(status = 'internado'),
+               SUM(IF(status = 'internado', TO_DAYS(data_entrada), 0)),
+               SUM(status = 'alta'),
+               SUM(IF(status = 'alta', DATEDIFF(IFNULL(data_baixa, NOW()), data_entrada), 0))
+        FROM {pacientes} GROUP BY IFNULL(usuario_internacao, 'Sistema')
+    """)
+
+def reconstruir(conn):
+    cursor = conn.cursor()
+    try:
+        reconstruir_tabelas(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# ==============================================================================
+# LEITURA (dashboard e APIs de KPI)
+# ==============================================================================
+
+MESES = ["Jan", "Fev", "Mar", "Abr", "Mai", "Jun", "Jul", "Ago", "Set", "Out", "Nov", "Dez"]
+
+def contar_internados(cursor):
+    cursor.execute("SELECT IFNULL(SUM(total), 0) AS total FROM EstatisticasInternados")
+    return int(cursor.fetchone()['total'])
+
+def contar_altas(cursor, dias):
+    cursor.execute("""
+        SELECT IFNULL(SUM(altas), 0) AS total FROM EstatisticasDiarias
+        WHERE dia >= CURDATE() - INTERVAL %s DAY
+    """, (dias,))
+    return int(cursor.fetchone()['total'])
+
+def contar_provas_vida(cursor, horas):
+    cursor.execute("""
+        SELECT IFNULL(SUM(total), 0) AS total FROM EstatisticasProvasVida
+        WHERE hora >= DATE_FORMAT(NOW() - INTERVAL %s HOUR, '%%Y-%%m-%%d %%H:00:00')
+    """, (horas,))
+    return int(cursor.fetchone()['total'])
+
+def saida_medicamentos(cursor, dias=None, limite=8):
+    """Ranking de saída de medicamentos; dias=None considera todo o histórico."""
+    if dias is None:
+        cursor.execute("""
+            SELECT nome_medicamento, SUM(total) AS total FROM EstatisticasMedicamentos
+            GROUP BY nome_medicamento ORDER BY total DESC LIMIT %s
+        """, (limite,))
+    else:
+        cursor.execute("""
+            SELECT nome_medicamento, SUM(total) AS total FROM EstatisticasMedicamentos
+            WHERE dia >= CURDATE() - INTERVAL %s DAY
+            GROUP BY nome_medicamento ORDER BY total DESC LIMIT %s
+        """, (dias, limite))
+    return cursor.fetchall()
+
+def carregar_dashboard(cursor, dados, ano=None):
+    """Preenche o dicionário 'dados' do dashboard a partir das tabelas de resumo."""
+    ano = ano or datetime.now().year
+
+    cursor.execute("SELECT prioridade, total FROM EstatisticasInternados")
+    for r in cursor.fetchall():
+        dados['prioridade_data']['data'][PRIORIDADES.index(r['prioridade'])] = r['total']
+    dados['total_internados'] = sum(dados['prioridade_data']['data'])
+
+    dados['altas_ultimos_7_dias'] = contar_altas(cursor, 7)
+    dados['provas_vida_ultimas_24h'] = contar_provas_vida(cursor, 24)
+
+    cursor.execute("""
+        SELECT YEAR(dia) AS ano, SUM(entradas) AS entradas, SUM(altas) AS altas
+        FROM EstatisticasDiarias GROUP BY ano ORDER BY ano ASC LIMIT 5
+    """)
+    for r in cursor.fetchall():
+        dados['movimentacao_anual']['labels'].append(str(r['ano']))
+        dados['movimentacao_anual']['entradas'].append(int(r['entradas']))
+        dados['movimentacao_anual']['altas'].append(int(r['altas']))
+
+    cursor.execute("""
+        SELECT MONTH(dia) AS mes, prioridade, SUM(entradas) AS entradas, SUM(altas) AS altas
+        FROM EstatisticasDiarias WHERE dia >= %s AND dia < %s
+        GROUP BY mes, prioridade
+    """, (f"{ano}-01-01", f"{ano + 1}-01-01"))
+    for r in cursor.fetchall():
+        i = r['mes'] - 1
+        dados['movimentacao_mensal']['entradas'][i] += int(r['entradas'])
+        dados['movimentacao_mensal']['altas'][i] += int(r['altas'])
+        dados['prioridade_tendencia'][r['prioridade']][i] += int(r['entradas'])
+
+    cursor.execute("""
+        SELECT usuario,
+               (soma_dias_altas + internados * TO_DAYS(NOW()) - soma_to_days_entrada)
+               / NULLIF(internados + altas, 0) AS media
+        FROM EstatisticasPermanencia WHERE internados + altas > 0
+        ORDER BY usuario LIMIT 5
+    """)
+    for r in cursor.fetchall():
+        dados['dias_data']['labels'].append(r['usuario'])
+        dados['dias_data']['data'].append(round(float(r['media']), 1))
+
+    for r in saida_medicamentos(cursor):
+        dados['saida_remedios']['labels'].append(r['nome_medicamento'])
+        dados['saida_remedios']['data'].append(float(r['total']))
+
+if __name__ == '__main__':
+    from database import create_db_connection
+    conn = create_db_connection(pymysql.cursors.DictCursor)
+    if conn:
+        reconstruir(conn)
+        conn.close()
+        print("✅ Estatísticas reconstruídas.")
@@ -0,0 +1,304 @@
+"""
+Baixa de estoque em lote, sem condição de corrida.
+
+Antes cada medicamento custava três idas ao banco (SELECT, UPDATE com o
+saldo calculado no Python e INSERT no histórico) e duas baixas simultâneas
+do mesmo remédio podiam sobrescrever uma à outra. Agora, para N itens:
+
+1. um SELECT ... FOR UPDATE resolve todos os nomes e trava as linhas;
+2. um UPDATE com CASE decrementa só os itens com saldo suficiente
+   (com a guarda quantidade >= qtd também no SQL);
+3. um INSERT multi-linha (executemany) grava o histórico em EstoqueBaixas.
+
+Nada é commitado aqui: a rota chama conn.commit() junto com o resto da
+transação (prontuário, prova de vida...).
+
+Razão de movimentos (ledger)
+----------------------------
+Toda alteração de saldo também vira uma linha imutável em EstoqueMovimentos
+(entrada, saída ou ajuste, sempre como delta). EstoqueCheckpoints guarda de
+hora em hora (tarefa checkpoint_estoque do trabalhador) o saldo de cada
+medicamento num certo movimento, então o
+saldo numa data custa O(movimentos desde o último checkpoint). A coluna
+Estoque.quantidade passa a ser só uma projeção em cache, que pode ser
+recalculada com reconstruir_saldos().
+
+Teste de concorrência (cria e apaga um banco descartável no servidor de
+database.py):
+    python -m benchmark.concorrencia_estoque
+"""
+from collections import OrderedDict
+from datetime import datetime
+from decimal import ROUND_HALF_UP, Decimal
+
+import estatisticas
+
+CENTESIMO = Decimal('0.01')
+
+def _normalizar_nome(nome):
+    # A collation do MySQL ignora maiúsculas; os dicionários também precisam ignorar
+    return str(nome).strip().casefold()
+
+def _agrupar(itens, normalizar):
+    """Soma quantidades repetidas do mesmo medicamento, mantendo a ordem e a grafia."""
+    agrupados = OrderedDict()
+    for chave, qtd in itens:
+        # Mesma escala de Estoque.quantidade e da razão (DECIMAL(12, 2)): doses fracionadas valem
+        qtd = Decimal(str(qtd).replace(',', '.')).quantize(CENTESIMO, ROUND_HALF_UP)
+        if chave in (None, '') or qtd <= 0:
+            continue
+        if isinstance(chave, str):
+            chave = chave.strip()
+        k = normalizar(chave)
+        anterior, soma = agrupados.get(k, (chave, 0))
+        agrupados[k] = (anterior, soma + qtd)
+    return agrupados
+
+def debitar(cursor, itens, motivo, usuario, por='nome_medicamento'):
+    """
+    Dá baixa em vários medicamentos na transação corrente.
+
+    itens: [(nome_medicamento, quantidade), ...] ou, com por='id', [(id, quantidade), ...]
+    Retorna {'baixados': [...], 'insuficientes': [...], 'nao_encontrados': [...]}.
+    Cada item baixado/insuficiente é um dict com id, nome_medicamento,
+    unidade, quantidade (pedida) e saldo (antes da baixa).
+    """
+    if por not in ('nome_medicamento', 'id'):
+        raise ValueError("por deve ser 'nome_medicamento' ou 'id'")
+
+    resultado = {'baixados': [], 'insuficientes': [], 'nao_encontrados': []}
+    normalizar = _normalizar_nome if por == 'nome_medicamento' else int
+    pedidos = _agrupar(itens, normalizar)
+    if not pedidos:
+        return resultado
+
+    # 1. Resolve e trava todas as linhas de uma vez
+    marcadores = ', '.join(['%s'] * len(pedidos))
+    cursor.execute(f"""
+        SELECT id, nome_medicamento, quantidade, unidade FROM Estoque
+        WHERE {por} IN ({marcadores}) ORDER BY id FOR UPDATE
+    """, [chave for chave, _ in pedidos.values()])
+    encontrados = {normalizar(linha[por]): linha for linha in cursor.fetchall()}
+
+    for k, (chave, qtd) in pedidos.items():
+        linha = encontrados.get(k)
+        if linha is None:
+            resultado['nao_encontrados'].append(chave)
+            continue
+        item = {'id': linha['id'], 'nome_medicamento': linha['nome_medicamento'],
+                'unidade': linha['unidade'], 'quantidade': qtd, 'saldo': linha['quantidade']}
+        if linha['quantidade'] >= qtd:
+            resultado['baixados'].append(item)
+        else:
+            resultado['insuficientes'].append(item)
+
+    baixados = resultado['baixados']
+    if not baixados:
+        return resultado
+
+    # 2. Decremento de todos os itens num único UPDATE. As linhas estão travadas
+    # desde o SELECT ... FOR UPDATE, então o saldo conferido acima é o atual.
+    # (rowcount não serve de checagem: o PyMySQL conta linhas alteradas, não encontradas.)
+    casos = ' '.join(['WHEN %s THEN %s'] * len(baixados))
+    valores_caso = [v for b in baixados for v in (b['id'], b['quantidade'])]
+    ids = [b['id'] for b in baixados]
+    marcadores_ids = ', '.join(['%s'] * len(ids))
+    cursor.execute(f"""
+        UPDATE Estoque SET quantidade = quantidade - (CASE id {casos} END)
+        WHERE id IN ({marcadores_ids})
+    """, valores_caso + ids)
+
+    # 3. Histórico e estatísticas em lote
+    agora = datetime.now()
+    cursor.executemany("""
+        INSERT INTO EstoqueBaixas (nome_medicamento, quantidade_removida, unidade, motivo, usuario_baixa, data_hora)
+        VALUES (%s, %s, %s, %s, %s, %s)
+    """, [(b['nome_medicamento'], b['quantidade'], b['unidade'], motivo, usuario, agora) for b in baixados])
+    registrar_movimentos(cursor, [(b['id'], b['nome_medicamento'], 'saida', -b['quantidade'], motivo, usuario)
+                                  for b in baixados], agora)
+    estatisticas.registrar_saidas_medicamentos(
+        cursor, [(b['nome_medicamento'], b['quantidade']) for b in baixados], agora)
+
+    return resultado
+
+def registrar_entrada(cursor, nome_medicamento, quantidade, unidade, usuario, motivo='Entrada de estoque'):
+    """Soma uma entrada ao estoque (cria o medicamento se não existir). Retorna o id."""
+    cursor.execute("""
+        INSERT INTO Estoque (nome_medicamento, quantidade, unidade, data_ultima_entrada, usuario_ultima_alteracao)
+        VALUES (%s, %s, %s, NOW(), %s) ON DUPLICATE KEY UPDATE
+        id = LAST_INSERT_ID(id), quantidade = quantidade + VALUES(quantidade), data_ultima_entrada = NOW(),
+        usuario_ultima_alteracao = VALUES(usuario_ultima_alteracao)
+    """, (nome_medicamento, quantidade, unidade, usuario))
+    # LAST_INSERT_ID(id) faz o lastrowid valer também quando a linha já existia
+    item_id = cursor.lastrowid
+    registrar_movimentos(cursor, [(item_id, nome_medicamento, 'entrada', quantidade, motivo, usuario)])
+    return item_id
+
+def ajustar(cursor, item_id, nome_medicamento, quantidade, unidade, usuario, motivo='Ajuste manual'):
+    """Edição manual do item: grava a diferença de saldo como movimento de ajuste."""
+    cursor.execute("SELECT quantidade FROM Estoque WHERE id = %s FOR UPDATE", (item_id,))
+    atual = cursor.fetchone()
+    if atual is None:
+        return False
+    cursor.execute("""
+        UPDATE Estoque SET nome_medicamento = %s, quantidade = %s, unidade = %s,
+        data_ultima_entrada = NOW(), usuario_ultima_alteracao = %s WHERE id = %s
+    """, (nome_medicamento, quantidade, unidade, usuario, item_id))
+    delta = float(quantidade) - float(atual['quantidade'])
+    if delta:
+        registrar_movimentos(cursor, [(item_id, nome_medicamento, 'ajuste', delta, motivo, usuario)])
+    return True
+
+def mensagens(resultado):
+    """Textos de aviso para flash() a partir do resultado de debitar()."""
+    avisos = []
+    for item in resultado['insuficientes']:
+        avisos.append(f"Atenção: Estoque insuficiente de {item['nome_medicamento']} (Saldo: {item['saldo']}).")
+    for nome in resultado['nao_encontrados']:
+        avisos.append(f"Atenção: {nome} não encontrado no estoque; baixa não realizada.")
+    return avisos
+
+# ==============================================================================
+# RAZÃO DE MOVIMENTOS E CHECKPOINTS
+# ==============================================================================
+
+SQL_TABELAS = [
+    """
+    CREATE TABLE IF NOT EXISTS EstoqueMovimentos (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        estoque_id INT NOT NULL,
+        nome_medicamento VARCHAR(100) NOT NULL,
+        tipo ENUM('entrada', 'saida', 'ajuste') NOT NULL,
+        quantidade DECIMAL(12, 2) NOT NULL,
+        motivo VARCHAR(255),
+        usuario VARCHAR(50),
+        data_hora DATETIME NOT NULL,
+        INDEX idx_mov_item_data (estoque_id, data_hora)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS EstoqueCheckpoints (
+        estoque_id INT NOT NULL,
+        movimento_id BIGINT NOT NULL,
+        data_hora DATETIME NOT NULL,
+        saldo DECIMAL(14, 2) NOT NULL,
+        PRIMARY KEY (estoque_id, movimento_id),
+        INDEX idx_ck_item_data (estoque_id, data_hora)
+    )
+    """,
+]
+
+def criar_tabelas(cursor):
+    for sql in SQL_TABELAS:
+        cursor.execute(sql)
+
+def registrar_movimentos(cursor, movimentos, data_hora=None):
+    """movimentos = [(estoque_id, nome_medicamento, tipo, delta, motivo, usuario), ...]"""
+    if not movimentos:
+        return
+    data_hora = data_hora or datetime.now()
+    cursor.executemany("""
+        INSERT INTO EstoqueMovimentos (estoque_id, nome_medicamento, tipo, quantidade, motivo, usuario, data_hora)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+    """, [m + (data_hora,) for m in movimentos])
+
+def _ultimo_checkpoint(cursor, estoque_id, ate=None):
+    if ate is None:
+        cursor.execute("""
+            SELECT movimento_id, saldo FROM EstoqueCheckpoints
+            WHERE estoque_id = %s ORDER BY movimento_id DESC LIMIT 1
+        """, (estoque_id,))
+    else:
+        cursor.execute("""
+            SELECT movimento_id, saldo FROM EstoqueCheckpoints
+            WHERE estoque_id = %s AND data_hora < %s ORDER BY data_hora DESC, movimento_id DESC LIMIT 1
+        """, (estoque_id, ate))
+    return cursor.fetchone()
+
+def saldo_em(cursor, estoque_id, data_hora):
+    """
+    Saldo do medicamento imediatamente antes de data_hora
+    (último checkpoint anterior + movimentos seguintes a ele).
+    """
+    ck = _ultimo_checkpoint(cursor, estoque_id, data_hora)
+    base, desde = (ck['saldo'], ck['movimento_id']) if ck else (0, 0)
+    cursor.execute("""
+        SELECT IFNULL(SUM(quantidade), 0) AS total FROM EstoqueMovimentos
+        WHERE estoque_id = %s AND id > %s AND data_hora < %s
+    """, (estoque_id, desde, data_hora))
+    return float(base) + float(cursor.fetchone()['total'])
+
+def movimentos_periodo(cursor, estoque_id, de, ate, limite=500):
+    cursor.execute("""
+        SELECT id, tipo, quantidade, motivo, usuario, data_hora FROM EstoqueMovimentos
+        WHERE estoque_id = %s AND data_hora >= %s AND data_hora < %s
+        ORDER BY data_hora, id LIMIT %s
+    """, (estoque_id, de, ate, limite))
+    return cursor.fetchall()
+
+def criar_checkpoints(conn):
+    """
+    Grava um checkpoint para cada medicamento com movimentos desde o último.
+    Roda de hora em hora pela AGENDA de tarefas.py (ou flask --app app
+    checkpoint-estoque). Retorna quantos criou.
+    """
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            INSERT INTO EstoqueCheckpoints (estoque_id, movimento_id, data_hora, saldo)
+            SELECT m.estoque_id, MAX(m.id), MAX(m.data_hora), IFNULL(ck.saldo, 0) + SUM(m.quantidade)
+            FROM EstoqueMovimentos m
+            LEFT JOIN (
+                SELECT c.estoque_id, c.movimento_id, c.saldo FROM EstoqueCheckpoints c
+                JOIN (SELECT estoque_id, MAX(movimento_id) AS ultimo FROM EstoqueCheckpoints GROUP BY estoque_id) u
+                  ON u.estoque_id = c.estoque_id AND u.ultimo = c.movimento_id
+            ) ck ON ck.estoque_id = m.estoque_id
+            WHERE m.id > IFNULL(ck.movimento_id, 0)
+            GROUP BY m.estoque_id, ck.saldo
+        """)
+        criados = cursor.rowcount
+        conn.commit()
+        return criados
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def reconstruir_saldos(conn):
+    """Recalcula Estoque.quantidade a partir do último checkpoint + movimentos."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE Estoque e
+            LEFT JOIN (
+                SELECT c.estoque_id, c.movimento_id, c.saldo FROM EstoqueCheckpoints c
+                JOIN (SELECT estoque_id, MAX(movimento_id) AS ultimo FROM EstoqueCheckpoints GROUP BY estoque_id) u
+                  ON u.estoque_id = c.estoque_id AND u.ultimo = c.movimento_id
+            ) ck ON ck.estoque_id = e.id
+            SET e.quantidade = IFNULL(ck.saldo, 0) + IFNULL((
+                SELECT SUM(m.quantidade) FROM EstoqueMovimentos m
+                WHERE m.estoque_id = e.id AND m.id > IFNULL(ck.movimento_id, 0)
+            ), 0)
+        """)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def semear_razao(cursor):
+    """Migração: saldo atual de cada item vira um ajuste inicial + checkpoint."""
+    cursor.execute("SELECT COUNT(*) AS n FROM EstoqueMovimentos")
+    linha = cursor.fetchone()
+    if (linha['n'] if isinstance(linha, dict) else linha[0]) > 0:
+        return
+    cursor.execute("""
+        INSERT INTO EstoqueMovimentos (estoque_id, nome_medicamento, tipo, quantidade, motivo, usuario, data_hora)
+        SELECT id, nome_medicamento, 'ajuste', quantidade, 'Saldo inicial', 'Sistema', NOW() FROM Estoque
+    """)
+    cursor.execute("""
+        INSERT INTO EstoqueCheckpoints (estoque_id, movimento_id, data_hora, saldo)
+        SELECT estoque_id, id, data_hora, quantidade FROM EstoqueMovimentos
+    """)
@@ -0,0 +1,112 @@
+"""
+Barramento de eventos para as telas ao vivo (Server-Sent Events).
+
+As rotas de escrita publicam pequenos deltas depois do commit
+(ex.: publicar('pacientes', 'paciente.alta', {'id': 7})). Cada tela aberta
+mantém uma conexão em /api/eventos e aplica os deltas no DOM, sem refazer
+as consultas da página. Sem escritas, uma tela parada custa só um heartbeat
+a cada HEARTBEAT segundos e nenhuma consulta ao banco.
+
+Os últimos eventos ficam num buffer circular para que o navegador, ao
+reconectar com Last-Event-ID, receba o que perdeu. Se o id for de outro
+processo (servidor reiniciado) ou já tiver saído do buffer, o cliente recebe
+o evento 'recarregar' e refaz a página uma vez.
+
+O barramento é local ao processo: com vários workers, cada um só vê as
+escritas que ele mesmo atendeu. Cada conexão SSE ocupa uma thread; as
+conexões são encerradas após DURACAO_MAXIMA segundos e o navegador reconecta
+sozinho, o que libera threads de clientes que sumiram.
+"""
+import json
+import threading
+import time
+import uuid
+from collections import deque
+
+HEARTBEAT = 15           # segundos entre comentários ': ping'
+DURACAO_MAXIMA = 300     # segundos até o servidor fechar a conexão
+TAMANHO_HISTORICO = 500  # eventos guardados para reconexão
+RETRY_MS = 3000          # intervalo de reconexão sugerido ao navegador
+
+CANAIS = ('pacientes', 'provas_vida', 'estoque')
+
+class Barramento:
+    def __init__(self, tamanho_historico=TAMANHO_HISTORICO):
+        # Prefixo dos ids: muda a cada processo, invalidando Last-Event-ID antigos
+        self.epoca = uuid.uuid4().hex[:8]
+        self._eventos = deque(maxlen=tamanho_historico)  # (numero, canal, tipo, dados)
+        self._ultimo = 0
+        self._cond = threading.Condition()
+        self.assinantes = 0
+
+    def publicar(self, canal, tipo, dados=None):
+        with self._cond:
+            self._ultimo += 1
+            self._eventos.append((self._ultimo, canal, tipo, dados or {}))
+            self._cond.notify_all()
+            return self._ultimo
+
+    def _numero(self, last_event_id):
+        """Número do evento a partir do Last-Event-ID; None se não servir para retomar."""
+        if not last_event_id:
+            return self._ultimo
+        epoca, _, numero = last_event_id.partition('-')
+        if epoca != self.epoca or not numero.isdigit():
+            return None
+        numero = int(numero)
+        with self._cond:
+            primeiro = self._eventos[0][0] if self._eventos else self._ultimo + 1
+            if numero > self._ultimo or numero < primeiro - 1:
+                return None
+        return numero
+
+    def _entre(self, numero, ultimo, canais):
+        with self._cond:
+            return [e for e in self._eventos if numero < e[0] <= ultimo and e[1] in canais]
+
+    def fluxo(self, canais, last_event_id=None, heartbeat=HEARTBEAT, duracao=DURACAO_MAXIMA):
+        """Gerador com o texto SSE para um assinante."""
+        canais = set(canais) or set(CANAIS)
+        # Posição calculada já na conexão (não no primeiro next do gerador)
+        numero = self._numero(last_event_id)
+        recarregar = numero is None
+        if recarregar:
+            with self._cond:
+                numero = self._ultimo
+        return self._gerar(canais, numero, recarregar, heartbeat, duracao)
+
+    def _gerar(self, canais, numero, recarregar, heartbeat, duracao):
+        yield f"retry: {RETRY_MS}\n\n"
+        if recarregar:
+            yield self._formatar(numero, 'recarregar', {})
+
+        fim = time.monotonic() + duracao
+        with self._cond:
+            self.assinantes += 1
+        try:
+            while time.monotonic() < fim:
+                with self._cond:
+                    self._cond.wait_for(lambda: self._ultimo > numero, timeout=heartbeat)
+                    ultimo = self._ultimo
+                if ultimo == numero:
+                    yield ": ping\n\n"
+                    continue
+                enviados = self._entre(numero, ultimo, canais)
+                for n, _, tipo, dados in enviados:
+                    yield self._formatar(n, tipo, dados)
+                if not enviados or enviados[-1][0] < ultimo:
+                    # Só avança o Last-Event-ID do navegador (sem disparar evento)
+                    yield f"id: {self.epoca}-{ultimo}\n\n"
+                numero = ultimo
+        finally:
+            with self._cond:
+                self.assinantes -= 1
+
+    def _formatar(self, numero, tipo, dados):
+        return f"id: {self.epoca}-{numero}\nevent: {tipo}\ndata: {json.dumps(dados, default=str)}\n\n"
+
+# Instância usada pelo app
+barramento = Barramento()
+
+def publicar(canal, tipo, dados=None):
+    return barramento.publicar(canal, tipo, dados)
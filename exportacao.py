@@ -0,0 +1,170 @@
+"""
+Exportação completa (CSV ou NDJSON) do arquivo de altas, das provas de vida
+e do histórico de baixas do estoque.
+
+A consulta roda num cursor do lado do servidor (SSDictCursor): as linhas são
+lidas do MySQL aos poucos e escritas na resposta à medida que chegam, então
+a memória fica constante e o primeiro byte sai antes de a consulta terminar.
+Cada exportação usa uma conexão própria, fora do pool, para não prender uma
+conexão das páginas enquanto o download dura.
+
+Os filtros são os mesmos das páginas (de/ate, paciente, usuário...).
+"""
+import csv
+import io
+import json
+from datetime import datetime
+
+import pymysql.cursors
+
+import arquivamento
+import paginacao
+from database import create_db_connection
+
+FORMATOS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+LINHAS_POR_LEITURA = 500     # fetchmany do cursor do servidor
+TIMEOUT_ESCRITA = 600        # net_write_timeout: tolera clientes lentos no download
+BYTES_POR_ENVIO = 64 * 1024  # junta linhas antes de entregar ao servidor web
+
+def _filtros_arquivo(args, where, params):
+    where.append("status = 'alta'")
+    paginacao.filtro_periodo('data_baixa', args, where, params)
+    paginacao.filtro_prefixo('nome', args.get('paciente'), where, params)
+    paginacao.filtro_igual('prioridade_atencao', args.get('prioridade'), where, params)
+    paginacao.filtro_igual('nome_baixa', args.get('usuario'), where, params)
+
+def _filtros_provas_vida(args, where, params):
+    paginacao.filtro_periodo('pv.data_hora', args, where, params)
+    paginacao.filtro_prefixo('p.nome', args.get('paciente'), where, params)
+    paginacao.filtro_igual('pv.quem_efetuou', args.get('usuario'), where, params)
+    paginacao.filtro_igual('p.prioridade_atencao', args.get('prioridade'), where, params)
+
+def _filtros_baixas(args, where, params):
+    paginacao.filtro_periodo('data_hora', args, where, params)
+    paginacao.filtro_prefixo('nome_medicamento', args.get('medicamento'), where, params)
+    paginacao.filtro_igual('usuario_baixa', args.get('usuario'), where, params)
+
+# nome -> (SELECT sem WHERE, tabelas do FROM, ORDER BY, função de filtros)
+# As tabelas entram via arquivamento.com_arquivo (tabela, alias, colunas), então
+# pacientes e provas de vida já arquivados também saem na exportação.
+EXPORTACOES = {
+    'arquivo': (
+        """SELECT id, nome, cpf, data_nascimento, cep, endereco, bairro, data_entrada, data_baixa,
+                  nome_baixa, procedimento, cid_10, prioridade_atencao, usuario_internacao
+           FROM {pacientes}""",
+        {'pacientes': ('Pacientes', 'p', "id, nome, cpf, data_nascimento, cep, endereco, bairro, data_entrada, "
+                                         "data_baixa, nome_baixa, procedimento, cid_10, prioridade_atencao, "
+                                         "usuario_internacao, status")},
+        "data_baixa, id",
+        _filtros_arquivo,
+    ),
+    'provas_vida': (
+        """SELECT pv.id, pv.paciente_id, p.nome AS nome_paciente, pv.data_hora, pv.pressao_arterial,
+                  pv.pressao_sistolica, pv.pressao_diastolica, pv.glicose, pv.saturacao,
+                  pv.batimentos_cardiacos, pv.temperatura, pv.quem_efetuou, pv.evolucao, pv.observacoes
+           FROM {provas_vida} JOIN {pacientes} ON pv.paciente_id = p.id""",
+        {'provas_vida': ('ProvasDeVida', 'pv', "id, paciente_id, data_hora, pressao_arterial, pressao_sistolica, "
+                                               "pressao_diastolica, glicose, saturacao, batimentos_cardiacos, "
+                                               "temperatura, quem_efetuou, evolucao, observacoes"),
+         'pacientes': ('Pacientes', 'p', "id, nome, prioridade_atencao")},
+        "pv.data_hora, pv.id",
+        _filtros_provas_vida,
+    ),
+    'baixas': (
+        """SELECT id, nome_medicamento, quantidade_removida, unidade, motivo, usuario_baixa, data_hora
+           FROM EstoqueBaixas""",
+        {},
+        "data_hora, id",
+        _filtros_baixas,
+    ),
+}
+
+def montar_consulta(nome, args, cursor):
+    """cursor: usado só para saber se as tabelas de arquivo já existem."""
+    sql, tabelas, ordem, filtros = EXPORTACOES[nome]
+    sql = sql.format(**{chave: arquivamento.com_arquivo(cursor, *tabela) for chave, tabela in tabelas.items()})
+    where, params = [], []
+    filtros(args, where, params)
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    return sql + f" ORDER BY {ordem}", params
+
+def _valor(v):
+    if isinstance(v, datetime):
+        return v.isoformat(sep=' ')
+    return '' if v is None else v
+
+def _esvaziar(buffer):
+    texto = buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    return texto
+
+def _linhas_csv(cursor):
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    cabecalho = [c[0] for c in cursor.description]
+    escritor.writerow(cabecalho)
+    yield _esvaziar(buffer)
+    while True:
+        linhas = cursor.fetchmany(LINHAS_POR_LEITURA)
+        if not linhas:
+            break
+        for linha in linhas:
+            escritor.writerow([_valor(linha[c]) for c in cabecalho])
+        if buffer.tell() >= BYTES_POR_ENVIO:
+            yield _esvaziar(buffer)
+    yield buffer.getvalue()
+
+def _linhas_ndjson(cursor):
+    partes, tamanho = [], 0
+    while True:
+        linhas = cursor.fetchmany(LINHAS_POR_LEITURA)
+        if not linhas:
+            break
+        for linha in linhas:
+            texto = json.dumps(linha, default=str, ensure_ascii=False) + '\n'
+            partes.append(texto)
+            tamanho += len(texto)
+        if tamanho >= BYTES_POR_ENVIO:
+            yield ''.join(partes)
+            partes, tamanho = [], 0
+    yield ''.join(partes)
+
+def abrir(nome, formato, args):
+    """
+    Executa a consulta e devolve o gerador com o conteúdo. A conexão é aberta
+    aqui (antes da resposta começar) para que um erro vire 500, e não um
+    arquivo cortado; depois disso ela é fechada pelo próprio gerador.
+    """
+    conn = create_db_connection(pymysql.cursors.SSDictCursor)
+    if conn is None:
+        raise RuntimeError("Sem conexão com o banco.")
+    try:
+        # A checagem do arquivo num cursor comum; o do servidor fica só para a exportação
+        with conn.cursor(pymysql.cursors.DictCursor) as consulta:
+            sql, params = montar_consulta(nome, args, consulta)
+        cursor = conn.cursor()
+        cursor.execute("SET SESSION net_write_timeout = %s", (TIMEOUT_ESCRITA,))
+        cursor.execute(sql, params)
+    except Exception:
+        conn.close()
+        raise
+    gerar = _linhas_csv if formato == 'csv' else _linhas_ndjson
+
+    def conteudo():
+        try:
+            yield from gerar(cursor)
+        finally:
+            # Se o cliente desistir no meio, fechar a conexão descarta o resto
+            # do resultado sem precisar lê-lo (cursor.close() leria tudo).
+            conn.close()
+
+    return conteudo()
+
+def nome_arquivo(nome, formato):
+    return f"{nome}_{datetime.now():%Y%m%d_%H%M}.{formato}"
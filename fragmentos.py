@@ -0,0 +1,152 @@
+"""
+Cache de fragmentos de template e cache de bytecode do Jinja.
+
+Nos templates:
+
+    {% fragmento 'estoque_tabela', tags=['estoque'] %}
+        ... markup pesado ...
+    {% endfragmento %}
+
+O HTML renderizado vai para o cache do app (cache.py) com a chave
+(nome, nível do usuário logado, chave extra) e sai de lá quando alguma das
+tags é invalidada pelas rotas de escrita, ou pelo TTL. Tudo o que varia
+dentro do fragmento precisa estar na chave: o nível (session['nivel']) já
+entra sozinho; qualquer outra coisa (paciente, página, usuário) vai em
+chave=...
+
+Para que um acerto também poupe a consulta ao banco, a rota passa os dados
+com preguicoso(funcao): a função só roda se o fragmento for de fato
+renderizado.
+
+O bytecode compilado dos templates fica em FRAGMENTOS_CONFIG['bytecode'],
+então workers novos não recompilam os templates do zero.
+
+Benchmark de renderização (não precisa de banco):
+
+    python fragmentos.py
+"""
+import os
+import sys
+import tempfile
+
+from flask import has_request_context, session
+from jinja2 import FileSystemBytecodeCache, nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+from cache import cache, TODAS_AS_TAGS
+
+FRAGMENTOS_CONFIG = {
+    "ativo": True,
+    "ttl": 300,  # segundos; as tags invalidam antes disso
+    "bytecode": os.path.join(tempfile.gettempdir(), 'hospitalar_jinja'),
+}
+
+class FragmentoExtension(Extension):
+    """{% fragmento nome[, tags=[...]][, chave=...][, ttl=...] %} ... {% endfragmento %}"""
+
+    tags = {'fragmento'}
+
+    def parse(self, parser):
+        linha = next(parser.stream).lineno
+        args = [parser.parse_expression()]
+        kwargs = []
+        while parser.stream.skip_if('comma'):
+            nome = parser.stream.expect('name').value
+            if nome not in ('tags', 'chave', 'ttl'):
+                parser.fail(f"argumento desconhecido em fragmento: {nome}", linha)
+            parser.stream.expect('assign')
+            kwargs.append(nodes.Keyword(nome, parser.parse_expression()))
+        corpo = parser.parse_statements(('name:endfragmento',), drop_needle=True)
+        return nodes.CallBlock(self.call_method('_renderizar', args, kwargs), [], [], corpo).set_lineno(linha)
+
+    def _renderizar(self, nome, tags=(), chave=None, ttl=None, caller=None):
+        if not FRAGMENTOS_CONFIG['ativo']:
+            return caller()
+        nivel = session.get('nivel') if has_request_context() else None
+        html = cache.obter_ou_calcular(('fragmento', nome, nivel, chave), lambda: str(caller()),
+                                       ttl=ttl or FRAGMENTOS_CONFIG['ttl'], tags=tuple(tags))
+        # Conteúdo gerado pelo próprio template (já escapado na primeira renderização)
+        return Markup(html)
+
+class Preguicoso:
+    """Resultado de consulta carregado só no primeiro uso (iteração, índice, len ou bool)."""
+
+    def __init__(self, funcao):
+        self._funcao = funcao
+        self._carregado = False
+        self._valor = None
+
+    def _obter(self):
+        if not self._carregado:
+            self._valor = self._funcao()
+            self._carregado = True
+        return self._valor
+
+    def __iter__(self):
+        return iter(self._obter())
+
+    def __len__(self):
+        return len(self._obter())
+
+    def __bool__(self):
+        return bool(self._obter())
+
+    def __getitem__(self, chave):
+        return self._obter()[chave]
+
+def preguicoso(funcao):
+    return Preguicoso(funcao)
+
+def instalar(app):
+    """Registra a extensão {% fragmento %} e o cache de bytecode no app."""
+    app.jinja_env.add_extension(FragmentoExtension)
+    app.jinja_env.globals['TODAS_AS_TAGS'] = TODAS_AS_TAGS
+    pasta = FRAGMENTOS_CONFIG['bytecode']
+    if pasta:
+        try:
+            os.makedirs(pasta, exist_ok=True)
+            app.jinja_env.bytecode_cache = FileSystemBytecodeCache(pasta, '%s.hospitalar.cache')
+        except OSError as err:
+            print(f"❌ Cache de bytecode do Jinja desativado ({pasta}): {err}")
+
+# ==============================================================================
+# BENCHMARK
+# ==============================================================================
+
+def _benchmark(repeticoes=200):
+    import time
+    from datetime import datetime
+
+    from app import app, dados_dashboard_vazios
+    # Como script este arquivo é __main__; a extensão usa o módulo importado pelo app
+    config = sys.modules['fragmentos'].FRAGMENTOS_CONFIG
+
+    agora = datetime.now()
+    itens = [{'id': i, 'nome_medicamento': f'Medicamento {i:03d}', 'quantidade': i * 7 % 400, 'unidade': 'un',
+              'data_ultima_entrada': agora, 'usuario_ultima_alteracao': 'admin'} for i in range(300)]
+    usuarios = [{'id': i, 'nome_completo': f'Usuário {i}', 'usuario': f'usuario{i}', 'nivel_acesso': 'enfermeiro',
+                 'nacionalidade': 'BR'} for i in range(100)]
+    casos = [
+        ('dashboard.html', dict(usuario='admin', nivel='admin', dados=dados_dashboard_vazios())),
+        ('estoque.html', dict(itens=itens)),
+        ('gerenciar_usuarios.html', dict(usuarios=usuarios, nivel_logado='admin',
+                                         niveis_permitidos=['admin', 'tecnico', 'enfermeiro', 'estagiario'])),
+    ]
+    with app.test_request_context('/'):
+        session['nivel'], session['usuario_id'] = 'admin', 1
+        for template, contexto in casos:
+            tempos = {}
+            for ativo in (False, True):
+                config['ativo'] = ativo
+                cache.limpar()
+                app.jinja_env.get_template(template).render(session=session, **contexto)
+                inicio = time.perf_counter()
+                for _ in range(repeticoes):
+                    app.jinja_env.get_template(template).render(session=session, **contexto)
+                tempos[ativo] = (time.perf_counter() - inicio) / repeticoes * 1000
+            print(f"  - {template}: {tempos[False]:.2f} ms sem cache, {tempos[True]:.2f} ms com fragmentos")
+    config['ativo'] = True
+
+if __name__ == '__main__':
+    _benchmark()
@@ -0,0 +1,271 @@
+"""
+Ingestão em lote de provas de vida (monitores de leito e tablets offline).
+
+Os aparelhos acumulam leituras e enviam tudo de uma vez para
+/api/provas_vida/lote, em JSON (lista ou {"leituras": [...]}) ou NDJSON
+(uma leitura por linha). Cada leitura:
+
+    {"chave": "monitor-12:000981",      # opcional, deduplica reenvios
+     "paciente_id": 42,
+     "data_hora": "2026-03-01T14:05:00", # hora da medição no aparelho
+     "pa": "120/80", "glicose": 98, "sat": 97, "bpm": 72, "temperatura": 36.7,
+     "evolucao": "...", "observacoes": "..."}
+
+As leituras são processadas em blocos de TAMANHO_BLOCO, cada bloco na sua
+transação: status dos pacientes numa consulta só, chaves já gravadas numa
+consulta só, INSERT com executemany e resumos (estatísticas e séries de
+sinais vitais) atualizados uma vez por hora afetada. Um reenvio com a mesma
+chave devolve 'duplicada' com o id original, sem gravar de novo nem contar
+de novo nos resumos, mesmo quando os dois envios chegam ao mesmo tempo.
+
+Benchmark (num banco descartável): python -m benchmark.ingestao_lote
+"""
+import json
+import time
+import uuid
+from datetime import datetime, timedelta
+from decimal import Decimal, InvalidOperation
+
+import estatisticas
+import sinais_vitais
+import triagem
+import versoes
+from cache import TAG_PROVAS_VIDA
+
+TAMANHO_BLOCO = 500
+MAX_LEITURAS = 20000
+TAMANHO_CHAVE = 64
+TOLERANCIA_FUTURO = timedelta(minutes=5)
+
+# campo -> (coluna, mínimo, máximo)
+FAIXAS = {
+    'glicose': ('glicose', 0, 2000),
+    'sat': ('saturacao', 0, 100),
+    'bpm': ('batimentos_cardiacos', 0, 350),
+    'temperatura': ('temperatura', 25, 45),
+}
+
+class LeituraInvalida(ValueError):
+    pass
+
+# ==============================================================================
+# LEITURA DO CORPO DA REQUISIÇÃO
+# ==============================================================================
+
+def ler_corpo(texto, tipo_conteudo=''):
+    """Converte o corpo (JSON ou NDJSON) numa lista de leituras."""
+    if 'ndjson' in (tipo_conteudo or '') or 'jsonlines' in (tipo_conteudo or ''):
+        leituras = []
+        for numero, linha in enumerate(texto.splitlines(), 1):
+            if linha.strip():
+                try:
+                    leituras.append(json.loads(linha))
+                except ValueError:
+                    raise LeituraInvalida(f"Linha {numero} não é um JSON válido.")
+        return leituras
+    try:
+        corpo = json.loads(texto or 'null')
+    except ValueError:
+        raise LeituraInvalida("Corpo não é um JSON válido.")
+    if isinstance(corpo, dict):
+        corpo = corpo.get('leituras')
+    if not isinstance(corpo, list):
+        raise LeituraInvalida("Envie uma lista de leituras ou {\"leituras\": [...]}.")
+    return corpo
+
+# ==============================================================================
+# VALIDAÇÃO
+# ==============================================================================
+
+def _numero(valor, campo, minimo, maximo):
+    if valor is None or valor == '':
+        return None
+    try:
+        numero = Decimal(str(valor).replace(',', '.'))
+    except InvalidOperation:
+        raise LeituraInvalida(f"'{campo}' não é numérico.")
+    if not (minimo <= numero <= maximo):
+        raise LeituraInvalida(f"'{campo}' fora da faixa ({minimo} a {maximo}).")
+    return numero
+
+def validar(leitura, agora=None):
+    """Normaliza uma leitura. Lança LeituraInvalida com a mensagem do erro."""
+    if not isinstance(leitura, dict):
+        raise LeituraInvalida("Leitura precisa ser um objeto JSON.")
+    agora = agora or datetime.now()
+
+    try:
+        paciente_id = int(leitura.get('paciente_id'))
+    except (TypeError, ValueError):
+        raise LeituraInvalida("'paciente_id' ausente ou inválido.")
+
+    try:
+        data_hora = datetime.fromisoformat(str(leitura.get('data_hora')).replace(' ', 'T'))
+    except ValueError:
+        raise LeituraInvalida("'data_hora' ausente ou inválida (use AAAA-MM-DDTHH:MM:SS).")
+    if data_hora.tzinfo is not None:
+        data_hora = data_hora.astimezone().replace(tzinfo=None)
+    if data_hora > agora + TOLERANCIA_FUTURO:
+        raise LeituraInvalida("'data_hora' no futuro.")
+
+    chave = leitura.get('chave')
+    if chave is not None:
+        chave = str(chave).strip()
+        if not chave or len(chave) > TAMANHO_CHAVE:
+            raise LeituraInvalida(f"'chave' precisa ter de 1 a {TAMANHO_CHAVE} caracteres.")
+
+    pa = str(leitura.get('pa') or '').strip() or None
+    sistolica, diastolica = sinais_vitais.interpretar_pressao(pa)
+    if pa and sistolica is None:
+        raise LeituraInvalida("'pa' não reconhecida (ex.: 120/80).")
+
+    valores = {coluna: _numero(leitura.get(campo), campo, minimo, maximo)
+               for campo, (coluna, minimo, maximo) in FAIXAS.items()}
+    if pa is None and all(v is None for v in valores.values()):
+        raise LeituraInvalida("Nenhum sinal vital informado.")
+
+    return {
+        'chave': chave,
+        'paciente_id': paciente_id,
+        'data_hora': data_hora.replace(microsecond=0),
+        'pressao_arterial': pa,
+        'pressao_sistolica': sistolica,
+        'pressao_diastolica': diastolica,
+        'evolucao': leitura.get('evolucao'),
+        'observacoes': leitura.get('observacoes') or '',
+        **valores,
+    }
+
+# ==============================================================================
+# GRAVAÇÃO
+# ==============================================================================
+
+COLUNAS = ('paciente_id', 'data_hora', 'pressao_arterial', 'pressao_sistolica', 'pressao_diastolica',
+           'glicose', 'saturacao', 'batimentos_cardiacos', 'temperatura', 'evolucao', 'observacoes',
+           'quem_efetuou', 'chave_idempotencia')
+
+SQL_INSERT = f"""
+    INSERT INTO ProvasDeVida ({', '.join(COLUNAS)}) VALUES ({', '.join(['%s'] * len(COLUNAS))})
+"""
+
+def _marcadores(valores):
+    return ', '.join(['%s'] * len(valores))
+
+def _gravar_bloco(cursor, bloco, usuario, resultados):
+    """bloco = [(indice, leitura_validada), ...]. Retorna as leituras gravadas."""
+    ids_pacientes = sorted({l['paciente_id'] for _, l in bloco})
+    cursor.execute(f"SELECT id, status FROM Pacientes WHERE id IN ({_marcadores(ids_pacientes)})", ids_pacientes)
+    status = {r['id']: r['status'] for r in cursor.fetchall()}
+
+    chaves = sorted({l['chave'] for _, l in bloco if l['chave']})
+    existentes = {}
+    if chaves:
+        # Leitura com trava: vê reenvios já confirmados por outra transação (ou espera
+        # o commit delas) e trava as chaves ausentes até o commit deste bloco
+        cursor.execute(f"SELECT id, chave_idempotencia FROM ProvasDeVida WHERE chave_idempotencia IN ({_marcadores(chaves)}) FOR UPDATE", chaves)
+        existentes = {r['chave_idempotencia']: r['id'] for r in cursor.fetchall()}
+
+    novas = []
+    vistas = set()
+    for indice, leitura in bloco:
+        chave = leitura['chave']
+        if chave in existentes:
+            resultados[indice] = {'indice': indice, 'status': 'duplicada', 'id': existentes[chave]}
+        elif chave and chave in vistas:
+            resultados[indice] = {'indice': indice, 'status': 'duplicada'}
+        elif leitura['paciente_id'] not in status:
+            resultados[indice] = {'indice': indice, 'status': 'erro', 'erro': "Paciente não encontrado."}
+        elif status[leitura['paciente_id']] != 'internado':
+            resultados[indice] = {'indice': indice, 'status': 'erro', 'erro': "Paciente já recebeu alta."}
+        else:
+            if chave:
+                vistas.add(chave)
+            novas.append((indice, leitura))
+
+    if not novas:
+        return []
+
+    # Leituras sem chave recebem uma interna, usada só para recuperar os ids
+    for _, leitura in novas:
+        leitura['chave_idempotencia'] = leitura['chave'] or f"srv-{uuid.uuid4().hex}"
+
+    # Sem ON DUPLICATE KEY: se mesmo assim um reenvio concorrente gravou a chave, o
+    # INSERT falha, o bloco é desfeito e a regravação uma a uma o marca como 'duplicada'
+    cursor.executemany(SQL_INSERT, [
+        tuple(usuario if c == 'quem_efetuou' else l[c] for c in COLUNAS) for _, l in novas
+    ])
+
+    chaves_novas = [l['chave_idempotencia'] for _, l in novas]
+    cursor.execute(f"SELECT id, chave_idempotencia FROM ProvasDeVida WHERE chave_idempotencia IN ({_marcadores(chaves_novas)})", chaves_novas)
+    ids = {r['chave_idempotencia']: r['id'] for r in cursor.fetchall()}
+    for indice, leitura in novas:
+        resultados[indice] = {'indice': indice, 'status': 'inserida', 'id': ids.get(leitura['chave_idempotencia'])}
+
+    gravadas = [l for _, l in novas]
+    estatisticas.registrar_provas_vida(cursor, [l['data_hora'] for l in gravadas])
+    sinais_vitais.atualizar_lote(cursor, [(l['paciente_id'], l['data_hora']) for l in gravadas])
+    versoes.incrementar(cursor, TAG_PROVAS_VIDA, *(versoes.paciente(l['paciente_id']) for l in gravadas))
+    return gravadas
+
+def _gravar_uma_a_uma(conn, cursor, bloco, usuario, resultados):
+    """Regrava um bloco recusado leitura por leitura: só a leitura com problema vira erro."""
+    gravadas = []
+    for item in bloco:
+        try:
+            gravadas += _gravar_bloco(cursor, [item], usuario, resultados)
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"❌ Erro na ingestão em lote: {e}")
+            resultados[item[0]] = {'indice': item[0], 'status': 'erro', 'erro': "Falha ao gravar a leitura; reenvie."}
+    return gravadas
+
+def ingerir(conn, leituras, usuario, tamanho_bloco=TAMANHO_BLOCO):
+    """
+    Valida e grava as leituras em blocos (um commit por bloco). Um bloco que
+    falha é desfeito e regravado leitura por leitura, então só as leituras
+    que o banco recusar voltam como erro.
+    Retorna o resumo com o resultado de cada leitura, na ordem recebida.
+    """
+    inicio = time.perf_counter()
+    agora = datetime.now()
+    resultados = [None] * len(leituras)
+    validas = []
+    for indice, leitura in enumerate(leituras):
+        try:
+            validas.append((indice, validar(leitura, agora)))
+        except LeituraInvalida as e:
+            resultados[indice] = {'indice': indice, 'status': 'erro', 'erro': str(e)}
+
+    pacientes = set()
+    cursor = conn.cursor()
+    try:
+        for i in range(0, len(validas), tamanho_bloco):
+            bloco = validas[i:i + tamanho_bloco]
+            try:
+                gravadas = _gravar_bloco(cursor, bloco, usuario, resultados)
+                conn.commit()
+            except Exception as e:
+                conn.rollback()
+                print(f"⚠️ Bloco recusado na ingestão em lote ({e}); gravando leitura por leitura.")
+                gravadas = _gravar_uma_a_uma(conn, cursor, bloco, usuario, resultados)
+            pacientes.update(l['paciente_id'] for l in gravadas)
+            for leitura in gravadas:
+                triagem.fila.medir(leitura['paciente_id'], leitura['data_hora'])
+    finally:
+        cursor.close()
+
+    segundos = time.perf_counter() - inicio
+    contagem = {'inserida': 0, 'duplicada': 0, 'erro': 0}
+    for r in resultados:
+        contagem[r['status']] += 1
+    return {
+        'recebidas': len(leituras),
+        'inseridas': contagem['inserida'],
+        'duplicadas': contagem['duplicada'],
+        'erros': contagem['erro'],
+        'pacientes': sorted(pacientes),
+        'segundos': round(segundos, 3),
+        'linhas_por_segundo': round(contagem['inserida'] / segundos, 1) if segundos else 0.0,
+        'resultados': resultados,
+    }
@@ -0,0 +1,269 @@
+"""
+Instrumentação por requisição e endpoint /metrics (formato Prometheus).
+
+Para cada requisição são medidos:
+- latência total da rota (antes/depois da view, incluindo erros);
+- tempo para obter a conexão do pool;
+- quantidade e tempo total das consultas SQL, e a mais lenta delas
+  (o cursor de get_db_connection é embrulhado por CursorInstrumentado);
+- tempo de renderização de cada template.
+
+Requisições acima de METRICAS_CONFIG['limite_lenta'] segundos vão para o log
+de requisições lentas, com a consulta mais lenta (só o SQL, sem os
+parâmetros, que podem ter dados de pacientes).
+
+As métricas ficam em memória, por processo. /metrics é liberado para admins
+logados e para o coletor do Prometheus que mandar o token de
+METRICAS_CONFIG['token'] (authorization: credentials no scrape_config, vira
+"Authorization: Bearer <token>"). Sem token configurado, só admins. O IP de
+origem não conta: atrás de um proxy reverso toda requisição chega de
+127.0.0.1.
+"""
+import hmac
+import logging
+import threading
+import time
+
+from flask import before_render_template, g, got_request_exception, request, template_rendered
+
+METRICAS_CONFIG = {
+    "limite_lenta": 0.5,                        # segundos
+    "arquivo_log": "requisicoes_lentas.log",
+    "token": None,                              # token do coletor; None = só admins
+    "tamanho_sql_log": 500                      # caracteres do SQL no log
+}
+
+BUCKETS_TEMPO = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+BUCKETS_CONSULTAS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+
+log_lentas = logging.getLogger('hospitalar.lentas')
+
+# ==============================================================================
+# TIPOS DE MÉTRICA
+# ==============================================================================
+
+def _rotulos(nomes, valores):
+    if not nomes:
+        return ''
+    pares = ','.join(f'{n}="{str(v).replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"'
+                     for n, v in zip(nomes, valores))
+    return '{' + pares + '}'
+
+class Contador:
+    def __init__(self, nome, ajuda, rotulos=()):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, tuple(rotulos)
+        self._valores = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *rotulos, valor=1):
+        with self._lock:
+            self._valores[rotulos] = self._valores.get(rotulos, 0) + valor
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} counter"]
+        with self._lock:
+            for rotulos, valor in sorted(self._valores.items()):
+                linhas.append(f"{self.nome}{_rotulos(self.rotulos, rotulos)} {valor}")
+        return linhas
+
+class Histograma:
+    def __init__(self, nome, ajuda, rotulos=(), buckets=BUCKETS_TEMPO):
+        self.nome, self.ajuda, self.rotulos = nome, ajuda, tuple(rotulos)
+        self.buckets = tuple(buckets)
+        self._series = {}   # rotulos -> [contagens por bucket, soma, total]
+        self._lock = threading.Lock()
+
+    def observar(self, valor, *rotulos):
+        with self._lock:
+            serie = self._series.get(rotulos)
+            if serie is None:
+                serie = self._series[rotulos] = [[0] * len(self.buckets), 0.0, 0]
+            for i, limite in enumerate(self.buckets):
+                if valor <= limite:
+                    serie[0][i] += 1
+                    break
+            serie[1] += valor
+            serie[2] += 1
+
+    def exportar(self):
+        linhas = [f"# HELP {self.nome} {self.ajuda}", f"# TYPE {self.nome} histogram"]
+        nomes_le = self.rotulos + ('le',)
+        with self._lock:
+            for rotulos, (contagens, soma, total) in sorted(self._series.items()):
+                acumulado = 0
+                for limite, n in zip(self.buckets, contagens):
+                    acumulado += n
+                    linhas.append(f"{self.nome}_bucket{_rotulos(nomes_le, rotulos + (limite,))} {acumulado}")
+                linhas.append(f"{self.nome}_bucket{_rotulos(nomes_le, rotulos + ('+Inf',))} {total}")
+                linhas.append(f"{self.nome}_sum{_rotulos(self.rotulos, rotulos)} {soma:.6f}")
+                linhas.append(f"{self.nome}_count{_rotulos(self.rotulos, rotulos)} {total}")
+        return linhas
+
+# ==============================================================================
+# MÉTRICAS DO APP
+# ==============================================================================
+
+requisicoes = Contador('hospitalar_http_requisicoes_total', 'Requisições atendidas.', ('rota', 'metodo', 'status'))
+erros = Contador('hospitalar_http_excecoes_total', 'Exceções não tratadas nas rotas.', ('rota',))
+duracao = Histograma('hospitalar_http_duracao_segundos', 'Latência das rotas.', ('rota', 'metodo'))
+consultas = Histograma('hospitalar_sql_consultas_por_requisicao', 'Consultas SQL por requisição.', ('rota',), BUCKETS_CONSULTAS)
+tempo_sql = Histograma('hospitalar_sql_duracao_segundos', 'Tempo total de SQL por requisição.', ('rota',))
+espera_conexao = Histograma('hospitalar_pool_espera_segundos', 'Tempo para obter uma conexão do pool.')
+tempo_template = Histograma('hospitalar_template_duracao_segundos', 'Tempo de renderização dos templates.', ('template',))
+
+TODAS = [requisicoes, erros, duracao, consultas, tempo_sql, espera_conexao, tempo_template]
+
+def _estado():
+    """Acumuladores da requisição atual (em g)."""
+    estado = g.get('metricas')
+    if estado is None:
+        estado = g.metricas = {'sql_n': 0, 'sql_tempo': 0.0, 'sql_lenta': (0.0, None),
+                               'conexao': 0.0, 'template': 0.0, 'templates': {}}
+    return estado
+
+def registrar_sql(segundos, sql):
+    try:
+        estado = _estado()
+    except RuntimeError:  # fora de requisição (CLI, scripts)
+        return
+    estado['sql_n'] += 1
+    estado['sql_tempo'] += segundos
+    if segundos > estado['sql_lenta'][0]:
+        estado['sql_lenta'] = (segundos, sql)
+
+def registrar_espera_conexao(segundos):
+    espera_conexao.observar(segundos)
+    try:
+        _estado()['conexao'] += segundos
+    except RuntimeError:
+        pass
+
+# ==============================================================================
+# CURSOR E CONEXÃO INSTRUMENTADOS
+# ==============================================================================
+
+class CursorInstrumentado:
+    """Mede execute/executemany; o resto é repassado ao cursor original."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _medir(self, metodo, sql, args):
+        inicio = time.perf_counter()
+        try:
+            return metodo(sql, args)
+        finally:
+            registrar_sql(time.perf_counter() - inicio, sql)
+
+    def execute(self, sql, args=None):
+        return self._medir(self._cursor.execute, sql, args)
+
+    def executemany(self, sql, args):
+        return self._medir(self._cursor.executemany, sql, args)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+
+    def __getattr__(self, nome):
+        return getattr(self._cursor, nome)
+
+class ConexaoInstrumentada:
+    """Conexão do pool cujos cursores são CursorInstrumentado."""
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def cursor(self, *args, **kwargs):
+        return CursorInstrumentado(self._conn.cursor(*args, **kwargs))
+
+    def __getattr__(self, nome):
+        return getattr(self._conn, nome)
+
+def coletor_autorizado(cabecalho):
+    """True se o cabeçalho Authorization traz o token do coletor."""
+    token = METRICAS_CONFIG['token']
+    if not token or not cabecalho or not cabecalho.startswith('Bearer '):
+        return False
+    return hmac.compare_digest(cabecalho[len('Bearer '):].encode(), token.encode())
+
+# ==============================================================================
+# GANCHOS DO FLASK
+# ==============================================================================
+
+def _rota():
+    return request.url_rule.rule if request.url_rule else 'nao_encontrada'
+
+def instalar(app):
+    """Registra os ganchos de medição no app."""
+    if not log_lentas.handlers:
+        handler = logging.FileHandler(METRICAS_CONFIG['arquivo_log'], encoding='utf-8', delay=True)
+        handler.setFormatter(logging.Formatter('%(asctime)s %(message)s'))
+        log_lentas.addHandler(handler)
+        log_lentas.setLevel(logging.INFO)
+        log_lentas.propagate = False
+
+    @app.before_request
+    def _inicio_requisicao():
+        g.metricas_inicio = time.perf_counter()
+        _estado()
+
+    @app.after_request
+    def _status_requisicao(resposta):
+        g.metricas_status = resposta.status_code
+        return resposta
+
+    @app.teardown_request
+    def _fim_requisicao(exc):
+        inicio = g.pop('metricas_inicio', None)
+        if inicio is None:
+            return
+        segundos = time.perf_counter() - inicio
+        estado = _estado()
+        rota = _rota()
+        status = g.get('metricas_status', 500)
+
+        requisicoes.inc(rota, request.method, status)
+        duracao.observar(segundos, rota, request.method)
+        consultas.observar(estado['sql_n'], rota)
+        tempo_sql.observar(estado['sql_tempo'], rota)
+
+        if segundos >= METRICAS_CONFIG['limite_lenta']:
+            tempo_lenta, sql_lenta = estado['sql_lenta']
+            sql_lenta = ' '.join((sql_lenta or '-').split())[:METRICAS_CONFIG['tamanho_sql_log']]
+            log_lentas.info(
+                f"{request.method} {request.path} rota={rota} status={status} total={segundos:.3f}s "
+                f"conexao={estado['conexao']:.3f}s sql={estado['sql_n']}x/{estado['sql_tempo']:.3f}s "
+                f"template={estado['template']:.3f}s mais_lenta={tempo_lenta:.3f}s: {sql_lenta}")
+
+    def _antes_template(sender, template, context, **extra):
+        _estado()['templates'][template.name] = time.perf_counter()
+
+    def _depois_template(sender, template, context, **extra):
+        estado = _estado()
+        inicio = estado['templates'].pop(template.name, None)
+        if inicio is not None:
+            segundos = time.perf_counter() - inicio
+            estado['template'] += segundos
+            tempo_template.observar(segundos, template.name or '-')
+
+    def _excecao(sender, exception, **extra):
+        erros.inc(_rota())
+
+    before_render_template.connect(_antes_template, app, weak=False)
+    template_rendered.connect(_depois_template, app, weak=False)
+    got_request_exception.connect(_excecao, app, weak=False)
+
+def exportar(extras=()):
+    """Texto no formato de exposição do Prometheus. extras = [(nome, ajuda, valor), ...] (gauges)."""
+    linhas = []
+    for metrica in TODAS:
+        linhas.extend(metrica.exportar())
+    for nome, ajuda, valor in extras:
+        linhas.extend([f"# HELP {nome} {ajuda}", f"# TYPE {nome} gauge", f"{nome} {valor}"])
+    return '\n'.join(linhas) + '\n'
@@ -0,0 +1,325 @@
+"""
+Migrações versionadas do schema.
+
+Cada migração tem um número, uma descrição e uma lista de passos (SQL ou
+funções que recebem o cursor). A tabela schema_version guarda as versões já
+aplicadas; quando o banco já está na última versão, migrar() faz só uma
+consulta e retorna.
+
+Os passos são idempotentes (IF NOT EXISTS / checagem no information_schema)
+porque o MySQL faz commit implícito a cada DDL: se uma migração falhar no
+meio, basta corrigir e rodar de novo.
+
+Uso:
+    python migracoes.py            # aplica as migrações pendentes
+    python migracoes.py explain    # confere os planos das consultas quentes
+"""
+import sys
+
+import pymysql.cursors
+
+import arquivamento
+import estatisticas
+import estoque_servico
+import sinais_vitais
+import ceps
+import tarefas
+import versoes
+
+# ==============================================================================
+# PASSOS AUXILIARES
+# ==============================================================================
+
+def _existe_coluna(cursor, tabela, coluna):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() AND LOWER(TABLE_NAME) = LOWER(%s) AND COLUMN_NAME = %s
+    """, (tabela, coluna))
+    return cursor.fetchone() is not None
+
+def _existe_indice(cursor, tabela, indice):
+    cursor.execute("""
+        SELECT 1 FROM information_schema.STATISTICS
+        WHERE TABLE_SCHEMA = DATABASE() AND LOWER(TABLE_NAME) = LOWER(%s) AND INDEX_NAME = %s
+    """, (tabela, indice))
+    return cursor.fetchone() is not None
+
+def coluna(tabela, nome, definicao):
+    def passo(cursor):
+        if not _existe_coluna(cursor, tabela, nome):
+            cursor.execute(f"ALTER TABLE {tabela} ADD COLUMN {nome} {definicao}")
+    return passo
+
+def alterar_coluna(tabela, nome, definicao):
+    def passo(cursor):
+        if _existe_coluna(cursor, tabela, nome):
+            cursor.execute(f"ALTER TABLE {tabela} MODIFY {nome} {definicao}")
+    return passo
+
+def indice(tabela, nome, colunas, tipo='', opcoes=''):
+    def passo(cursor):
+        if not _existe_indice(cursor, tabela, nome):
+            cursor.execute(f"CREATE {tipo} INDEX {nome} ON {tabela} ({colunas}) {opcoes}")
+    return passo
+
+# ==============================================================================
+# MIGRAÇÕES (nunca altere uma migração já publicada; crie uma nova)
+# ==============================================================================
+
+MIGRACOES = [
+    (1, "Tabelas iniciais", [
+        """
+        CREATE TABLE IF NOT EXISTS Usuarios (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nome_completo VARCHAR(100),
+            usuario VARCHAR(50) NOT NULL UNIQUE,
+            senha VARCHAR(255) NOT NULL,
+            data_nascimento DATE,
+            nacionalidade VARCHAR(50),
+            nivel_acesso ENUM('admin', 'tecnico', 'enfermeiro') NOT NULL
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Pacientes (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nome VARCHAR(100) NOT NULL,
+            data_nascimento DATE,
+            cpf VARCHAR(11) UNIQUE,
+            cep VARCHAR(10),
+            endereco VARCHAR(255),
+            bairro VARCHAR(100),
+            data_entrada DATETIME NOT NULL,
+            nome_baixa VARCHAR(100),
+            data_baixa DATETIME,
+            procedimento TEXT,
+            status ENUM('internado', 'alta') DEFAULT 'internado',
+            usuario_internacao VARCHAR(50),
+            cid_10 VARCHAR(10),
+            observacoes_entrada TEXT,
+            prioridade_atencao ENUM('verde', 'amarelo', 'vermelho') DEFAULT 'verde'
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS ProvasDeVida (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            paciente_id INT NOT NULL,
+            data_hora DATETIME NOT NULL,
+            pressao_arterial VARCHAR(20),
+            glicose DECIMAL(6, 2),
+            saturacao DECIMAL(4, 2),
+            batimentos_cardiacos INT,
+            quem_efetuou VARCHAR(100),
+            observacoes TEXT,
+            FOREIGN KEY (paciente_id) REFERENCES Pacientes(id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS Estoque (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nome_medicamento VARCHAR(100) NOT NULL UNIQUE,
+            quantidade INT NOT NULL,
+            unidade VARCHAR(10),
+            data_ultima_entrada DATETIME
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS AdministracaoMedicamentos (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            paciente_id INT NOT NULL,
+            medicamento_nome VARCHAR(100) NOT NULL,
+            quantidade_administrada DECIMAL(6, 2) NOT NULL,
+            se_necessario BOOLEAN,
+            data_hora DATETIME NOT NULL,
+            FOREIGN KEY (paciente_id) REFERENCES Pacientes(id)
+        )
+        """,
+    ]),
+    (2, "Colunas e tabelas usadas pelo app.py que faltavam no setup", [
+        "ALTER TABLE Usuarios MODIFY nivel_acesso ENUM('admin', 'tecnico', 'enfermeiro', 'estagiario') NOT NULL",
+        "ALTER TABLE Pacientes MODIFY data_baixa DATETIME",
+        coluna('ProvasDeVida', 'temperatura', "DECIMAL(4, 1)"),
+        coluna('ProvasDeVida', 'evolucao', "TEXT"),
+        coluna('Estoque', 'usuario_ultima_alteracao', "VARCHAR(50)"),
+        """
+        CREATE TABLE IF NOT EXISTS EstoqueBaixas (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            nome_medicamento VARCHAR(100) NOT NULL,
+            quantidade_removida DECIMAL(10, 2) NOT NULL,
+            unidade VARCHAR(10),
+            motivo VARCHAR(255),
+            usuario_baixa VARCHAR(50),
+            data_hora DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+    ]),
+    (3, "Tabelas de estatísticas do dashboard", [
+        estatisticas.criar_tabelas,
+        estatisticas.reconstruir_tabelas,
+    ]),
+    (4, "Índices das consultas das listas, do prontuário e dos relatórios", [
+        # /pacientes: status = 'internado' ORDER BY nome, id
+        indice('Pacientes', 'idx_pacientes_status_nome', 'status, nome'),
+        # /arquivo: status = 'alta' ORDER BY data_baixa DESC, id DESC
+        indice('Pacientes', 'idx_pacientes_status_baixa', 'status, data_baixa'),
+        # reconstrução de estatísticas e relatórios por período de entrada
+        indice('Pacientes', 'idx_pacientes_entrada', 'data_entrada'),
+        # /provas_vida_geral: ORDER BY data_hora DESC, id DESC (+ faixa de datas)
+        indice('ProvasDeVida', 'idx_pv_data_hora', 'data_hora'),
+        # detalhes_prontuario: paciente_id = ? ORDER BY data_hora DESC
+        indice('ProvasDeVida', 'idx_pv_paciente_data', 'paciente_id, data_hora'),
+        # /estoque/historico_baixas e saída de medicamentos por período
+        indice('EstoqueBaixas', 'idx_baixas_data_med', 'data_hora, nome_medicamento'),
+    ]),
+    (5, "Busca de pacientes por nome (n-gram), CPF e CEP", [
+        # CEP é gravado com máscara; a coluna gerada guarda só os dígitos
+        coluna('Pacientes', 'cep_digitos',
+               "VARCHAR(10) AS (REPLACE(REPLACE(REPLACE(cep, '-', ''), '.', ''), ' ', '')) STORED"),
+        indice('Pacientes', 'idx_pacientes_cep', 'cep_digitos'),
+        indice('Pacientes', 'idx_pacientes_nome', 'nome'),
+        # Busca por trecho do nome; a collation *_ai_ci ignora acentos e maiúsculas
+        indice('Pacientes', 'ft_pacientes_nome', 'nome', tipo='FULLTEXT', opcoes='WITH PARSER ngram'),
+    ]),
+    (6, "Razão de movimentos do estoque com checkpoints de saldo", [
+        estoque_servico.criar_tabelas,
+        estoque_servico.semear_razao,
+    ]),
+    (7, "Pressão arterial numérica e séries de sinais vitais por hora/dia", [
+        coluna('ProvasDeVida', 'pressao_sistolica', "SMALLINT"),
+        coluna('ProvasDeVida', 'pressao_diastolica', "SMALLINT"),
+        sinais_vitais.criar_tabelas,
+        sinais_vitais.preencher_pressao,
+        sinais_vitais.reconstruir_tabelas,
+    ]),
+    (8, "Chave de idempotência na ingestão em lote de provas de vida", [
+        coluna('ProvasDeVida', 'chave_idempotencia', "VARCHAR(64) NULL"),
+        indice('ProvasDeVida', 'uq_pv_chave_idempotencia', 'chave_idempotencia', tipo='UNIQUE'),
+    ]),
+    (9, "Tabela local de CEPs semeada com os endereços dos pacientes", [
+        ceps.criar_tabela,
+        ceps.semear_de_pacientes,
+    ]),
+    (10, "Tabelas de arquivo para pacientes com alta antiga e seu histórico", [
+        arquivamento.criar_tabelas,
+    ]),
+    (11, "Fila de tarefas em segundo plano (relatórios e manutenção)", [
+        tarefas.criar_tabela,
+    ]),
+    (12, "Versões de coleções e prontuários para GET condicional", [
+        versoes.criar_tabela,
+    ]),
+    (13, "Saturação de 100% (DECIMAL(4, 2) só ia até 99,99)", [
+        alterar_coluna('ProvasDeVida', 'saturacao', "DECIMAL(5, 2)"),
+        alterar_coluna('ProvasDeVidaArquivo', 'saturacao', "DECIMAL(5, 2)"),
+    ]),
+    (14, "Saldo do estoque com doses fracionadas (mesma escala da razão)", [
+        alterar_coluna('Estoque', 'quantidade', "DECIMAL(12, 2) NOT NULL"),
+    ]),
+]
+
+VERSAO_ATUAL = MIGRACOES[-1][0]
+
+# Evita repetir até a consulta de versão dentro do mesmo processo
+_verificado = False
+
+def versao_do_banco(cursor):
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            versao INT PRIMARY KEY,
+            descricao VARCHAR(255),
+            aplicada_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    cursor.execute("SELECT IFNULL(MAX(versao), 0) AS versao FROM schema_version")
+    linha = cursor.fetchone()
+    return linha['versao'] if isinstance(linha, dict) else linha[0]
+
+def migrar(conn):
+    """Aplica as migrações pendentes. Retorna a lista de versões aplicadas."""
+    global _verificado
+    if _verificado:
+        return []
+
+    cursor = conn.cursor()
+    aplicadas = []
+    try:
+        versao = versao_do_banco(cursor)
+        for numero, descricao, passos in MIGRACOES:
+            if numero <= versao:
+                continue
+            print(f"  - Aplicando migração {numero}: {descricao}")
+            for passo in passos:
+                if callable(passo):
+                    passo(cursor)
+                else:
+                    cursor.execute(passo)
+            cursor.execute("INSERT INTO schema_version (versao, descricao) VALUES (%s, %s)", (numero, descricao))
+            conn.commit()
+            aplicadas.append(numero)
+        _verificado = True
+    finally:
+        cursor.close()
+    return aplicadas
+
+# ==============================================================================
+# CHECAGEM DE PLANOS (EXPLAIN)
+# ==============================================================================
+
+# Consultas quentes do app (mesma forma das rotas). Com poucos dados o
+# otimizador pode preferir varrer a tabela mesmo com índice; por isso só é
+# considerado erro o full scan sem nenhum índice candidato (possible_keys).
+CONSULTAS_QUENTES = [
+    ("pacientes internados",
+     "SELECT * FROM Pacientes WHERE status = 'internado' ORDER BY nome, id LIMIT 51", ()),
+    ("arquivo de altas",
+     "SELECT * FROM Pacientes WHERE status = 'alta' ORDER BY data_baixa DESC, id DESC LIMIT 51", ()),
+    ("provas de vida do paciente",
+     "SELECT * FROM ProvasDeVida WHERE paciente_id = %s ORDER BY data_hora DESC", (1,)),
+    ("provas de vida por período",
+     """SELECT pv.*, p.nome FROM ProvasDeVida pv JOIN Pacientes p ON pv.paciente_id = p.id
+        WHERE pv.data_hora >= NOW() - INTERVAL 30 DAY ORDER BY pv.data_hora DESC, pv.id DESC LIMIT 51""", ()),
+    ("histórico de baixas por período",
+     "SELECT * FROM EstoqueBaixas WHERE data_hora >= NOW() - INTERVAL 30 DAY ORDER BY data_hora DESC, id DESC LIMIT 51", ()),
+    ("busca de paciente por prefixo do nome",
+     "SELECT id, nome FROM Pacientes WHERE nome LIKE %s ORDER BY nome LIMIT 10", ('mar%',)),
+    ("busca de paciente por CEP",
+     "SELECT id, nome FROM Pacientes WHERE cep_digitos = %s LIMIT 10", ('92511565',)),
+    ("série horária de sinais vitais",
+     "SELECT * FROM SinaisVitaisHora WHERE paciente_id = %s AND inicio >= NOW() - INTERVAL 7 DAY ORDER BY inicio", (1,)),
+    ("altas por período (estatísticas)",
+     "SELECT SUM(altas) FROM EstatisticasDiarias WHERE dia >= CURDATE() - INTERVAL 7 DAY", ()),
+    ("saída de medicamentos por período (estatísticas)",
+     "SELECT nome_medicamento, SUM(total) FROM EstatisticasMedicamentos WHERE dia >= CURDATE() - INTERVAL 30 DAY GROUP BY nome_medicamento", ()),
+]
+
+def verificar_planos(conn):
+    """Roda EXPLAIN nas consultas quentes. Retorna a lista de problemas (vazia = ok)."""
+    problemas = []
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        for descricao, sql, params in CONSULTAS_QUENTES:
+            cursor.execute("EXPLAIN " + sql, params)
+            for linha in cursor.fetchall():
+                if linha['type'] == 'ALL' and not linha['possible_keys']:
+                    problemas.append(f"{descricao}: full scan em '{linha['table']}' sem índice utilizável")
+    finally:
+        cursor.close()
+    return problemas
+
+if __name__ == '__main__':
+    from database import create_db_connection
+    conn = create_db_connection(pymysql.cursors.DictCursor)
+    if conn is None:
+        sys.exit(1)
+    try:
+        if len(sys.argv) > 1 and sys.argv[1] == 'explain':
+            problemas = verificar_planos(conn)
+            for p in problemas:
+                print(f"❌ {p}")
+            if problemas:
+                sys.exit(1)
+            print("✅ Todas as consultas quentes usam índice.")
+        else:
+            aplicadas = migrar(conn)
+            print(f"✅ Schema na versão {VERSAO_ATUAL}" + (f" (aplicadas: {aplicadas})." if aplicadas else "."))
+    finally:
+        conn.close()
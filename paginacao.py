@@ -0,0 +1,120 @@
+"""
+Paginação por cursor (keyset) para as listas longas.
+
+Em vez de OFFSET (que relê todas as linhas anteriores), cada página guarda
+o par (coluna_de_ordem, id) do primeiro e do último item. A próxima página
+busca apenas "depois" desse par, usando o índice da coluna de ordem.
+"""
+import base64
+import json
+
+from flask import request, url_for
+
+POR_PAGINA_PADRAO = 50
+POR_PAGINA_MAXIMO = 200
+
+def ler_por_pagina(args):
+    try:
+        valor = int(args.get('por_pagina', POR_PAGINA_PADRAO))
+    except (TypeError, ValueError):
+        valor = POR_PAGINA_PADRAO
+    return max(1, min(valor, POR_PAGINA_MAXIMO))
+
+def codificar_cursor(valor, item_id):
+    bruto = json.dumps([str(valor), item_id]).encode()
+    return base64.urlsafe_b64encode(bruto).decode().rstrip('=')
+
+def decodificar_cursor(token):
+    """Retorna (valor, id) ou None se o token for inválido."""
+    if not token:
+        return None
+    try:
+        bruto = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4))
+        valor, item_id = json.loads(bruto)
+        return valor, int(item_id)
+    except (ValueError, TypeError):
+        return None
+
+def escapar_like(texto):
+    return texto.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+def filtro_periodo(coluna, args, where, params):
+    """Aplica ?de=AAAA-MM-DD&ate=AAAA-MM-DD como faixa (usa o índice da coluna)."""
+    if args.get('de'):
+        where.append(f"{coluna} >= %s")
+        params.append(args['de'])
+    if args.get('ate'):
+        where.append(f"{coluna} < %s + INTERVAL 1 DAY")
+        params.append(args['ate'])
+
+def filtro_prefixo(coluna, valor, where, params):
+    valor = (valor or '').strip()
+    if valor:
+        where.append(f"{coluna} LIKE %s")
+        params.append(escapar_like(valor) + '%')
+
+def filtro_igual(coluna, valor, where, params):
+    if valor:
+        where.append(f"{coluna} = %s")
+        params.append(valor)
+
+def paginar(cursor, sql_select, where, params, coluna_ordem, coluna_id,
+            chave_ordem, chave_id='id', decrescente=True, args=None):
+    """
+    Executa sql_select (sem WHERE/ORDER BY) paginado por (coluna_ordem, coluna_id).
+    chave_ordem/chave_id são os nomes desses campos no dict retornado.
+
+    sql_select também pode ser uma lista de SELECTs com as mesmas colunas (ex.:
+    tabela quente e arquivo): cada um é paginado com o próprio índice e as
+    páginas são combinadas com UNION ALL.
+
+    Retorna um dict com 'itens', 'proxima' e 'anterior' (URLs ou None).
+    """
+    args = request.args if args is None else args
+    limite = ler_por_pagina(args)
+    depois = decodificar_cursor(args.get('depois'))
+    antes = None if depois else decodificar_cursor(args.get('antes'))
+
+    where = list(where)
+    params = list(params)
+
+    # Voltando uma página: inverte a ordem na consulta e desinverte no Python
+    voltando = antes is not None
+    ordem_desc = decrescente != voltando
+    marco = depois or antes
+    if marco:
+        op = '<' if ordem_desc else '>'
+        where.append(f"({coluna_ordem} {op} %s OR ({coluna_ordem} = %s AND {coluna_id} {op} %s))")
+        params.extend([marco[0], marco[0], marco[1]])
+
+    direcao = 'DESC' if ordem_desc else 'ASC'
+    filtro = (" WHERE " + " AND ".join(where)) if where else ""
+    ordem = f" ORDER BY {coluna_ordem} {direcao}, {coluna_id} {direcao} LIMIT %s"
+    if isinstance(sql_select, str):
+        sql = sql_select + filtro + ordem
+        params.append(limite + 1)
+    else:
+        sql = " UNION ALL ".join(f"({s}{filtro}{ordem})" for s in sql_select)
+        sql += f" ORDER BY {chave_ordem} {direcao}, {chave_id} {direcao} LIMIT %s"
+        params = (params + [limite + 1]) * len(sql_select) + [limite + 1]
+
+    cursor.execute(sql, params)
+    itens = list(cursor.fetchall())
+    tem_mais = len(itens) > limite
+    itens = itens[:limite]
+    if voltando:
+        itens.reverse()
+
+    def link(nome, item):
+        base = {k: v for k, v in args.items() if k not in ('depois', 'antes') and v}
+        base[nome] = codificar_cursor(item[chave_ordem], item[chave_id])
+        return url_for(request.endpoint, **request.view_args, **base)
+
+    proxima = anterior = None
+    if itens:
+        if tem_mais or voltando:
+            proxima = link('depois', itens[-1])
+        if (tem_mais and voltando) or depois:
+            anterior = link('antes', itens[0])
+
+    return {'itens': itens, 'proxima': proxima, 'anterior': anterior, 'por_pagina': limite}
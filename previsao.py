@@ -0,0 +1,213 @@
+"""
+Previsão de consumo de medicamentos e alertas de reposição.
+
+"Estoque baixo" era quantidade < 100 para todos os remédios: um item parado
+com 10 unidades aparecia como problema e um que sai 40 por dia com 120 não.
+Aqui cada medicamento tem o consumo diário medido em EstoqueBaixas nos
+últimos PREVISAO_CONFIG['janela_dias'] dias, e a partir dele:
+
+- consumo médio (o maior entre a média da janela e a dos últimos
+  'janela_curta' dias, para reagir logo a um aumento);
+- desvio padrão diário;
+- dias de cobertura = saldo / consumo médio;
+- ponto de reposição = consumo × prazo + z × desvio × √prazo
+  (estoque de segurança para o prazo de entrega 'prazo_reposicao').
+
+Status: 'esgotado' (saldo zero), 'ruptura' (acaba antes de uma reposição
+pedida hoje chegar), 'repor' (abaixo do ponto de reposição), 'ok' e
+'parado' (sem consumo na janela).
+
+As saídas ficam numa matriz medicamentos × dias, carregada uma vez por dia
+(uma consulta agrupada pelo idx_baixas_data_med). Depois disso, cada
+atualização relê só a coluna de hoje e recalcula todas as estatísticas
+numa passada vetorizada com NumPy. Sem NumPy, o mesmo cálculo roda em
+Python puro (mais lento em catálogos grandes). O resultado fica no cache
+do app com a tag de estoque: uma baixa invalida e a próxima leitura faz a
+atualização incremental.
+"""
+import math
+import threading
+from datetime import date, datetime, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # opcional
+    np = None
+
+from cache import cache, TAG_ESTOQUE
+
+PREVISAO_CONFIG = {
+    "janela_dias": 28,       # histórico usado nas estatísticas (inclui hoje)
+    "janela_curta": 7,       # média recente, para tendência de alta
+    "prazo_reposicao": 7,    # dias entre o pedido e a chegada
+    "z_seguranca": 1.65,     # ~95% de chance de não faltar durante o prazo
+    "ttl": 600,              # segundos; baixas invalidam antes disso
+    "horizonte_dias": 3650,  # cobertura acima disso não ganha data de ruptura
+}
+
+STATUS = ('esgotado', 'ruptura', 'repor', 'ok', 'parado')
+
+def _chave(nome):
+    # Mesma regra do estoque_servico: a collation do MySQL ignora maiúsculas
+    return str(nome).strip().casefold()
+
+class PrevisaoConsumo:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dia = None         # último dia da matriz (hoje na última atualização)
+        self._nomes = []         # chave de cada linha da matriz
+        self._linhas = {}        # chave -> índice
+        self._matriz = None      # saídas por dia: linhas = medicamentos, colunas = dias (a última é hoje)
+
+    # --------------------------------------------------------------------------
+    # Carga
+    # --------------------------------------------------------------------------
+
+    def _nova_matriz(self, linhas, dias):
+        if np is not None:
+            return np.zeros((linhas, dias))
+        return [[0.0] * dias for _ in range(linhas)]
+
+    def _garantir_linhas(self, chaves):
+        novas = [c for c in chaves if c not in self._linhas]
+        for chave in novas:
+            self._linhas[chave] = len(self._nomes)
+            self._nomes.append(chave)
+        if novas:
+            extra = self._nova_matriz(len(novas), PREVISAO_CONFIG['janela_dias'])
+            self._matriz = np.vstack([self._matriz, extra]) if np is not None else self._matriz + extra
+
+    def _somar(self, linhas_banco, coluna_de):
+        """Soma as saídas (nome, dia, total) nas células da matriz."""
+        i, j, v = [], [], []
+        for linha in linhas_banco:
+            coluna = coluna_de(linha['dia'])
+            if coluna is not None and _chave(linha['nome_medicamento']) in self._linhas:
+                i.append(self._linhas[_chave(linha['nome_medicamento'])])
+                j.append(coluna)
+                v.append(float(linha['total']))
+        if np is not None:
+            np.add.at(self._matriz, (np.array(i, dtype=int), np.array(j, dtype=int)), v)
+        else:
+            for a, b, valor in zip(i, j, v):
+                self._matriz[a][b] += valor
+
+    def _carregar(self, cursor, hoje):
+        dias = PREVISAO_CONFIG['janela_dias']
+        inicio = hoje - timedelta(days=dias - 1)
+        cursor.execute("""
+            SELECT DATE(data_hora) AS dia, nome_medicamento, SUM(quantidade_removida) AS total
+            FROM EstoqueBaixas WHERE data_hora >= %s
+            GROUP BY DATE(data_hora), nome_medicamento
+        """, (inicio,))
+        linhas = cursor.fetchall()
+        self._matriz = self._nova_matriz(len(self._nomes), dias)
+        self._somar(linhas, lambda dia: (dia - inicio).days if 0 <= (dia - inicio).days < dias else None)
+        self._dia = hoje
+
+    def _atualizar_hoje(self, cursor, hoje):
+        """Relê só a coluna de hoje (a consulta cobre as baixas de hoje pelo índice de data)."""
+        cursor.execute("""
+            SELECT nome_medicamento, SUM(quantidade_removida) AS total
+            FROM EstoqueBaixas WHERE data_hora >= %s GROUP BY nome_medicamento
+        """, (datetime.combine(hoje, datetime.min.time()),))
+        linhas = [dict(linha, dia=hoje) for linha in cursor.fetchall()]
+        if np is not None:
+            self._matriz[:, -1] = 0
+        else:
+            for linha in self._matriz:
+                linha[-1] = 0.0
+        self._somar(linhas, lambda dia: PREVISAO_CONFIG['janela_dias'] - 1)
+
+    def atualizar(self, cursor, hoje=None):
+        """Lê o catálogo e as saídas novas; retorna o resultado da previsão."""
+        hoje = hoje or date.today()
+        cursor.execute("SELECT id, nome_medicamento, quantidade, unidade FROM Estoque ORDER BY nome_medicamento")
+        catalogo = cursor.fetchall()
+        with self._lock:
+            if self._matriz is None:
+                self._matriz = self._nova_matriz(0, PREVISAO_CONFIG['janela_dias'])
+            novos = [c for c in (_chave(i['nome_medicamento']) for i in catalogo) if c not in self._linhas]
+            self._garantir_linhas(_chave(i['nome_medicamento']) for i in catalogo)
+            if self._dia != hoje or novos:
+                # Virada do dia (ou item novo com histórico de outro nome): recarrega a janela
+                self._carregar(cursor, hoje)
+            else:
+                self._atualizar_hoje(cursor, hoje)
+            return self._calcular(catalogo, hoje)
+
+    # --------------------------------------------------------------------------
+    # Cálculo
+    # --------------------------------------------------------------------------
+
+    def _estatisticas(self, indices):
+        """(consumo diário, desvio) das linhas pedidas, na mesma ordem."""
+        curta = PREVISAO_CONFIG['janela_curta']
+        if np is not None:
+            m = self._matriz[np.array(indices, dtype=int)] if indices else np.zeros((0, self._matriz.shape[1]))
+            consumo = np.maximum(m.mean(axis=1), m[:, -curta:].mean(axis=1))
+            desvio = m.std(axis=1, ddof=1) if m.shape[1] > 1 else np.zeros(len(indices))
+            return consumo.tolist(), desvio.tolist()
+        consumo, desvio = [], []
+        for indice in indices:
+            serie = self._matriz[indice]
+            media = sum(serie) / len(serie)
+            consumo.append(max(media, sum(serie[-curta:]) / len(serie[-curta:])))
+            desvio.append(math.sqrt(sum((x - media) ** 2 for x in serie) / (len(serie) - 1)) if len(serie) > 1 else 0.0)
+        return consumo, desvio
+
+    def _calcular(self, catalogo, hoje):
+        prazo = PREVISAO_CONFIG['prazo_reposicao']
+        z = PREVISAO_CONFIG['z_seguranca']
+        consumo, desvio = self._estatisticas([self._linhas[_chave(i['nome_medicamento'])] for i in catalogo])
+
+        itens = []
+        for item, taxa, sigma in zip(catalogo, consumo, desvio):
+            saldo = float(item['quantidade'] or 0)
+            ponto = taxa * prazo + z * sigma * math.sqrt(prazo)
+            cobertura = saldo / taxa if taxa > 0 else None
+            if saldo <= 0:
+                status = 'esgotado'
+            elif taxa <= 0:
+                status = 'parado'
+            elif cobertura < prazo:
+                status = 'ruptura'
+            elif saldo <= ponto:
+                status = 'repor'
+            else:
+                status = 'ok'
+            itens.append({
+                'id': item['id'],
+                'nome_medicamento': item['nome_medicamento'],
+                'unidade': item['unidade'],
+                'saldo': saldo,
+                'consumo_diario': round(taxa, 2),
+                'desvio_diario': round(sigma, 2),
+                'dias_cobertura': round(cobertura, 1) if cobertura is not None else None,
+                # Saldo enorme para um consumo ínfimo passaria do maior date possível
+                'data_ruptura': (hoje + timedelta(days=int(cobertura))).isoformat()
+                                if cobertura is not None and cobertura <= PREVISAO_CONFIG['horizonte_dias'] else None,
+                'ponto_reposicao': math.ceil(ponto),
+                # Pedido que leva o saldo de volta ao ponto de reposição mais um prazo de consumo
+                'sugestao_pedido': max(0, math.ceil(ponto + taxa * prazo - saldo)) if status in ('esgotado', 'ruptura', 'repor') else 0,
+                'status': status,
+            })
+
+        ordem = {s: i for i, s in enumerate(STATUS)}
+        alertas = sorted((i for i in itens if i['status'] in ('esgotado', 'ruptura', 'repor')),
+                         key=lambda i: (ordem[i['status']], i['dias_cobertura'] or 0))
+        return {
+            'calculado_em': datetime.now().strftime('%Y-%m-%d %H:%M'),
+            'parametros': {k: PREVISAO_CONFIG[k] for k in ('janela_dias', 'janela_curta', 'prazo_reposicao', 'z_seguranca')},
+            'itens': itens,
+            'alertas': alertas,
+            'por_nome': {_chave(i['nome_medicamento']): i for i in itens},
+        }
+
+# Instância usada pelo app (o estado incremental é local ao processo)
+previsao = PrevisaoConsumo()
+
+def obter(cursor):
+    """Resultado da previsão, do cache ou atualizado de forma incremental."""
+    return cache.obter_ou_calcular(('previsao_consumo',), lambda: previsao.atualizar(cursor),
+                                   ttl=PREVISAO_CONFIG['ttl'], tags=(TAG_ESTOQUE,))
@@ -0,0 +1,281 @@
+"""
+Séries de sinais vitais por paciente (gráficos de tendência).
+
+A pressão arterial chega como texto livre ('140/90', '14x9', "120/80'") e é
+convertida na escrita para pressao_sistolica/pressao_diastolica. As provas de
+vida são resumidas em duas tabelas por paciente:
+
+- SinaisVitaisHora: um registro por (paciente, hora)
+- SinaisVitaisDia: um registro por (paciente, dia), derivado da tabela horária
+
+Cada sinal guarda mínimo, máximo, soma e quantidade de leituras (a média é
+soma / quantidade). Como mínimo e máximo não podem ser "desfeitos", toda
+escrita recalcula o balde da hora afetada a partir das provas de vida (poucas
+linhas, pelo índice paciente_id + data_hora) e o balde do dia a partir das
+horas. Se as tabelas saírem de sincronia, rode:
+
+    flask --app app reconstruir-sinais
+"""
+import re
+from datetime import datetime, timedelta
+
+import pymysql.cursors
+
+# nome na API -> coluna em ProvasDeVida
+SINAIS = {
+    'pas': 'pressao_sistolica',
+    'pad': 'pressao_diastolica',
+    'glicose': 'glicose',
+    'saturacao': 'saturacao',
+    'bpm': 'batimentos_cardiacos',
+    'temperatura': 'temperatura',
+}
+
+RESOLUCOES = ('bruto', 'hora', 'dia')
+
+# Resolução automática: até 2 dias em leituras brutas, até 45 dias por hora
+LIMITE_BRUTO = timedelta(days=2)
+LIMITE_HORA = timedelta(days=45)
+MAX_PONTOS_BRUTOS = 2000
+
+def _colunas_resumo():
+    return ",\n".join(
+        f"{s}_min DECIMAL(6, 2), {s}_max DECIMAL(6, 2), "
+        f"{s}_soma DECIMAL(12, 2) NOT NULL DEFAULT 0, {s}_n INT NOT NULL DEFAULT 0"
+        for s in SINAIS)
+
+SQL_TABELAS = [
+    f"""
+    CREATE TABLE IF NOT EXISTS SinaisVitaisHora (
+        paciente_id INT NOT NULL,
+        inicio DATETIME NOT NULL,
+        registros INT NOT NULL DEFAULT 0,
+        {_colunas_resumo()},
+        PRIMARY KEY (paciente_id, inicio)
+    )
+    """,
+    f"""
+    CREATE TABLE IF NOT EXISTS SinaisVitaisDia (
+        paciente_id INT NOT NULL,
+        inicio DATE NOT NULL,
+        registros INT NOT NULL DEFAULT 0,
+        {_colunas_resumo()},
+        PRIMARY KEY (paciente_id, inicio)
+    )
+    """,
+]
+
+def criar_tabelas(cursor):
+    for sql in SQL_TABELAS:
+        cursor.execute(sql)
+
+# ==============================================================================
+# PRESSÃO ARTERIAL
+# ==============================================================================
+
+_PRESSAO = re.compile(r'(\d{1,3}(?:[.,]\d+)?)\s*(?:/|x|X|×|por)\s*(\d{1,3}(?:[.,]\d+)?)')
+
+def interpretar_pressao(texto):
+    """
+    '140/90' -> (140, 90). Aceita 'x' como separador e a notação em cmHg
+    ('14x9' -> (140, 90)). Retorna (None, None) se o texto não for uma
+    pressão plausível.
+    """
+    m = _PRESSAO.search(texto or '')
+    if not m:
+        return None, None
+    sistolica, diastolica = (float(v.replace(',', '.')) for v in m.groups())
+    if sistolica < 30:
+        sistolica, diastolica = sistolica * 10, diastolica * 10
+    if not (40 <= sistolica <= 300 and 20 <= diastolica <= 200 and diastolica < sistolica):
+        return None, None
+    return int(round(sistolica)), int(round(diastolica))
+
+# ==============================================================================
+# ATUALIZAÇÃO (chamada pelas rotas de escrita, sem commit próprio)
+# ==============================================================================
+
+def _agregados_brutos():
+    return ", ".join(
+        f"MIN({c}), MAX({c}), IFNULL(SUM({c}), 0), COUNT({c})" for c in SINAIS.values())
+
+def _agregados_hora():
+    return ", ".join(
+        f"MIN({s}_min), MAX({s}_max), SUM({s}_soma), SUM({s}_n)" for s in SINAIS)
+
+def _lista_colunas():
+    return ", ".join(f"{s}_min, {s}_max, {s}_soma, {s}_n" for s in SINAIS)
+
+def _atualizar_hora(cursor, paciente_id, hora):
+    cursor.execute("DELETE FROM SinaisVitaisHora WHERE paciente_id = %s AND inicio = %s", (paciente_id, hora))
+    cursor.execute(f"""
+        INSERT INTO SinaisVitaisHora (paciente_id, inicio, registros, {_lista_colunas()})
+        SELECT paciente_id, %s, COUNT(*), {_agregados_brutos()}
+        FROM ProvasDeVida
+        WHERE paciente_id = %s AND data_hora >= %s AND data_hora < %s
+        GROUP BY paciente_id
+    """, (hora, paciente_id, hora, hora + timedelta(hours=1)))
+
+def _atualizar_dia(cursor, paciente_id, dia):
+    cursor.execute("DELETE FROM SinaisVitaisDia WHERE paciente_id = %s AND inicio = %s", (paciente_id, dia.date()))
+    cursor.execute(f"""
+        INSERT INTO SinaisVitaisDia (paciente_id, inicio, registros, {_lista_colunas()})
+        SELECT paciente_id, %s, SUM(registros), {_agregados_hora()}
+        FROM SinaisVitaisHora
+        WHERE paciente_id = %s AND inicio >= %s AND inicio < %s
+        GROUP BY paciente_id
+    """, (dia.date(), paciente_id, dia, dia + timedelta(days=1)))
+
+def _hora(data_hora):
+    if isinstance(data_hora, str):
+        data_hora = datetime.fromisoformat(data_hora.replace('T', ' '))
+    return data_hora.replace(minute=0, second=0, microsecond=0)
+
+def atualizar(cursor, paciente_id, data_hora):
+    """Recalcula os baldes de hora e de dia que contêm data_hora."""
+    atualizar_lote(cursor, [(paciente_id, data_hora)])
+
+def atualizar_lote(cursor, leituras):
+    """
+    Várias leituras de uma vez: leituras = [(paciente_id, data_hora), ...].
+    Cada hora e cada dia afetados são recalculados uma única vez.
+    """
+    horas = sorted({(p, _hora(d)) for p, d in leituras})
+    for paciente_id, hora in horas:
+        _atualizar_hora(cursor, paciente_id, hora)
+    for paciente_id, dia in sorted({(p, h.replace(hour=0)) for p, h in horas}):
+        _atualizar_dia(cursor, paciente_id, dia)
+
+def remover_paciente(cursor, paciente_id):
+    cursor.execute("DELETE FROM SinaisVitaisHora WHERE paciente_id = %s", (paciente_id,))
+    cursor.execute("DELETE FROM SinaisVitaisDia WHERE paciente_id = %s", (paciente_id,))
+
+# ==============================================================================
+# PREENCHIMENTO E RECONSTRUÇÃO
+# ==============================================================================
+
+def preencher_pressao(cursor):
+    """Converte o texto de pressao_arterial das provas de vida ainda não convertidas."""
+    cursor.execute("""
+        SELECT id, pressao_arterial FROM ProvasDeVida
+        WHERE pressao_sistolica IS NULL AND pressao_arterial IS NOT NULL AND pressao_arterial <> ''
+    """)
+    linhas = cursor.fetchall()
+    valores = []
+    for linha in linhas:
+        pv_id, texto = (linha['id'], linha['pressao_arterial']) if isinstance(linha, dict) else linha
+        sistolica, diastolica = interpretar_pressao(texto)
+        if sistolica is not None:
+            valores.append((sistolica, diastolica, pv_id))
+    for i in range(0, len(valores), 1000):
+        cursor.executemany("UPDATE ProvasDeVida SET pressao_sistolica = %s, pressao_diastolica = %s WHERE id = %s",
+                           valores[i:i + 1000])
+
+def reconstruir_tabelas(cursor):
+    """Recalcula SinaisVitaisHora e SinaisVitaisDia inteiras (sem commit)."""
+    import arquivamento  # importa este módulo; aqui dentro para não virar ciclo
+
+    criar_tabelas(cursor)
+    cursor.execute("DELETE FROM SinaisVitaisHora")
+    cursor.execute("DELETE FROM SinaisVitaisDia")
+    # As séries dos pacientes arquivados continuam disponíveis no prontuário
+    cursor.execute(f"""
+        INSERT INTO SinaisVitaisHora (paciente_id, inicio, registros, {_lista_colunas()})
+        SELECT paciente_id, DATE_FORMAT(data_hora, '%Y-%m-%d %H:00:00') AS hora, COUNT(*), {_agregados_brutos()}
+        FROM {arquivamento.com_arquivo(cursor, 'ProvasDeVida', 'pv')}
+        GROUP BY paciente_id, hora
+    """)
+    cursor.execute(f"""
+        INSERT INTO SinaisVitaisDia (paciente_id, inicio, registros, {_lista_colunas()})
+        SELECT paciente_id, DATE(inicio) AS dia, SUM(registros), {_agregados_hora()}
+        FROM SinaisVitaisHora
+        GROUP BY paciente_id, dia
+    """)
+
+def reconstruir(conn):
+    cursor = conn.cursor()
+    try:
+        preencher_pressao(cursor)
+        reconstruir_tabelas(cursor)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+# ==============================================================================
+# LEITURA
+# ==============================================================================
+
+def escolher_resolucao(de, ate, pedida=None):
+    if pedida in RESOLUCOES:
+        return pedida
+    intervalo = ate - de
+    if intervalo <= LIMITE_BRUTO:
+        return 'bruto'
+    if intervalo <= LIMITE_HORA:
+        return 'hora'
+    return 'dia'
+
+def _numero(valor):
+    return None if valor is None else float(valor)
+
+def serie(cursor, paciente_id, de, ate, resolucao=None):
+    """
+    Série para gráficos entre 'de' e 'ate' (datetimes). Retorna:
+        {'resolucao', 'labels': [...], 'sinais': {'pas': {'min', 'max', 'media'}, ...}}
+    Na resolução 'bruto' min, max e media são a própria leitura.
+    """
+    resolucao = escolher_resolucao(de, ate, resolucao)
+    resultado = {'resolucao': resolucao, 'labels': [],
+                 'sinais': {s: {'min': [], 'max': [], 'media': []} for s in SINAIS}}
+
+    if resolucao == 'bruto':
+        import arquivamento  # importa este módulo; aqui dentro para não virar ciclo
+
+        colunas = ", ".join(f"{c} AS {s}" for s, c in SINAIS.items())
+        tabelas = ['ProvasDeVida']
+        if arquivamento.existe_arquivo(cursor):
+            tabelas.append(arquivamento.TABELAS['ProvasDeVida'])
+        # Paciente arquivado: leituras no arquivo. O filtro vai em cada camada
+        # para as duas usarem o idx_pv_paciente_data.
+        partes = [f"""
+            (SELECT data_hora AS inicio, {colunas} FROM {tabela}
+             WHERE paciente_id = %s AND data_hora >= %s AND data_hora < %s
+             ORDER BY data_hora LIMIT %s)
+        """ for tabela in tabelas]
+        cursor.execute(" UNION ALL ".join(partes) + " ORDER BY inicio LIMIT %s",
+                       (paciente_id, de, ate, MAX_PONTOS_BRUTOS) * len(tabelas) + (MAX_PONTOS_BRUTOS,))
+        for r in cursor.fetchall():
+            resultado['labels'].append(r['inicio'].strftime('%Y-%m-%dT%H:%M'))
+            for s in SINAIS:
+                v = _numero(r[s])
+                for campo in ('min', 'max', 'media'):
+                    resultado['sinais'][s][campo].append(v)
+        return resultado
+
+    tabela, formato = ('SinaisVitaisHora', '%Y-%m-%dT%H:00') if resolucao == 'hora' else ('SinaisVitaisDia', '%Y-%m-%d')
+    if resolucao == 'dia':
+        de, ate = de.date(), ate.date() + timedelta(days=1)
+    cursor.execute(f"""
+        SELECT inicio, {_lista_colunas()} FROM {tabela}
+        WHERE paciente_id = %s AND inicio >= %s AND inicio < %s
+        ORDER BY inicio
+    """, (paciente_id, de, ate))
+    for r in cursor.fetchall():
+        resultado['labels'].append(r['inicio'].strftime(formato))
+        for s in SINAIS:
+            n = r[f'{s}_n']
+            resultado['sinais'][s]['min'].append(_numero(r[f'{s}_min']))
+            resultado['sinais'][s]['max'].append(_numero(r[f'{s}_max']))
+            resultado['sinais'][s]['media'].append(round(float(r[f'{s}_soma']) / n, 2) if n else None)
+    return resultado
+
+if __name__ == '__main__':
+    from database import create_db_connection
+    conn = create_db_connection(pymysql.cursors.DictCursor)
+    if conn:
+        reconstruir(conn)
+        conn.close()
+        print("✅ Séries de sinais vitais reconstruídas.")
@@ -0,0 +1,207 @@
+// static/js/ao_vivo.js
+// Telas ao vivo: recebe deltas de /api/eventos (Server-Sent Events) e
+// atualiza a página sem recarregar. O navegador reconecta sozinho e envia
+// o Last-Event-ID, então nenhum evento se perde numa queda curta.
+//
+// Tabelas marcadas com data-ao-vivo="inserir" recebem as linhas novas;
+// com data-ao-vivo="avisar" (filtros ou outra página) só mostram um aviso.
+
+function conectarAoVivo(canais, handlers) {
+    if (!window.EventSource) return null;
+    const fonte = new EventSource(`/api/eventos?canais=${canais.join(',')}`);
+    fonte.addEventListener('recarregar', () => location.reload());
+    Object.keys(handlers).forEach(tipo => {
+        fonte.addEventListener(tipo, ev => handlers[tipo](JSON.parse(ev.data)));
+    });
+    return fonte;
+}
+
+function celula(conteudo, html) {
+    const td = document.createElement('td');
+    if (html) td.innerHTML = conteudo; else td.textContent = conteudo == null ? '' : conteudo;
+    return td;
+}
+
+function escapar(texto) {
+    const div = document.createElement('div');
+    div.textContent = texto == null ? '' : texto;
+    return div.innerHTML;
+}
+
+function destacar(tr) {
+    tr.classList.add('linha-nova');
+    setTimeout(() => tr.classList.remove('linha-nova'), 3000);
+}
+
+function avisarAtualizacao(tabela) {
+    if (document.getElementById('aviso-ao-vivo')) return;
+    const aviso = document.createElement('div');
+    aviso.id = 'aviso-ao-vivo';
+    aviso.className = 'alert alert-info aviso-ao-vivo';
+    aviso.innerHTML = 'Há registros novos. <a href="#">Atualizar lista</a>';
+    aviso.querySelector('a').addEventListener('click', e => { e.preventDefault(); location.reload(); });
+    tabela.parentNode.insertBefore(aviso, tabela);
+}
+
+function removerLinha(tabela, id) {
+    const tr = tabela.querySelector(`tbody tr[data-id="${id}"]`);
+    if (tr) tr.remove();
+}
+
+// --- PACIENTES INTERNADOS ---
+function iniciarPacientes(tabela) {
+    const podeEditar = tabela.dataset.podeEditar === '1';
+    const url = (modelo, id) => modelo.replace(/0$/, id);
+
+    function linha(p) {
+        const tr = document.createElement('tr');
+        tr.dataset.id = p.id;
+        tr.appendChild(celula(p.id));
+        tr.appendChild(celula(`<span class="badge nivel-${escapar(p.prioridade)}">${escapar(p.prioridade).toUpperCase()}</span>`, true));
+        tr.appendChild(celula(`<strong>${escapar(p.nome)}</strong>`, true));
+        tr.appendChild(celula(p.data_entrada.length === 16 ? p.data_entrada + ':00' : p.data_entrada));
+
+        let acoes = `<div class="acoes-flex" style="display: flex; gap: 10px; align-items: center;">
+            <a href="${url(tabela.dataset.urlPv, p.id)}" class="btn-action-pequeno" style="background-color: #28a745; color: white; text-decoration: none; padding: 5px 10px; border-radius: 4px;">PV</a>
+            <a href="${url(tabela.dataset.urlDetalhes, p.id)}" class="btn-action-pequeno btn-detalhes" style="text-decoration: none; padding: 5px 10px; border-radius: 4px;">Detalhes</a>`;
+        if (podeEditar) {
+            acoes += `<a href="${url(tabela.dataset.urlAlta, p.id)}" class="btn-action-pequeno" style="background-color: #dc3545; color: white; text-decoration: none; padding: 5px 10px; border-radius: 4px;">Alta</a>
+            <form action="${url(tabela.dataset.urlExcluir, p.id)}" method="POST" style="margin: 0;"
+                  onsubmit="return confirm('Deseja excluir permanentemente este registro? Isso removerá o paciente de todos os gráficos e estatísticas.');">
+                <button type="submit" class="btn-excluir" title="Excluir erro/teste">🗑️</button>
+            </form>`;
+        }
+        const td = celula(acoes + '</div>', true);
+        td.className = 'tabela-acoes';
+        tr.appendChild(td);
+        return tr;
+    }
+
+    conectarAoVivo(['pacientes'], {
+        'paciente.internado': p => {
+            if (tabela.dataset.aoVivo !== 'inserir') return avisarAtualizacao(tabela);
+            const corpo = tabela.querySelector('tbody');
+            // A lista é ordenada por nome: insere na posição certa
+            const linhas = Array.from(corpo.querySelectorAll('tr[data-id]'));
+            const depois = linhas.find(tr => tr.querySelector('strong').textContent.localeCompare(p.nome) > 0);
+            if (!depois && tabela.dataset.temMais === '1') return;
+            const nova = linha(p);
+            corpo.insertBefore(nova, depois || null);
+            const vazio = corpo.querySelector('tr:not([data-id])');
+            if (vazio) vazio.remove();
+            destacar(nova);
+        },
+        'paciente.alta': p => removerLinha(tabela, p.id),
+        'paciente.excluido': p => removerLinha(tabela, p.id)
+    });
+}
+
+// --- PROVAS DE VIDA (TODOS OS PACIENTES) ---
+function iniciarProvasVida(tabela) {
+    const podeEditar = tabela.dataset.podeEditar === '1';
+    const url = (modelo, id) => modelo.replace(/0$/, id);
+    const COLUNAS = ['pressao_arterial', 'temperatura', 'glicose', 'saturacao', 'batimentos_cardiacos'];
+    const formatos = {
+        pressao_arterial: v => escapar(v),
+        temperatura: v => `<span style="color: #e06c75; font-weight: bold;">${escapar(v)}°C</span>`,
+        glicose: v => `${escapar(v)} mg/dL`,
+        saturacao: v => `${escapar(v)}%`,
+        batimentos_cardiacos: v => `${escapar(v)} bpm`
+    };
+
+    function linha(pv) {
+        const tr = document.createElement('tr');
+        tr.dataset.id = pv.id;
+        tr.appendChild(celula(`<strong>${escapar(pv.data_hora)}</strong>`, true));
+        tr.appendChild(celula(pv.nome_paciente));
+        COLUNAS.forEach(c => {
+            const td = celula(formatos[c](pv[c]), true);
+            td.dataset.campo = c;
+            tr.appendChild(td);
+        });
+        tr.appendChild(celula(`<span class="badge nivel-estagiario">${escapar(pv.quem_efetuou)}</span>`, true));
+        if (podeEditar) {
+            tr.appendChild(celula(`<div style="display: flex; gap: 10px;">
+                <a href="${url(tabela.dataset.urlEditar, pv.id)}" class="btn-edit" title="Editar Registro">✏️</a>
+                <a href="${url(tabela.dataset.urlExcluir, pv.id)}" class="btn-delete" title="Excluir Registro"
+                   onclick="return confirm('ATENÇÃO: Deseja realmente excluir permanentemente este registro clínico?')">🗑️</a>
+            </div>`, true));
+        }
+        return tr;
+    }
+
+    conectarAoVivo(['provas_vida'], {
+        'prova_vida.registrada': pv => {
+            if (tabela.dataset.aoVivo !== 'inserir') return avisarAtualizacao(tabela);
+            const corpo = tabela.querySelector('tbody');
+            const vazio = corpo.querySelector('tr:not([data-id])');
+            if (vazio) vazio.remove();
+            const nova = linha(pv);
+            corpo.insertBefore(nova, corpo.firstChild);
+            destacar(nova);
+        },
+        'prova_vida.alterada': pv => {
+            const tr = tabela.querySelector(`tbody tr[data-id="${pv.id}"]`);
+            if (!tr) return;
+            COLUNAS.forEach(c => {
+                const td = tr.querySelector(`td[data-campo="${c}"]`);
+                if (td) td.innerHTML = formatos[c](pv[c]);
+            });
+            destacar(tr);
+        },
+        'prova_vida.excluida': pv => removerLinha(tabela, pv.id),
+        // Envio em lote de monitores/tablets: muitas linhas, só avisa
+        'prova_vida.lote': () => avisarAtualizacao(tabela)
+    });
+}
+
+// --- DASHBOARD ---
+// Os contadores vêm das APIs de KPI (em cache no servidor); vários eventos
+// seguidos geram uma única atualização.
+function iniciarDashboard() {
+    let timer = null;
+    const pendentes = new Set();
+
+    function agendar(...acoes) {
+        acoes.forEach(a => pendentes.add(a));
+        clearTimeout(timer);
+        timer = setTimeout(() => {
+            pendentes.forEach(a => a());
+            pendentes.clear();
+        }, 1000);
+    }
+
+    const valor = id => fetch(id.url).then(r => r.json()).then(d => {
+        const el = document.getElementById(id.elemento);
+        if (el && String(el.innerText) !== String(d.valor)) {
+            el.innerText = d.valor;
+            destacar(el);
+        }
+    });
+    const internados = () => valor({ url: '/api/kpi/internados/atual', elemento: 'kpi-internados-val' });
+    const estoque = () => valor({ url: '/api/kpi/estoque/baixo', elemento: 'kpi-estoque-val' });
+    const periodo = tipo => document.getElementById(`kpi-${tipo}-filtro`).value;
+    const altas = () => updateKpi('altas', periodo('altas'));
+    const provas = () => updateKpi('pv', periodo('pv'));
+    const remedios = () => updateRemediosChart(document.getElementById('remedios-filtro').value);
+
+    conectarAoVivo(['pacientes', 'provas_vida', 'estoque'], {
+        'paciente.internado': () => agendar(internados),
+        'paciente.alta': () => agendar(internados, altas),
+        'paciente.excluido': () => agendar(internados, altas),
+        'prova_vida.registrada': () => agendar(provas),
+        'prova_vida.excluida': () => agendar(provas),
+        'prova_vida.lote': () => agendar(provas),
+        'estoque.alterado': () => agendar(estoque, remedios)
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const pacientes = document.getElementById('pacientes-table');
+    if (pacientes && pacientes.dataset.aoVivo) iniciarPacientes(pacientes);
+
+    const provas = document.getElementById('tabelaPV');
+    if (provas && provas.dataset.aoVivo) iniciarProvasVida(provas);
+
+    if (document.getElementById('kpi-internados-val')) iniciarDashboard();
+});
@@ -0,0 +1,61 @@
+// static/js/busca_pacientes.js
+// Busca rápida de pacientes (nome, CPF ou CEP) direto no servidor.
+// Uso: <div class="busca-pacientes" data-status="internado|alta|">
+//         <input type="text" class="busca-pacientes-input">
+//         <ul class="busca-pacientes-resultados"></ul>
+//      </div>
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('.busca-pacientes').forEach(function(caixa) {
+        const input = caixa.querySelector('.busca-pacientes-input');
+        const lista = caixa.querySelector('.busca-pacientes-resultados');
+        const status = caixa.dataset.status || '';
+        let timer = null;
+        let controller = null;
+
+        function limpar() {
+            lista.innerHTML = '';
+            lista.style.display = 'none';
+        }
+
+        function mostrar(pacientes) {
+            lista.innerHTML = '';
+            if (pacientes.length === 0) {
+                lista.innerHTML = '<li class="vazio">Nenhum paciente encontrado.</li>';
+            }
+            pacientes.forEach(p => {
+                const li = document.createElement('li');
+                const a = document.createElement('a');
+                a.href = `/paciente/detalhes/${p.id}`;
+                a.textContent = p.nome;
+                const info = document.createElement('small');
+                info.textContent = ` ${p.cpf || ''} · ${p.status === 'alta' ? 'Alta ' + (p.data_baixa || '') : 'Internado desde ' + (p.data_entrada || '')}`;
+                a.appendChild(info);
+                li.appendChild(a);
+                lista.appendChild(li);
+            });
+            lista.style.display = 'block';
+        }
+
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            const termo = input.value.trim();
+            if (termo.length < 2) { limpar(); return; }
+
+            timer = setTimeout(() => {
+                // Cancela a busca anterior que ainda não voltou
+                if (controller) controller.abort();
+                controller = new AbortController();
+                const params = new URLSearchParams({ q: termo, status: status });
+                fetch(`/api/pacientes/busca?${params}`, { signal: controller.signal })
+                    .then(r => r.json())
+                    .then(mostrar)
+                    .catch(err => { if (err.name !== 'AbortError') limpar(); });
+            }, 250);
+        });
+
+        document.addEventListener('click', function(e) {
+            if (!caixa.contains(e.target)) limpar();
+        });
+    });
+});
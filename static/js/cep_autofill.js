@@ -16,19 +16,24 @@ document.addEventListener('DOMContentLoaded', function() {
             e.target.value = value;
         });
 
-        // Busca automática no ViaCEP
+        // Busca automática (servidor consulta a base local de CEPs; ver ceps.py)
         cepInput.addEventListener('blur', function() {
             let cep = this.value.replace(/\D/g, '');
 
             if (cep.length === 8) {
                 enderecoInput.value = 'Buscando...';
                 
-                fetch(`https://viacep.com.br/ws/${cep}/json/`)
-                    .then(response => response.json())
-                    .then(data => {
-                        if (data.erro) {
+                fetch(`/api/cep/${cep}`)
+                    .then(response => response.json().then(data => ({ status: response.status, data: data })))
+                    .then(({ status, data }) => {
+                        if (status === 404) {
                             alert('CEP não encontrado.');
                             enderecoInput.value = '';
+                        } else if (status !== 200) {
+                            // Consulta indisponível: segue com preenchimento manual
+                            enderecoInput.value = '';
+                            enderecoInput.placeholder = data.erro || 'Preencha o endereço manualmente';
+                            enderecoInput.focus();
                         } else {
                             enderecoInput.value = data.logradouro || '';
                             bairroInput.value = data.bairro || '';
@@ -1,26 +1,40 @@
+// static/js/filter.js
+// Os filtros das listas são aplicados no servidor (paginação por cursor).
+// Aqui apenas reenviamos o formulário de filtros: com atraso enquanto o
+// usuário digita e imediatamente ao trocar datas/seleções.
+
+let filtroTimer = null;
+
+function enviarFiltros(form) {
+    // Remove campos vazios para a URL ficar limpa
+    Array.from(form.elements).forEach(el => {
+        if (el.name && !el.value) el.disabled = true;
+    });
+    form.submit();
+}
+
 function filterTable() {
-    // 1. Obter o valor digitado (em minúsculas)
-    let input = document.getElementById('search-input');
-    let filter = input.value.toLowerCase();
-    
-    // 2. Obter a tabela e as linhas
-    let table = document.getElementById('pacientes-table');
-    let tr = table.getElementsByTagName('tr');
+    let form = document.getElementById('filtro-form');
+    if (!form) return;
+    clearTimeout(filtroTimer);
+    filtroTimer = setTimeout(() => enviarFiltros(form), 500);
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    let form = document.getElementById('filtro-form');
+    if (!form) return;
+
+    form.querySelectorAll('input[type="text"]').forEach(input => {
+        input.addEventListener('input', filterTable);
+    });
+    form.querySelectorAll('select, input[type="date"]').forEach(el => {
+        el.addEventListener('change', () => enviarFiltros(form));
+    });
 
-    // 3. Iterar sobre todas as linhas da tabela (exceto o cabeçalho)
-    for (let i = 1; i < tr.length; i++) {
-        let row = tr[i];
-        
-        // Obter o nome do paciente da linha (usando o atributo data-nome)
-        let nomePaciente = row.getAttribute('data-nome');
-        
-        // 4. Verificar se o nome do paciente contém o texto do filtro
-        if (nomePaciente) {
-            if (nomePaciente.indexOf(filter) > -1) {
-                row.style.display = ""; // Mostrar a linha
-            } else {
-                row.style.display = "none"; // Esconder a linha
-            }
-        }       
+    // Mantém o foco (e o cursor no fim do texto) após recarregar com o filtro
+    let busca = form.querySelector('input[autofocus]');
+    if (busca && busca.value) {
+        busca.focus();
+        busca.setSelectionRange(busca.value.length, busca.value.length);
     }
-}
\ No newline at end of file
+});
@@ -0,0 +1,40 @@
+// static/js/medicamentos_busca.js
+// Autocompletar de medicamentos do estoque (ver catalogo.py).
+// Uso: <input type="text" class="medicamento-busca" list="medicamentos-sugestoes">
+//      <datalist id="medicamentos-sugestoes"></datalist>
+// Vale também para campos criados depois (linhas clonadas do prontuário).
+
+document.addEventListener('DOMContentLoaded', function() {
+    const lista = document.getElementById('medicamentos-sugestoes');
+    if (!lista) return;
+    let timer = null;
+    let controller = null;
+
+    function mostrar(medicamentos) {
+        lista.innerHTML = '';
+        medicamentos.forEach(m => {
+            const opcao = document.createElement('option');
+            opcao.value = m.nome_medicamento;
+            opcao.label = `Saldo: ${m.quantidade} ${m.unidade || ''}`;
+            lista.appendChild(opcao);
+        });
+    }
+
+    document.addEventListener('input', function(e) {
+        if (!e.target.classList || !e.target.classList.contains('medicamento-busca')) return;
+        clearTimeout(timer);
+        const termo = e.target.value.trim();
+        if (termo.length < 1) { lista.innerHTML = ''; return; }
+
+        timer = setTimeout(() => {
+            // Cancela a busca anterior que ainda não voltou
+            if (controller) controller.abort();
+            controller = new AbortController();
+            const params = new URLSearchParams({ q: termo, limite: 8 });
+            fetch(`/api/medicamentos/sugestao?${params}`, { signal: controller.signal })
+                .then(r => r.json())
+                .then(mostrar)
+                .catch(err => { if (err.name !== 'AbortError') lista.innerHTML = ''; });
+        }, 120);
+    });
+});
@@ -11,19 +11,9 @@ document.addEventListener('DOMContentLoaded', function() {
         const template = document.getElementById('medication-template');
         if (!template) return;
 
-        // importNode garante a clonagem profunda de todos os elementos (inclusive as options do loop)
+        // importNode garante a clonagem profunda de todos os elementos
+        // (o autocompletar do nome vem de medicamentos_busca.js, por delegação)
         const clone = document.importNode(template.content, true);
-        
-        const select = clone.querySelector('.medicamento-select');
-        const outroGroup = clone.querySelector('.outro-medicamento-group');
-
-        // Escuta mudança no select para mostrar campo 'Outro'
-        if (select && outroGroup) {
-            select.addEventListener('change', function() {
-                outroGroup.style.display = this.value === 'outro' ? 'block' : 'none';
-            });
-        }
-
         medicationContainer.appendChild(clone);
     }
 
@@ -0,0 +1,67 @@
+// static/js/sinais_paciente.js
+// Gráfico de tendência dos sinais vitais do paciente.
+// Os dados vêm de /api/paciente/<id>/sinais, já reduzidos por hora ou dia
+// conforme o período (o servidor escolhe a resolução).
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('.sinais-grafico').forEach(function(caixa) {
+        const url = caixa.dataset.url;
+        const seletorSinal = caixa.querySelector('.sinais-sinal');
+        const seletorPeriodo = caixa.querySelector('.sinais-periodo');
+        const rotulo = caixa.querySelector('.sinais-resolucao');
+        const canvas = caixa.querySelector('.sinais-canvas');
+        const cores = ['#e06c75', '#61afef'];
+        const nomes = {
+            pas: 'Sistólica', pad: 'Diastólica', bpm: 'FC (bpm)',
+            saturacao: 'SpO2 (%)', temperatura: 'Temp. (°C)', glicose: 'Glicose (mg/dL)'
+        };
+        let grafico = null;
+        let controller = null;
+
+        function carregar() {
+            const ate = new Date();
+            const de = new Date(ate.getTime() - Number(seletorPeriodo.value) * 24 * 3600 * 1000);
+            const iso = d => new Date(d.getTime() - d.getTimezoneOffset() * 60000).toISOString().slice(0, 16);
+
+            if (controller) controller.abort();
+            controller = new AbortController();
+
+            fetch(`${url}?de=${iso(de)}&ate=${iso(ate)}`, { signal: controller.signal })
+                .then(r => r.json())
+                .then(dados => desenhar(dados))
+                .catch(err => { if (err.name !== 'AbortError') console.error(err); });
+        }
+
+        function desenhar(dados) {
+            const datasets = [];
+            seletorSinal.value.split(',').forEach((sinal, i) => {
+                const serie = dados.sinais[sinal];
+                datasets.push({
+                    label: nomes[sinal],
+                    data: serie.media,
+                    borderColor: cores[i],
+                    backgroundColor: cores[i],
+                    spanGaps: true,
+                    tension: 0.2
+                });
+                if (dados.resolucao !== 'bruto') {
+                    // Faixa mínimo-máximo de cada balde
+                    datasets.push({ label: `${nomes[sinal]} (mín)`, data: serie.min, borderColor: cores[i] + '55', pointRadius: 0, borderDash: [4, 4], spanGaps: true });
+                    datasets.push({ label: `${nomes[sinal]} (máx)`, data: serie.max, borderColor: cores[i] + '55', pointRadius: 0, borderDash: [4, 4], spanGaps: true });
+                }
+            });
+
+            rotulo.textContent = { bruto: 'Leituras individuais', hora: 'Médias por hora', dia: 'Médias por dia' }[dados.resolucao];
+            if (grafico) grafico.destroy();
+            grafico = new Chart(canvas, {
+                type: 'line',
+                data: { labels: dados.labels, datasets: datasets },
+                options: { animation: false, plugins: { legend: { labels: { filter: item => !item.text.includes('(m') } } } }
+            });
+        }
+
+        seletorSinal.addEventListener('change', carregar);
+        seletorPeriodo.addEventListener('change', carregar);
+        carregar();
+    });
+});
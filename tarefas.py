@@ -0,0 +1,493 @@
+"""
+Tarefas em segundo plano (relatórios pesados e manutenção).
+
+As tarefas ficam na tabela Tarefas: as rotas só enfileiram e consultam o
+status; quem executa é o trabalhador, um processo separado com algumas
+threads:
+
+    flask --app app trabalhador [--threads 2] [--uma-vez]
+
+Cada thread pega a próxima tarefa pendente com SELECT ... FOR UPDATE SKIP
+LOCKED (vários trabalhadores podem rodar juntos sem pegar a mesma tarefa).
+Falhas voltam para a fila com espera exponencial (backoff_base * 2^n) até
+max_tentativas; tarefas presas em 'executando' além de timeout_execucao (o
+processo morreu) voltam para a fila.
+
+A AGENDA enfileira tarefas periódicas. Cada execução tem uma chave por
+intervalo (tipo + número do intervalo), então vários trabalhadores não
+duplicam o agendamento.
+
+Relatórios (@tarefa(..., relatorio=True)) guardam o resultado em JSON na
+própria tarefa. /api/relatorios/<tipo> entrega o último resultado (via
+cache) e, se ele não existir ou estiver velho, enfileira um novo cálculo;
+nenhuma requisição espera o agregado.
+"""
+import json
+import os
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pymysql.cursors
+
+import arquivamento
+import estatisticas
+import estoque_servico
+import sinais_vitais
+import versoes
+from cache import cache, TODAS_AS_TAGS, TAG_ALTAS, TAG_PROVAS_VIDA
+
+TAREFAS_CONFIG = {
+    "threads": 2,
+    "intervalo_ocioso": 1.0,      # segundos entre buscas quando a fila está vazia
+    "backoff_base": 30,           # segundos; dobra a cada tentativa
+    "backoff_maximo": 3600,
+    "timeout_execucao": 1800,     # 'executando' há mais que isso = trabalhador morreu
+    "validade_relatorio": 3600,   # resultado mais velho que isso é recalculado ao ser pedido
+    "ttl_cache": 300,
+    "reter_dias": 30              # tarefas concluídas/falhas mais antigas são apagadas
+}
+
+SQL_TABELA = """
+    CREATE TABLE IF NOT EXISTS Tarefas (
+        id BIGINT AUTO_INCREMENT PRIMARY KEY,
+        tipo VARCHAR(50) NOT NULL,
+        parametros VARCHAR(255) NOT NULL DEFAULT '{}',
+        status ENUM('pendente', 'executando', 'concluida', 'falhou') NOT NULL DEFAULT 'pendente',
+        tentativas INT NOT NULL DEFAULT 0,
+        max_tentativas INT NOT NULL DEFAULT 3,
+        executar_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        iniciada_em DATETIME NULL,
+        concluida_em DATETIME NULL,
+        trabalhador VARCHAR(100) NULL,
+        erro TEXT NULL,
+        resultado MEDIUMTEXT NULL,
+        criada_por VARCHAR(50) NULL,
+        criada_em DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        chave_agenda VARCHAR(120) NULL,
+        UNIQUE KEY uq_tarefas_agenda (chave_agenda),
+        KEY idx_tarefas_fila (status, executar_em),
+        KEY idx_tarefas_tipo (tipo, parametros, status, concluida_em)
+    )
+"""
+
+class TarefaDesconhecida(Exception):
+    """Tipo de tarefa não registrado com @tarefa."""
+
+# ==============================================================================
+# REGISTRO
+# ==============================================================================
+
+TAREFAS = {}
+
+def tarefa(nome, parametros=(), relatorio=False, tags=(), max_tentativas=3):
+    """
+    Registra funcao(conn, **parametros) como tarefa.
+    relatorio: o retorno (JSON) é guardado e servido por /api/relatorios/<nome>.
+    tags: tags do cache invalidadas quando a tarefa termina bem (no app também,
+    pela versão em Versoes).
+    """
+    def registrar(funcao):
+        TAREFAS[nome] = {'funcao': funcao, 'parametros': tuple(parametros), 'relatorio': relatorio,
+                         'tags': tuple(tags), 'max_tentativas': max_tentativas}
+        return funcao
+    return registrar
+
+def parametros_padrao(agora=None):
+    agora = agora or datetime.now()
+    return {'ano': agora.year, 'mes': agora.month}
+
+def _serializar(parametros):
+    # Forma canônica: o mesmo pedido sempre gera a mesma string (usada nas buscas)
+    return json.dumps(parametros or {}, sort_keys=True, separators=(',', ':'))
+
+def _mes(ano, mes):
+    inicio = datetime(ano, mes, 1)
+    fim = datetime(ano + (mes == 12), mes % 12 + 1, 1)
+    return inicio, fim
+
+def _numero(valor):
+    return None if valor is None else float(valor)
+
+# ==============================================================================
+# RELATÓRIOS
+# ==============================================================================
+
+@tarefa('censo_mensal', parametros=('ano', 'mes'), relatorio=True)
+def censo_mensal(conn, ano, mes):
+    """Entradas, altas, internados no fim do mês e permanência média, por prioridade."""
+    inicio, fim = _mes(ano, mes)
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    cursor.execute(f"""
+        SELECT IFNULL(prioridade_atencao, 'verde') AS prioridade,
+               SUM(data_entrada >= %s) AS entradas,
+               SUM(data_baixa >= %s AND data_baixa < %s) AS altas,
+               SUM(data_baixa IS NULL OR data_baixa >= %s) AS internados_fim,
+               AVG(IF(data_baixa >= %s AND data_baixa < %s, DATEDIFF(data_baixa, data_entrada), NULL)) AS permanencia_media
+        FROM {arquivamento.com_arquivo(cursor, 'Pacientes', 'p')}
+        WHERE data_entrada < %s AND (data_baixa IS NULL OR data_baixa >= %s)
+        GROUP BY prioridade ORDER BY prioridade
+    """, (inicio, inicio, fim, fim, inicio, fim, fim, inicio))
+    linhas = [{'prioridade': r['prioridade'], 'entradas': int(r['entradas'] or 0), 'altas': int(r['altas'] or 0),
+               'internados_fim': int(r['internados_fim'] or 0),
+               'permanencia_media': _numero(r['permanencia_media'])} for r in cursor.fetchall()]
+    return {'ano': ano, 'mes': mes, 'prioridades': linhas,
+            'totais': {c: sum(l[c] for l in linhas) for c in ('entradas', 'altas', 'internados_fim')}}
+
+@tarefa('consumo_mensal', parametros=('ano', 'mes'), relatorio=True)
+def consumo_mensal(conn, ano, mes):
+    """Ranking de saída de medicamentos no mês (baixas e dispensações)."""
+    inicio, fim = _mes(ano, mes)
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    cursor.execute("""
+        SELECT nome_medicamento, MAX(unidade) AS unidade, SUM(quantidade_removida) AS total, COUNT(*) AS movimentos
+        FROM EstoqueBaixas WHERE data_hora >= %s AND data_hora < %s
+        GROUP BY nome_medicamento ORDER BY total DESC
+    """, (inicio, fim))
+    ranking = [{'nome_medicamento': r['nome_medicamento'], 'unidade': r['unidade'], 'total': float(r['total']),
+                'movimentos': int(r['movimentos'])} for r in cursor.fetchall()]
+    return {'ano': ano, 'mes': mes, 'ranking': ranking}
+
+@tarefa('movimento_anual', parametros=('ano',), relatorio=True)
+def movimento_anual(conn, ano):
+    """Entradas e altas por mês e permanência média por profissional no ano."""
+    inicio, fim = datetime(ano, 1, 1), datetime(ano + 1, 1, 1)
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    pacientes = arquivamento.com_arquivo(cursor, 'Pacientes', 'p')
+    meses = [{'mes': m, 'entradas': 0, 'altas': 0} for m in range(1, 13)]
+    cursor.execute(f"""
+        SELECT MONTH(data_entrada) AS mes, COUNT(*) AS total FROM {pacientes}
+        WHERE data_entrada >= %s AND data_entrada < %s GROUP BY mes
+    """, (inicio, fim))
+    for r in cursor.fetchall():
+        meses[r['mes'] - 1]['entradas'] = int(r['total'])
+    cursor.execute(f"""
+        SELECT MONTH(data_baixa) AS mes, COUNT(*) AS total FROM {pacientes}
+        WHERE data_baixa >= %s AND data_baixa < %s GROUP BY mes
+    """, (inicio, fim))
+    for r in cursor.fetchall():
+        meses[r['mes'] - 1]['altas'] = int(r['total'])
+    cursor.execute(f"""
+        SELECT IFNULL(usuario_internacao, 'Sistema') AS usuario, COUNT(*) AS altas,
+               AVG(DATEDIFF(data_baixa, data_entrada)) AS permanencia_media
+        FROM {pacientes}
+        WHERE data_baixa >= %s AND data_baixa < %s
+        GROUP BY usuario ORDER BY permanencia_media DESC
+    """, (inicio, fim))
+    usuarios = [{'usuario': r['usuario'], 'altas': int(r['altas']),
+                 'permanencia_media': _numero(r['permanencia_media'])} for r in cursor.fetchall()]
+    return {'ano': ano, 'meses': meses, 'permanencia_por_usuario': usuarios}
+
+# ==============================================================================
+# MANUTENÇÃO
+# ==============================================================================
+
+@tarefa('reconstruir_estatisticas', tags=TODAS_AS_TAGS)
+def reconstruir_estatisticas(conn):
+    estatisticas.reconstruir(conn)
+
+@tarefa('reconstruir_sinais', tags=(TAG_PROVAS_VIDA,))
+def reconstruir_sinais(conn):
+    sinais_vitais.reconstruir(conn)
+
+@tarefa('arquivar_altas', tags=(TAG_ALTAS, TAG_PROVAS_VIDA))
+def arquivar_altas(conn):
+    return arquivamento.arquivar(conn)
+
+@tarefa('checkpoint_estoque')
+def checkpoint_estoque(conn):
+    return {'criados': estoque_servico.criar_checkpoints(conn)}
+
+@tarefa('limpar_tarefas')
+def limpar_tarefas(conn):
+    """Apaga tarefas terminadas há mais de reter_dias, mantendo o último resultado de cada relatório."""
+    cursor = conn.cursor()
+    cursor.execute("""
+        DELETE t FROM Tarefas t
+        LEFT JOIN (SELECT MAX(id) AS id FROM Tarefas WHERE status = 'concluida' GROUP BY tipo, parametros) u
+               ON u.id = t.id
+        WHERE t.status IN ('concluida', 'falhou') AND t.concluida_em < NOW() - INTERVAL %s DAY AND u.id IS NULL
+    """, (TAREFAS_CONFIG['reter_dias'],))
+    conn.commit()
+    return {'apagadas': cursor.rowcount}
+
+# Tarefas periódicas: (tipo, a cada N segundos, função que monta os parâmetros)
+AGENDA = [
+    ('censo_mensal', 3600, parametros_padrao),
+    ('consumo_mensal', 3600, parametros_padrao),
+    ('movimento_anual', 6 * 3600, lambda agora: {'ano': agora.year}),
+    ('arquivar_altas', 24 * 3600, None),
+    ('checkpoint_estoque', 3600, None),
+    ('limpar_tarefas', 24 * 3600, None),
+]
+
+# ==============================================================================
+# FILA
+# ==============================================================================
+
+def criar_tabela(cursor):
+    cursor.execute(SQL_TABELA)
+
+def enfileirar(conn, tipo, parametros=None, criada_por=None, executar_em=None, chave_agenda=None):
+    """
+    Põe a tarefa na fila e retorna o id. Se já houver uma igual pendente ou em
+    execução, retorna o id dela em vez de duplicar.
+    """
+    if tipo not in TAREFAS:
+        raise TarefaDesconhecida(tipo)
+    texto = _serializar(parametros)
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute("""
+            SELECT id FROM Tarefas WHERE tipo = %s AND parametros = %s AND status IN ('pendente', 'executando')
+            ORDER BY id LIMIT 1
+        """, (tipo, texto))
+        existente = cursor.fetchone()
+        if existente:
+            conn.commit()
+            return existente['id']
+        cursor.execute("""
+            INSERT IGNORE INTO Tarefas (tipo, parametros, max_tentativas, executar_em, criada_por, chave_agenda)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (tipo, texto, TAREFAS[tipo]['max_tentativas'], executar_em or datetime.now(), criada_por, chave_agenda))
+        tarefa_id = cursor.lastrowid if cursor.rowcount else None
+        conn.commit()
+        return tarefa_id
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def agendar(conn, agora=None):
+    """Enfileira as tarefas da AGENDA cujo intervalo atual ainda não foi agendado."""
+    agora = agora or datetime.now()
+    criadas = 0
+    for tipo, a_cada, montar in AGENDA:
+        intervalo = int(agora.timestamp() // a_cada)
+        parametros = montar(agora) if montar else {}
+        # chave_agenda é UNIQUE: o INSERT IGNORE do segundo trabalhador não faz nada
+        if enfileirar(conn, tipo, parametros, criada_por='agenda', chave_agenda=f"{tipo}:{intervalo}"):
+            criadas += 1
+    return criadas
+
+def recuperar_travadas(conn):
+    """Devolve à fila (ou marca como falha) as tarefas de trabalhadores que morreram."""
+    cursor = conn.cursor()
+    try:
+        cursor.execute("""
+            UPDATE Tarefas
+            SET status = IF(tentativas >= max_tentativas, 'falhou', 'pendente'),
+                erro = 'Execução interrompida (trabalhador parou)', trabalhador = NULL,
+                concluida_em = IF(tentativas >= max_tentativas, NOW(), NULL)
+            WHERE status = 'executando' AND iniciada_em < NOW() - INTERVAL %s SECOND
+        """, (TAREFAS_CONFIG['timeout_execucao'],))
+        conn.commit()
+        return cursor.rowcount
+    finally:
+        cursor.close()
+
+def _pegar(conn, trabalhador):
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    try:
+        cursor.execute("""
+            SELECT id, tipo, parametros, tentativas, max_tentativas FROM Tarefas
+            WHERE status = 'pendente' AND executar_em <= NOW()
+            ORDER BY executar_em, id LIMIT 1
+            FOR UPDATE SKIP LOCKED
+        """)
+        linha = cursor.fetchone()
+        if linha:
+            cursor.execute("""
+                UPDATE Tarefas SET status = 'executando', iniciada_em = NOW(), trabalhador = %s,
+                       tentativas = tentativas + 1
+                WHERE id = %s
+            """, (trabalhador, linha['id']))
+            linha['tentativas'] += 1
+        conn.commit()
+        return linha
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
+
+def _terminar(conn, tarefa_id, resultado):
+    cursor = conn.cursor()
+    cursor.execute("""
+        UPDATE Tarefas SET status = 'concluida', concluida_em = NOW(), erro = NULL, resultado = %s
+        WHERE id = %s
+    """, (None if resultado is None else json.dumps(resultado, default=str), tarefa_id))
+    conn.commit()
+
+def _falhar(conn, linha, erro):
+    cursor = conn.cursor()
+    if linha['tentativas'] >= linha['max_tentativas']:
+        cursor.execute("UPDATE Tarefas SET status = 'falhou', concluida_em = NOW(), erro = %s WHERE id = %s",
+                       (erro, linha['id']))
+    else:
+        espera = min(TAREFAS_CONFIG['backoff_base'] * 2 ** (linha['tentativas'] - 1), TAREFAS_CONFIG['backoff_maximo'])
+        cursor.execute("""
+            UPDATE Tarefas SET status = 'pendente', trabalhador = NULL, erro = %s,
+                   executar_em = NOW() + INTERVAL %s SECOND
+            WHERE id = %s
+        """, (erro, espera, linha['id']))
+    conn.commit()
+
+def executar_proxima(obter_conexao, trabalhador='local'):
+    """
+    Executa uma tarefa pendente, se houver. obter_conexao() deve devolver
+    uma conexão (que será fechada aqui). Retorna a linha executada ou None.
+    """
+    conn = obter_conexao()
+    if conn is None:
+        return None
+    try:
+        linha = _pegar(conn, trabalhador)
+        if linha is None:
+            return None
+        registro = TAREFAS.get(linha['tipo'])
+        inicio = time.perf_counter()
+        try:
+            if registro is None:
+                raise TarefaDesconhecida(linha['tipo'])
+            resultado = registro['funcao'](conn, **json.loads(linha['parametros']))
+            # O cache.invalidar abaixo só alcança este processo (backend local); a
+            # versão em Versoes avisa o app (ver cache.sincronizar) e os GETs condicionais
+            versoes.incrementar(conn.cursor(), *registro['tags'])
+            _terminar(conn, linha['id'], resultado)
+        except Exception as err:
+            conn.rollback()
+            print(f"❌ Tarefa {linha['id']} ({linha['tipo']}) falhou na tentativa {linha['tentativas']}: {err}")
+            _falhar(conn, linha, f"{type(err).__name__}: {err}")
+            return linha
+        if registro['tags']:
+            cache.invalidar(*registro['tags'])
+        print(f"✅ Tarefa {linha['id']} ({linha['tipo']}) concluída em {time.perf_counter() - inicio:.1f}s")
+        return linha
+    finally:
+        conn.close()
+
+class Trabalhador:
+    """Threads que consomem a fila; a primeira também cuida da agenda e das travadas."""
+
+    def __init__(self, obter_conexao, threads=None):
+        self.obter_conexao = obter_conexao
+        self.threads = threads or TAREFAS_CONFIG['threads']
+        self.nome = f"{socket.gethostname()}:{os.getpid()}"
+        self.parar = threading.Event()
+
+    def _manutencao(self):
+        conn = self.obter_conexao()
+        if conn is None:
+            return
+        try:
+            recuperar_travadas(conn)
+            agendar(conn)
+        except Exception as err:
+            print(f"❌ Erro na agenda de tarefas: {err}")
+        finally:
+            conn.close()
+
+    def _laco(self, indice):
+        nome = f"{self.nome}/{indice}"
+        ultima_manutencao = 0.0
+        while not self.parar.is_set():
+            if indice == 0 and time.monotonic() - ultima_manutencao > 60:
+                self._manutencao()
+                ultima_manutencao = time.monotonic()
+            try:
+                executou = executar_proxima(self.obter_conexao, nome)
+            except Exception as err:
+                print(f"❌ Erro ao buscar tarefas: {err}")
+                executou = None
+            if executou is None:
+                self.parar.wait(TAREFAS_CONFIG['intervalo_ocioso'])
+
+    def executar(self):
+        threads = [threading.Thread(target=self._laco, args=(i,), daemon=True) for i in range(self.threads)]
+        for t in threads:
+            t.start()
+        try:
+            while any(t.is_alive() for t in threads):
+                time.sleep(0.5)
+        except KeyboardInterrupt:
+            print("Encerrando trabalhador (esperando as tarefas em andamento)...")
+            self.parar.set()
+            for t in threads:
+                t.join()
+
+    def esvaziar(self):
+        """Roda agenda e fila até não sobrar nada pendente (para cron/testes)."""
+        self._manutencao()
+        total = 0
+        while executar_proxima(self.obter_conexao, self.nome) is not None:
+            total += 1
+        return total
+
+# ==============================================================================
+# CONSULTA (rotas)
+# ==============================================================================
+
+def _formatar(linha):
+    tarefa = {k: linha[k] for k in ('id', 'tipo', 'status', 'tentativas', 'max_tentativas', 'erro')}
+    tarefa['parametros'] = json.loads(linha['parametros'])
+    for campo in ('criada_em', 'executar_em', 'iniciada_em', 'concluida_em'):
+        tarefa[campo] = linha[campo].isoformat(sep=' ') if linha.get(campo) else None
+    if linha.get('resultado') is not None:
+        tarefa['resultado'] = json.loads(linha['resultado'])
+    return tarefa
+
+def consultar(conn, tarefa_id):
+    cursor = conn.cursor(pymysql.cursors.DictCursor)
+    cursor.execute("SELECT * FROM Tarefas WHERE id = %s", (tarefa_id,))
+    linha = cursor.fetchone()
+    return _formatar(linha) if linha else None
+
+class RelatorioPendente(Exception):
+    """Ainda não há resultado calculado para o relatório pedido."""
+
+def relatorio(obter_conexao, tipo, parametros, usuario=None):
+    """
+    Último resultado do relatório (do cache ou da tabela). Se estiver velho,
+    enfileira um recálculo e devolve o antigo mesmo assim. Sem nenhum
+    resultado, enfileira e lança RelatorioPendente com o id da tarefa.
+    """
+    texto = _serializar(parametros)
+
+    def ler():
+        conn = obter_conexao()
+        try:
+            cursor = conn.cursor(pymysql.cursors.DictCursor)
+            cursor.execute("""
+                SELECT id, concluida_em, resultado FROM Tarefas
+                WHERE tipo = %s AND parametros = %s AND status = 'concluida'
+                ORDER BY concluida_em DESC LIMIT 1
+            """, (tipo, texto))
+            linha = cursor.fetchone()
+        finally:
+            conn.close()
+        if linha is None:
+            raise RelatorioPendente()
+        return {'tarefa_id': linha['id'], 'gerado_em': linha['concluida_em'].isoformat(sep=' '),
+                'dados': json.loads(linha['resultado'])}
+
+    try:
+        resposta = cache.obter_ou_calcular(('relatorio', tipo, texto), ler, ttl=TAREFAS_CONFIG['ttl_cache'])
+    except RelatorioPendente:
+        conn = obter_conexao()
+        try:
+            tarefa_id = enfileirar(conn, tipo, parametros, criada_por=usuario)
+        finally:
+            conn.close()
+        raise RelatorioPendente(tarefa_id)
+
+    gerado_em = datetime.fromisoformat(resposta['gerado_em'])
+    if datetime.now() - gerado_em > timedelta(seconds=TAREFAS_CONFIG['validade_relatorio']):
+        conn = obter_conexao()
+        try:
+            enfileirar(conn, tipo, parametros, criada_por=usuario)
+        finally:
+            conn.close()
+    return resposta
@@ -0,0 +1,591 @@
+"""
+Exportação e importação rápidas do banco inteiro (backup, restauração e
+clonagem de ambientes), no lugar de reexecutar dumps linha a linha.
+
+Exportação: cada tabela vira blocos tab-separated comprimidos
+(Tabela.00001.tsv.gz ...), no formato de texto padrão do LOAD DATA (\\N para
+NULL, barra invertida escapa tab/quebra de linha). Tabelas com chave
+primária inteira são divididas em faixas da chave, e as faixas são lidas em
+paralelo, cada uma na sua conexão. Todas as conexões abrem o mesmo snapshot
+(START TRANSACTION WITH CONSISTENT SNAPSHOT sob um FLUSH TABLES WITH READ
+LOCK de um instante), então a cópia é do banco num único momento mesmo com
+o app no ar; sem o privilégio RELOAD, pare o app antes de exportar. O
+manifesto.json guarda as colunas e as linhas de cada arquivo.
+
+Importação (de uma pasta exportada ou de um .sql/.sql.gz do mysqldump):
+1. o schema de destino é criado/atualizado pelas migrações do app;
+2. as colunas da origem são casadas pelo nome com as do destino (sem
+   diferenciar maiúsculas): colunas que não existem mais são descartadas,
+   as novas ficam com o padrão, '' vira NULL em colunas não textuais e
+   AJUSTES corrige valores legados (ex.: CPF com máscara);
+3. por tabela vazia, os índices secundários são removidos, os dados entram
+   com foreign_key_checks/unique_checks desligados e os índices são
+   recriados de uma vez no fim, mesmo se a carga falhar;
+4. os arquivos são carregados em paralelo com LOAD DATA LOCAL INFILE (ou,
+   se o servidor não permitir, INSERTs multi-linha);
+5. as tabelas de resumo são recalculadas quando a origem não as tinha.
+
+    flask --app app exportar-banco backups/2026-01-10
+    flask --app app importar-banco backups/2026-01-10 --substituir
+    flask --app app importar-banco "sql/Dump20251229.sql"
+"""
+import gzip
+import json
+import os
+import queue
+import re
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import pymysql
+import pymysql.cursors
+
+import estatisticas
+import estoque_servico
+import migracoes
+import sinais_vitais
+from database import DB_CONFIG
+
+LINHAS_POR_ARQUIVO = 200000
+LINHAS_POR_LEITURA = 5000
+LINHAS_POR_INSERT = 5000
+PROCESSOS = 4
+MANIFESTO = 'manifesto.json'
+
+# Tabelas que não são copiadas (o destino tem o próprio histórico de migrações)
+IGNORADAS = {'schema_version'}
+
+# LOAD DATA LOCAL desabilitado no servidor ou no cliente
+CODIGOS_SEM_LOAD_DATA = (1148, 2068, 3948)
+
+TIPOS_TEXTO = {'char', 'varchar', 'tinytext', 'text', 'mediumtext', 'longtext'}
+
+# (tabela, coluna) -> (ajuste em Python, ajuste em SQL para o LOAD DATA)
+AJUSTES = {
+    ('pacientes', 'cpf'): (lambda v: re.sub(r'\D', '', v) or None, "NULLIF(REGEXP_REPLACE({v}, '[^0-9]', ''), '')"),
+}
+
+def _conectar(cursor_factory=pymysql.cursors.DictCursor):
+    try:
+        return pymysql.connect(**DB_CONFIG, cursorclass=cursor_factory, local_infile=True)
+    except pymysql.err.MySQLError as err:
+        raise RuntimeError(f"Erro ao conectar ao MySQL: {err}") from err
+
+# ==============================================================================
+# FORMATO DOS ARQUIVOS (texto padrão do LOAD DATA)
+# ==============================================================================
+
+_ESCAPES = {'0': '\0', 'b': '\b', 'n': '\n', 'r': '\r', 't': '\t', 'Z': '\x1a', 'N': None}
+_ESCAPADOS = re.compile(r'\\(.)', re.S)
+
+def escapar(valor):
+    if valor is None:
+        return '\\N'
+    if isinstance(valor, (bytes, bytearray)):
+        valor = valor.decode('utf-8', 'replace')
+    texto = str(valor)
+    return (texto.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n')
+            .replace('\r', '\\r').replace('\0', '\\0'))
+
+def desescapar(texto):
+    if texto == '\\N':
+        return None
+    return _ESCAPADOS.sub(lambda m: _ESCAPES.get(m.group(1)) or m.group(1), texto)
+
+def ler_arquivo(caminho):
+    """Gera as linhas (listas de valores) de um bloco .tsv.gz."""
+    with gzip.open(caminho, 'rt', encoding='utf-8', newline='\n') as arquivo:
+        for linha in arquivo:
+            yield [desescapar(v) for v in linha.rstrip('\n').split('\t')]
+
+# ==============================================================================
+# ESQUEMA E RECONCILIAÇÃO
+# ==============================================================================
+
+def esquema(cursor):
+    """{tabela em minúsculas: (nome real, {coluna em minúsculas: (nome real, tipo)})}"""
+    cursor.execute("""
+        SELECT TABLE_NAME, COLUMN_NAME, DATA_TYPE, EXTRA FROM information_schema.COLUMNS
+        WHERE TABLE_SCHEMA = DATABASE() ORDER BY TABLE_NAME, ORDINAL_POSITION
+    """)
+    tabelas = {}
+    for r in cursor.fetchall():
+        if 'GENERATED' in (r['EXTRA'] or '').upper():
+            continue
+        _, colunas = tabelas.setdefault(r['TABLE_NAME'].lower(), (r['TABLE_NAME'], {}))
+        colunas[r['COLUMN_NAME'].lower()] = (r['COLUMN_NAME'], r['DATA_TYPE'].lower())
+    return tabelas
+
+def reconciliar(tabela, colunas_origem, destino):
+    """
+    Casa as colunas da origem com as do destino. Retorna
+    (tabela de destino, [(índice na origem, coluna, tipo)], descartadas, ausentes)
+    ou None se a tabela não existe no app.
+    """
+    if tabela.lower() not in destino:
+        return None
+    nome, colunas = destino[tabela.lower()]
+    mapa, descartadas = [], []
+    for i, coluna in enumerate(colunas_origem):
+        alvo = colunas.get(coluna.lower())
+        if alvo:
+            mapa.append((i, alvo[0], alvo[1]))
+        else:
+            descartadas.append(coluna)
+    presentes = {c.lower() for c in colunas_origem}
+    ausentes = [real for chave, (real, _) in colunas.items() if chave not in presentes]
+    return nome, mapa, descartadas, ausentes
+
+def converter(tabela, coluna, tipo, valor):
+    if valor is None:
+        return None
+    if valor == '' and tipo not in TIPOS_TEXTO:
+        return None
+    ajuste = AJUSTES.get((tabela.lower(), coluna.lower()))
+    return ajuste[0](valor) if ajuste else valor
+
+def _expressao_sql(tabela, coluna, tipo, variavel):
+    ajuste = AJUSTES.get((tabela.lower(), coluna.lower()))
+    if ajuste:
+        return ajuste[1].format(v=variavel)
+    if tipo not in TIPOS_TEXTO:
+        return f"NULLIF({variavel}, '')"
+    return None
+
+# ==============================================================================
+# EXPORTAÇÃO
+# ==============================================================================
+
+def _planejar(cursor, tabela, linhas_por_arquivo):
+    """Colunas, chave e faixas [(de, ate)] da tabela ([None] = tabela inteira)."""
+    cursor.execute(f"SELECT * FROM `{tabela}` LIMIT 0")
+    colunas = [c[0] for c in cursor.description]
+    cursor.execute("""
+        SELECT k.COLUMN_NAME, c.DATA_TYPE FROM information_schema.KEY_COLUMN_USAGE k
+        JOIN information_schema.COLUMNS c ON c.TABLE_SCHEMA = k.TABLE_SCHEMA
+             AND c.TABLE_NAME = k.TABLE_NAME AND c.COLUMN_NAME = k.COLUMN_NAME
+        WHERE k.TABLE_SCHEMA = DATABASE() AND k.TABLE_NAME = %s AND k.CONSTRAINT_NAME = 'PRIMARY'
+    """, (tabela,))
+    chave = cursor.fetchall()
+    if len(chave) != 1 or 'int' not in chave[0]['DATA_TYPE'].lower():
+        return colunas, None, [None]
+
+    pk = chave[0]['COLUMN_NAME']
+    cursor.execute(f"SELECT MIN(`{pk}`) AS menor, MAX(`{pk}`) AS maior, COUNT(*) AS n FROM `{tabela}`")
+    r = cursor.fetchone()
+    if not r['n']:
+        return colunas, pk, []
+    partes = max(-(-r['n'] // linhas_por_arquivo), 1)
+    passo = -(-(r['maior'] - r['menor'] + 1) // partes)
+    faixas = [(de, min(de + passo - 1, r['maior'])) for de in range(r['menor'], r['maior'] + 1, passo)]
+    return colunas, pk, faixas
+
+def _exportar_faixa(conexoes, pasta, tabela, colunas, pk, faixa, numero):
+    # Uma das conexões presas ao snapshot da exportação (ver _abrir_snapshot)
+    conn = conexoes.get()
+    try:
+        cursor = conn.cursor()
+        sql = f"SELECT {', '.join(f'`{c}`' for c in colunas)} FROM `{tabela}`"
+        params = ()
+        if faixa:
+            sql += f" WHERE `{pk}` BETWEEN %s AND %s"
+            params = faixa
+        if pk:
+            sql += f" ORDER BY `{pk}`"
+        cursor.execute(sql, params)
+
+        arquivo = f"{tabela}.{numero:05d}.tsv.gz"
+        linhas = 0
+        with gzip.open(os.path.join(pasta, arquivo), 'wt', encoding='utf-8', compresslevel=3, newline='\n') as saida:
+            while True:
+                bloco = cursor.fetchmany(LINHAS_POR_LEITURA)
+                if not bloco:
+                    break
+                saida.write(''.join('\t'.join(map(escapar, r)) + '\n' for r in bloco))
+                linhas += len(bloco)
+        return tabela, arquivo, linhas
+    finally:
+        conexoes.put(conn)
+
+def _abrir_snapshot(controle, processos):
+    """
+    Abre as conexões das faixas, todas no mesmo snapshot da conexão de
+    controle: com FLUSH TABLES WITH READ LOCK ninguém grava enquanto os
+    snapshots começam (como o mysqldump --single-transaction); o bloqueio
+    dura só esse instante. Sem o privilégio RELOAD os snapshots ficam em
+    momentos diferentes e o app precisa estar parado durante a exportação.
+    """
+    conexoes = [_conectar(pymysql.cursors.SSCursor) for _ in range(processos)]
+    cursor = controle.cursor()
+    try:
+        cursor.execute("FLUSH TABLES WITH READ LOCK")
+        bloqueado = True
+    except pymysql.err.MySQLError as err:
+        print(f"⚠️ Sem FLUSH TABLES WITH READ LOCK ({err.args[1]}); "
+              f"a exportação só é consistente com o app parado.")
+        bloqueado = False
+    try:
+        for conn in [controle] + conexoes:
+            c = conn.cursor()
+            c.execute("SET SESSION TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            c.execute("SET SESSION net_write_timeout = 600")
+            c.execute("START TRANSACTION WITH CONSISTENT SNAPSHOT")
+    finally:
+        if bloqueado:
+            cursor.execute("UNLOCK TABLES")
+    fila = queue.Queue()
+    for conn in conexoes:
+        fila.put(conn)
+    return conexoes, fila
+
+def exportar(pasta, processos=PROCESSOS, linhas_por_arquivo=LINHAS_POR_ARQUIVO):
+    """
+    Exporta todas as tabelas para a pasta, todas no mesmo instante (snapshot
+    único). Retorna o relatório {tabela: {'linhas', 'segundos'}}.
+    """
+    os.makedirs(pasta, exist_ok=True)
+    conn = _conectar()
+    conexoes = []
+    try:
+        conexoes, fila = _abrir_snapshot(conn, processos)
+        cursor = conn.cursor()
+        cursor.execute("SHOW FULL TABLES WHERE Table_type = 'BASE TABLE'")
+        tabelas = [list(r.values())[0] for r in cursor.fetchall()]
+        tabelas = [t for t in tabelas if t.lower() not in IGNORADAS]
+        try:
+            cursor.execute("SELECT MAX(versao) AS versao FROM schema_version")
+            versao = cursor.fetchone()['versao']
+        except pymysql.err.MySQLError:
+            versao = None  # banco anterior às migrações
+        planos = {t: _planejar(cursor, t, linhas_por_arquivo) for t in tabelas}
+
+        manifesto = {'data': datetime.now().isoformat(timespec='seconds'), 'versao_schema': versao, 'tabelas': {}}
+        tarefas = []
+        for tabela, (colunas, pk, faixas) in planos.items():
+            manifesto['tabelas'][tabela] = {'colunas': colunas, 'arquivos': [], 'linhas': 0}
+            tarefas += [(tabela, colunas, pk, faixa, n) for n, faixa in enumerate(faixas, 1)]
+
+        relatorio = _Relatorio()
+        with ThreadPoolExecutor(max_workers=processos) as executor:
+            futuros = [executor.submit(relatorio.medir, t[0], _exportar_faixa, fila, pasta, *t) for t in tarefas]
+            for futuro in futuros:
+                tabela, arquivo, linhas = futuro.result()
+                manifesto['tabelas'][tabela]['arquivos'].append({'arquivo': arquivo, 'linhas': linhas})
+                manifesto['tabelas'][tabela]['linhas'] += linhas
+    finally:
+        for c in [conn] + conexoes:
+            c.close()
+
+    with open(os.path.join(pasta, MANIFESTO), 'w', encoding='utf-8') as arquivo:
+        json.dump(manifesto, arquivo, ensure_ascii=False, indent=2)
+    return relatorio.resultado({t: m['linhas'] for t, m in manifesto['tabelas'].items()})
+
+# ==============================================================================
+# LEITURA DE DUMPS DO MYSQLDUMP
+# ==============================================================================
+
+_CREATE = re.compile(r"CREATE TABLE `([^`]+)`")
+_COLUNA = re.compile(r"\s+`([^`]+)`")
+_INSERT = re.compile(r"INSERT INTO `([^`]+)`\s*(?:\(([^)]*)\))?\s*VALUES\s*", re.I)
+_TOKEN = re.compile(r"\s*(?:'((?:[^'\\]|\\.|'')*)'|(NULL)|([-+]?[0-9][0-9.eE+-]*)|([(),;]))", re.S)
+_ESCAPADOS_SQL = re.compile(r"\\(.)|''", re.S)
+
+def _texto_sql(texto):
+    return _ESCAPADOS_SQL.sub(lambda m: "'" if m.group(1) is None else (_ESCAPES.get(m.group(1)) or m.group(1)), texto)
+
+def _valores(texto):
+    """Tuplas de um "VALUES (...),(...);" do mysqldump (strings, números como texto e None)."""
+    linhas, atual, pos = [], None, 0
+    while True:
+        m = _TOKEN.match(texto, pos)
+        if not m:
+            break
+        pos = m.end()
+        texto_sql, nulo, numero, pontuacao = m.groups()
+        if pontuacao == '(':
+            atual = []
+        elif pontuacao == ')':
+            linhas.append(atual)
+        elif pontuacao == ';':
+            break
+        elif pontuacao == ',':
+            continue
+        elif nulo:
+            atual.append(None)
+        elif numero is not None:
+            atual.append(numero)
+        else:
+            atual.append(_texto_sql(texto_sql))
+    return linhas
+
+def ler_dump(caminho, com_valores=True):
+    """
+    Gera (tabela, colunas, linhas) para cada INSERT de um dump do mysqldump
+    (um INSERT por linha, como o mysqldump e o Workbench gravam).
+    """
+    abrir = gzip.open if caminho.endswith('.gz') else open
+    colunas, criando = {}, None
+    with abrir(caminho, 'rt', encoding='utf-8') as arquivo:
+        for linha in arquivo:
+            m = _CREATE.match(linha)
+            if m:
+                criando = m.group(1).lower()
+                colunas[criando] = []
+                continue
+            if criando:
+                if linha.startswith(')'):
+                    criando = None
+                else:
+                    c = _COLUNA.match(linha)
+                    if c:
+                        colunas[criando].append(c.group(1))
+                continue
+            m = _INSERT.match(linha)
+            if m:
+                tabela = m.group(1)
+                nomes = [c.strip(' `') for c in m.group(2).split(',')] if m.group(2) else colunas.get(tabela.lower())
+                yield tabela, nomes, _valores(linha[m.end():]) if com_valores else None
+
+# ==============================================================================
+# IMPORTAÇÃO
+# ==============================================================================
+
+class _Relatorio:
+    """Linhas e tempo de parede por tabela (do primeiro arquivo iniciado ao último terminado)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._janelas = {}
+
+    def medir(self, tabela, funcao, *args):
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args)
+        finally:
+            fim = time.perf_counter()
+            with self._lock:
+                de, ate = self._janelas.get(tabela, (inicio, fim))
+                self._janelas[tabela] = (min(de, inicio), max(ate, fim))
+
+    def resultado(self, linhas):
+        return {t: {'linhas': n, 'segundos': round(self._janelas[t][1] - self._janelas[t][0], 2) if t in self._janelas else 0}
+                for t, n in linhas.items()}
+
+def _indices_secundarios(cursor, tabela):
+    """Definições (linhas do SHOW CREATE TABLE) dos índices não únicos."""
+    cursor.execute(f"SHOW CREATE TABLE `{tabela}`")
+    ddl = list(cursor.fetchone().values())[1]
+    return [linha.strip().rstrip(',') for linha in ddl.splitlines()
+            if re.match(r"\s+(KEY|FULLTEXT KEY|SPATIAL KEY) `", linha)]
+
+def _preparar(cursor, tabela, substituir):
+    """
+    Esvazia (se pedido) e remove os índices secundários de uma tabela vazia.
+    Retorna as definições removidas ou None se a tabela tem dados.
+    """
+    if substituir:
+        cursor.execute(f"TRUNCATE TABLE `{tabela}`")
+    cursor.execute(f"SELECT 1 AS tem FROM `{tabela}` LIMIT 1")
+    if cursor.fetchone():
+        return None
+    removidos = []
+    for definicao in _indices_secundarios(cursor, tabela):
+        nome = re.search(r"KEY `([^`]+)`", definicao).group(1)
+        try:
+            cursor.execute(f"ALTER TABLE `{tabela}` DROP INDEX `{nome}`")
+            removidos.append(definicao)
+        except pymysql.err.MySQLError:
+            pass  # índice usado por chave estrangeira: fica
+    return removidos
+
+def _sessao_carga(conn):
+    cursor = conn.cursor()
+    cursor.execute("SET SESSION foreign_key_checks = 0")
+    cursor.execute("SET SESSION unique_checks = 0")
+    return cursor
+
+def _inserir(cursor, tabela, mapa, linhas):
+    sql = (f"INSERT INTO `{tabela}` ({', '.join(f'`{c}`' for _, c, _ in mapa)}) "
+           f"VALUES ({', '.join(['%s'] * len(mapa))})")
+    total, lote = 0, []
+    for linha in linhas:
+        lote.append([converter(tabela, c, t, linha[i]) for i, c, t in mapa])
+        if len(lote) >= LINHAS_POR_INSERT:
+            cursor.executemany(sql, lote)
+            total, lote = total + len(lote), []
+    if lote:
+        cursor.executemany(sql, lote)
+        total += len(lote)
+    return total
+
+def _load_data(cursor, tabela, mapa, colunas_origem, caminho_gz):
+    destinos, ajustes = ['@descartar'] * len(colunas_origem), []
+    for i, coluna, tipo in mapa:
+        expressao = _expressao_sql(tabela, coluna, tipo, f"@c{i}")
+        if expressao:
+            destinos[i] = f"@c{i}"
+            ajustes.append(f"`{coluna}` = {expressao}")
+        else:
+            destinos[i] = f"`{coluna}`"
+    sql = f"LOAD DATA LOCAL INFILE %s INTO TABLE `{tabela}` CHARACTER SET utf8mb4 ({', '.join(destinos)})"
+    if ajustes:
+        sql += " SET " + ", ".join(ajustes)
+
+    # O LOAD DATA não lê gzip: descomprime o bloco num temporário
+    with tempfile.NamedTemporaryFile(suffix='.tsv', delete=False) as temporario:
+        with gzip.open(caminho_gz, 'rb') as origem:
+            shutil.copyfileobj(origem, temporario)
+    try:
+        cursor.execute(sql, (temporario.name,))
+        return cursor.rowcount
+    finally:
+        os.remove(temporario.name)
+
+class _Carga:
+    """Estado de uma importação (modo de carga compartilhado entre as threads)."""
+
+    def __init__(self, usar_load_data):
+        self.usar_load_data = usar_load_data
+        self.avisado = False
+
+    def arquivo(self, tabela, mapa, colunas_origem, caminho):
+        conn = _conectar()
+        try:
+            cursor = _sessao_carga(conn)
+            linhas = None
+            if self.usar_load_data:
+                try:
+                    linhas = _load_data(cursor, tabela, mapa, colunas_origem, caminho)
+                except pymysql.err.MySQLError as err:
+                    if err.args[0] not in CODIGOS_SEM_LOAD_DATA:
+                        raise
+                    self.usar_load_data = False
+                    if not self.avisado:
+                        self.avisado = True
+                        print(f"❌ LOAD DATA LOCAL indisponível ({err.args[1]}); usando INSERTs em lote.")
+            if linhas is None:
+                linhas = _inserir(cursor, tabela, mapa, ler_arquivo(caminho))
+            conn.commit()
+            return linhas
+        finally:
+            conn.close()
+
+def _recriar_indices(indices, processos, relatorio):
+    """Devolve os índices removidos por _preparar, um ALTER por tabela. Retorna as tabelas que falharam."""
+    def recriar(nome):
+        c = _conectar()
+        try:
+            c.cursor().execute(f"ALTER TABLE `{nome}` " + ", ".join(f"ADD {d}" for d in indices[nome]))
+        finally:
+            c.close()
+
+    falhas = []
+    with ThreadPoolExecutor(max_workers=processos) as executor:
+        futuros = {n: executor.submit(relatorio.medir, n, recriar, n) for n in indices if indices[n]}
+        for nome, futuro in futuros.items():
+            try:
+                futuro.result()
+            except Exception as e:
+                print(f"❌ {nome}: índices não recriados ({e}): {'; '.join(indices[nome])}")
+                falhas.append(nome)
+    return falhas
+
+def _fontes_pasta(pasta):
+    with open(os.path.join(pasta, MANIFESTO), encoding='utf-8') as arquivo:
+        manifesto = json.load(arquivo)
+    return {t: (m['colunas'], [os.path.join(pasta, a['arquivo']) for a in m['arquivos']])
+            for t, m in manifesto['tabelas'].items()}
+
+def importar(origem, processos=PROCESSOS, substituir=False, usar_load_data=True, resumos=True):
+    """
+    Importa uma pasta de exportar() ou um dump .sql(.gz). Retorna o relatório
+    {tabela de destino: {'linhas', 'segundos'}}.
+    """
+    conn = _conectar()
+    try:
+        migracoes.migrar(conn)
+        cursor = _sessao_carga(conn)
+        destino = esquema(cursor)
+
+        if os.path.isdir(origem):
+            fontes = _fontes_pasta(origem)
+            colunas_por_tabela = {t: c for t, (c, _) in fontes.items()}
+        else:
+            fontes = None
+            colunas_por_tabela = {}
+            for tabela, colunas, _ in ler_dump(origem, com_valores=False):
+                colunas_por_tabela.setdefault(tabela, colunas)
+
+        planos, indices, linhas = {}, {}, {}
+        relatorio = _Relatorio()
+        try:
+            # Reconciliação e preparo das tabelas de destino
+            for tabela, colunas in colunas_por_tabela.items():
+                if tabela.lower() in IGNORADAS:
+                    continue
+                plano = reconciliar(tabela, colunas, destino)
+                if plano is None:
+                    print(f"❌ {tabela}: tabela não existe no app; ignorada.")
+                    continue
+                nome, mapa, descartadas, ausentes = plano
+                if descartadas:
+                    print(f"  - {nome}: colunas descartadas {descartadas}")
+                if ausentes:
+                    print(f"  - {nome}: colunas com valor padrão {ausentes}")
+                removidos = _preparar(cursor, nome, substituir)
+                if removidos is None:
+                    print(f"❌ {nome}: já tem dados (use --substituir); ignorada.")
+                    continue
+                planos[tabela] = (nome, mapa)
+                indices[nome] = removidos
+                linhas[nome] = 0
+            conn.commit()
+
+            # Carga
+            if fontes is not None:
+                carga = _Carga(usar_load_data)
+                with ThreadPoolExecutor(max_workers=processos) as executor:
+                    futuros = []
+                    for tabela, (nome, mapa) in planos.items():
+                        colunas, arquivos = fontes[tabela]
+                        futuros += [(nome, executor.submit(relatorio.medir, nome, carga.arquivo, nome, mapa, colunas, a))
+                                    for a in arquivos]
+                    for nome, futuro in futuros:
+                        linhas[nome] += futuro.result()
+            else:
+                for tabela, _, valores in ler_dump(origem):
+                    if tabela in planos:
+                        nome, mapa = planos[tabela]
+                        linhas[nome] += relatorio.medir(nome, _inserir, cursor, nome, mapa, valores)
+                        conn.commit()
+        finally:
+            # Índices de volta mesmo se a carga falhar: o schema_version já diz que
+            # o schema está completo, então ninguém mais os recriaria
+            conn.rollback()
+            falhas = _recriar_indices(indices, processos, relatorio)
+        if falhas:
+            raise RuntimeError(f"Índices não recriados em {', '.join(falhas)}.")
+
+        carregadas = {n.lower() for n in linhas}
+        if resumos and 'estatisticasdiarias' not in carregadas:
+            print("  - Recalculando estatísticas, séries de sinais vitais e razão do estoque...")
+            estatisticas.reconstruir(conn)
+            sinais_vitais.reconstruir(conn)
+            if 'estoquemovimentos' not in carregadas:
+                cursor = conn.cursor()
+                estoque_servico.semear_razao(cursor)
+                conn.commit()
+        return relatorio.resultado(linhas)
+    finally:
+        conn.close()
+
+def imprimir_relatorio(relatorio):
+    total_linhas = sum(r['linhas'] for r in relatorio.values())
+    for tabela, r in sorted(relatorio.items()):
+        taxa = r['linhas'] / r['segundos'] if r['segundos'] else 0
+        print(f"  - {tabela}: {r['linhas']} linhas em {r['segundos']}s ({taxa:.0f} linhas/s)")
+    return total_linhas
@@ -0,0 +1,190 @@
+"""
+Fila de triagem: quem está mais atrasado para a próxima prova de vida.
+
+Cada paciente internado tem um vencimento: a última prova de vida (ou a
+entrada, se ainda não teve nenhuma) mais o intervalo alvo da prioridade
+dele (TRIAGEM_CONFIG['intervalos']). A fila guarda um heap por prioridade,
+ordenado pelo vencimento, e a /api/worklist percorre os heaps na ordem
+vermelho > amarelo > verde devolvendo os vencidos, do mais atrasado para o
+menos.
+
+As rotas de escrita avisam a fila depois do commit (internar, medir,
+remover, atualizar_paciente), cada aviso custa O(log n) e nenhum refaz a
+consulta de todas as provas de vida. O app não tem rota que mude a
+prioridade de um paciente internado; se ganhar uma, ela deve chamar
+atualizar_paciente depois do commit. Entradas substituídas ficam no heap
+até serem descartadas na leitura (remoção preguiçosa); quando passam da
+metade, os heaps são refeitos.
+
+Como o barramento de eventos, a fila é local ao processo: ela é montada do
+banco no primeiro uso e refeita a cada TRIAGEM_CONFIG['reconstruir_a_cada']
+segundos, o que cobre as escritas atendidas por outros workers.
+"""
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta
+
+TRIAGEM_CONFIG = {
+    # minutos entre provas de vida, por prioridade
+    "intervalos": {'vermelho': 60, 'amarelo': 240, 'verde': 480},
+    "reconstruir_a_cada": 300,  # segundos
+    "limite_padrao": 20,
+    "limite_maximo": 200,
+}
+
+PRIORIDADES = ('vermelho', 'amarelo', 'verde')
+
+def _data(valor):
+    if valor is None or isinstance(valor, datetime):
+        return valor
+    return datetime.fromisoformat(str(valor).replace('T', ' '))
+
+class FilaTriagem:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._heaps = {p: [] for p in PRIORIDADES}  # (vencimento, seq, paciente_id)
+        self._pacientes = {}  # id -> {'nome', 'prioridade', 'referencia', 'ultima', 'vencimento', 'seq'}
+        self._seq = itertools.count()
+        self._obsoletas = 0
+        self.carregada_em = None  # time.monotonic() da última reconstrução
+
+    # --------------------------------------------------------------------------
+    # Estrutura
+    # --------------------------------------------------------------------------
+
+    def _colocar(self, paciente_id, nome, prioridade, entrada, ultima):
+        """Insere ou substitui o paciente (chamar com o lock)."""
+        if prioridade not in self._heaps:
+            prioridade = 'verde'
+        referencia = ultima or entrada
+        vencimento = referencia + timedelta(minutes=TRIAGEM_CONFIG['intervalos'][prioridade])
+        if paciente_id in self._pacientes:
+            self._obsoletas += 1
+        seq = next(self._seq)
+        self._pacientes[paciente_id] = {'nome': nome, 'prioridade': prioridade, 'entrada': entrada,
+                                        'ultima': ultima, 'vencimento': vencimento, 'seq': seq}
+        heapq.heappush(self._heaps[prioridade], (vencimento, seq, paciente_id))
+        self._compactar()
+
+    def _compactar(self):
+        if self._obsoletas > max(64, len(self._pacientes)):
+            for prioridade in PRIORIDADES:
+                self._heaps[prioridade] = [(p['vencimento'], p['seq'], pid) for pid, p in self._pacientes.items()
+                                           if p['prioridade'] == prioridade]
+                heapq.heapify(self._heaps[prioridade])
+            self._obsoletas = 0
+
+    def _vigente(self, entrada):
+        vencimento, seq, paciente_id = entrada
+        paciente = self._pacientes.get(paciente_id)
+        return paciente is not None and paciente['seq'] == seq
+
+    # --------------------------------------------------------------------------
+    # Avisos das rotas de escrita
+    # --------------------------------------------------------------------------
+
+    def internar(self, paciente_id, nome, prioridade, data_entrada):
+        with self._lock:
+            if self.carregada_em is not None:
+                self._colocar(paciente_id, nome, prioridade, _data(data_entrada), None)
+
+    def medir(self, paciente_id, data_hora):
+        """Prova de vida registrada (leituras atrasadas de lote não voltam o relógio)."""
+        data_hora = _data(data_hora)
+        with self._lock:
+            paciente = self._pacientes.get(paciente_id)
+            if paciente and (paciente['ultima'] is None or data_hora > paciente['ultima']):
+                self._colocar(paciente_id, paciente['nome'], paciente['prioridade'], paciente['entrada'], data_hora)
+
+    def remover(self, paciente_id):
+        """Alta ou exclusão; a entrada do heap sai na próxima leitura."""
+        with self._lock:
+            if self._pacientes.pop(paciente_id, None):
+                self._obsoletas += 1
+                self._compactar()
+
+    def atualizar_paciente(self, cursor, paciente_id):
+        """Relê um paciente (ex.: prova de vida excluída, prioridade alterada); uma consulta pelo índice."""
+        cursor.execute(SQL_PACIENTES + " AND p.id = %s", (paciente_id,))
+        linha = cursor.fetchone()
+        if linha is None:
+            self.remover(paciente_id)
+            return
+        with self._lock:
+            if self.carregada_em is not None:
+                self._colocar(linha['id'], linha['nome'], linha['prioridade_atencao'],
+                              linha['data_entrada'], linha['ultima'])
+
+    # --------------------------------------------------------------------------
+    # Carga e leitura
+    # --------------------------------------------------------------------------
+
+    def reconstruir(self, cursor):
+        cursor.execute(SQL_PACIENTES)
+        linhas = cursor.fetchall()
+        with self._lock:
+            self._pacientes.clear()
+            self._heaps = {p: [] for p in PRIORIDADES}
+            self._obsoletas = 0
+            for linha in linhas:
+                self._colocar(linha['id'], linha['nome'], linha['prioridade_atencao'],
+                              linha['data_entrada'], linha['ultima'])
+            self.carregada_em = time.monotonic()
+        return len(linhas)
+
+    def precisa_reconstruir(self):
+        return self.carregada_em is None or \
+            time.monotonic() - self.carregada_em > TRIAGEM_CONFIG['reconstruir_a_cada']
+
+    def vencidos(self, limite=None, agora=None):
+        """
+        Os 'limite' pacientes mais urgentes já vencidos. Percorre cada heap em
+        ordem com um heap auxiliar de fronteira: O(limite · log limite), sem
+        remover nada.
+        """
+        limite = limite or TRIAGEM_CONFIG['limite_padrao']
+        agora = agora or datetime.now()
+        resultado = []
+        with self._lock:
+            for prioridade in PRIORIDADES:
+                heap = self._heaps[prioridade]
+                fronteira = [(heap[0], 0)] if heap else []
+                while fronteira and len(resultado) < limite:
+                    entrada, i = heapq.heappop(fronteira)
+                    if entrada[0] > agora:
+                        continue  # os filhos vencem ainda mais tarde
+                    for filho in (2 * i + 1, 2 * i + 2):
+                        if filho < len(heap):
+                            heapq.heappush(fronteira, (heap[filho], filho))
+                    if self._vigente(entrada):
+                        resultado.append(self._formatar(entrada[2], agora))
+                if len(resultado) >= limite:
+                    break
+        return resultado
+
+    def _formatar(self, paciente_id, agora):
+        paciente = self._pacientes[paciente_id]
+        return {
+            'id': paciente_id,
+            'nome': paciente['nome'],
+            'prioridade': paciente['prioridade'],
+            'ultima_prova_vida': paciente['ultima'].strftime('%Y-%m-%d %H:%M') if paciente['ultima'] else None,
+            'vencimento': paciente['vencimento'].strftime('%Y-%m-%d %H:%M'),
+            'atraso_minutos': int((agora - paciente['vencimento']).total_seconds() // 60),
+        }
+
+    def __len__(self):
+        return len(self._pacientes)
+
+# Última prova de vida por paciente via idx_pv_paciente_data (uma busca no índice cada)
+SQL_PACIENTES = """
+    SELECT p.id, p.nome, p.prioridade_atencao, p.data_entrada,
+           (SELECT MAX(pv.data_hora) FROM ProvasDeVida pv WHERE pv.paciente_id = p.id) AS ultima
+    FROM Pacientes p
+    WHERE p.status = 'internado'
+"""
+
+# Instância usada pelo app
+fila = FilaTriagem()
@@ -0,0 +1,79 @@
+"""
+Versões de coleções e registros para GET condicional (ETag / Last-Modified).
+
+A tabela Versoes guarda, para cada recurso, um contador e a hora da última
+alteração. Os recursos são as mesmas tags do cache ('internacoes', 'altas',
+'provas_vida', 'medicamentos', 'estoque') mais um por paciente
+('paciente:<id>', prontuário e histórico). As rotas de escrita chamam
+incrementar() antes do commit, na mesma transação dos dados. Assim uma
+versão nova nunca fica visível antes dos dados que ela representa.
+
+Nas rotas de leitura, o decorator condicional() do app lê as versões (uma
+consulta pela chave primária), monta o ETag e responde 304 antes de rodar
+as consultas da página quando o navegador já tem essa versão.
+"""
+import hashlib
+import os
+from datetime import timezone
+
+SQL_TABELA = """
+    CREATE TABLE IF NOT EXISTS Versoes (
+        recurso VARCHAR(100) NOT NULL PRIMARY KEY,
+        versao BIGINT NOT NULL DEFAULT 0,
+        alterado_em DATETIME(6) NOT NULL
+    )
+"""
+
+def paciente(paciente_id):
+    return f"paciente:{paciente_id}"
+
+def criar_tabela(cursor):
+    cursor.execute(SQL_TABELA)
+
+def incrementar(cursor, *recursos):
+    """Marca os recursos como alterados (sem commit; use na transação da escrita)."""
+    # Ordem fixa das linhas travadas: duas escritas nunca se esperam em ciclo
+    recursos = sorted(set(recursos))
+    if recursos:
+        cursor.executemany("""
+            INSERT INTO Versoes (recurso, versao, alterado_em) VALUES (%s, 1, UTC_TIMESTAMP(6))
+            ON DUPLICATE KEY UPDATE versao = versao + 1, alterado_em = UTC_TIMESTAMP(6)
+        """, [(r,) for r in recursos])
+
+def ler(cursor, recursos):
+    """{recurso: (versao, alterado_em em UTC ou None)}; recurso nunca alterado = versão 0."""
+    recursos = sorted(set(recursos))
+    estado = dict.fromkeys(recursos, (0, None))
+    if not recursos:
+        return estado
+    cursor.execute(f"SELECT recurso, versao, alterado_em FROM Versoes WHERE recurso IN ({', '.join(['%s'] * len(recursos))})",
+                   recursos)
+    for linha in cursor.fetchall():
+        recurso, versao, alterado_em = (linha['recurso'], linha['versao'], linha['alterado_em']) \
+            if isinstance(linha, dict) else linha
+        estado[recurso] = (versao, alterado_em.replace(tzinfo=timezone.utc))
+    return estado
+
+def etag(estado, *variantes):
+    """
+    ETag forte: versões dos recursos + tudo o que muda a representação
+    (URL com query string, usuário, nível, implantação...).
+    """
+    partes = [f"{r}={v}" for r, (v, _) in sorted(estado.items())] + [str(v) for v in variantes]
+    return hashlib.sha1('|'.join(partes).encode()).hexdigest()[:32]
+
+def ultima_alteracao(estado):
+    datas = [d for _, d in estado.values() if d is not None]
+    return max(datas).replace(microsecond=0) if datas else None
+
+def assinatura_implantacao(*caminhos):
+    """Muda quando templates ou código mudam, para o ETag não sobreviver a um deploy."""
+    maior = 0.0
+    for caminho in caminhos:
+        if os.path.isfile(caminho):
+            maior = max(maior, os.path.getmtime(caminho))
+            continue
+        for raiz, _, arquivos in os.walk(caminho):
+            for nome in arquivos:
+                maior = max(maior, os.path.getmtime(os.path.join(raiz, nome)))
+    return str(int(maior))